@@ -5,20 +5,25 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 
 from ..user.service.user_service import UserService
+from ..user.user_repository import UserRepository
 from ..auth.code_service import CodeService
+from ..auth.token_cache import token_cache
 from ..database import engine, Sessionlocal
 from ..user.schemas import CreateUser, ResetPasswordRequest, Token
+from ..routing import SessionRoute
 
 load_dotenv()
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
 
 router = APIRouter(
+    route_class=SessionRoute,
     tags=['Auth']
 )
 
@@ -35,7 +40,7 @@ def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 
 @router.post("/register", status_code=status.HTTP_201_CREATED) 
-async def create_user(db: db_dependency, create_user_rq: CreateUser):
+def create_user(db: db_dependency, create_user_rq: CreateUser):
     user_id, message = UserService(db).create_user(create_user_rq)
     return {
         "message": message,
@@ -43,7 +48,7 @@ async def create_user(db: db_dependency, create_user_rq: CreateUser):
     }
     
 @router.post('/login', response_model=Token, status_code=status.HTTP_201_CREATED)
-async def login_for_token(
+def login_for_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: db_dependency
 ):
@@ -51,14 +56,14 @@ async def login_for_token(
     return {'access_token': token, 'token_type': 'bearer'}
     
 @router.post('/сode/send', status_code=status.HTTP_201_CREATED)
-async def create_password_restore_code(user_email: str, db: db_dependency):
+def create_password_restore_code(user_email: str, db: db_dependency):
     CodeService(db).create_password_restore_code(user_email)
     return {
     "message": f"Code sent on {user_email}"
     }
 
 @router.post('/code/verify/{code}', response_model=Token, status_code=status.HTTP_201_CREATED)
-async def auth_with_code(code: str, db: db_dependency):
+def auth_with_code(code: str, db: db_dependency):
     token = CodeService(db).auth_with_code(code)
     return {
     'access_token': token, 
@@ -66,18 +71,33 @@ async def auth_with_code(code: str, db: db_dependency):
     }
 
 @router.post('/password/reset', status_code=status.HTTP_201_CREATED)
-async def reset_password(token: str, reset_data: ResetPasswordRequest, db: db_dependency):
+def reset_password(token: str, reset_data: ResetPasswordRequest, db: db_dependency):
     CodeService(db).reset_password(token, reset_data)
     return {"message": "Password successfully changed"}
     
+def _get_tokens_valid_after(user_id: int):
+    db = Sessionlocal()
+    try:
+        return UserRepository(db).get_tokens_valid_after(user_id)
+    finally:
+        db.close()
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
         login: str = payload.get('login')
         user_id: int = payload.get('id')
         if login is None or user_id is None:
             raise HTTPException(status_code=401, detail='Could not validate user.')
-        return {'login': login, 'id': user_id}
+        user = {'login': login, 'id': user_id}
+        # Revocations by other processes (or before a restart) are only known to the database
+        valid_after = await run_in_threadpool(_get_tokens_valid_after, user_id)
+        if not token_cache.put(token, user, payload.get('exp'), payload.get('iat'), valid_after):
+            raise HTTPException(status_code=401, detail='Could not validate user.')
+        return user
     except JWTError:
         raise HTTPException(status_code=401, detail='Could not validate user.')
 
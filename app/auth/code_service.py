@@ -8,8 +8,9 @@ from fastapi import HTTPException, status
 from ..exceptions import UserNotFound
 from ..user.schemas import ResetPasswordRequest
 from ..user.user_repository import UserRepository
-from ..email_controller import send_recovery_code
+from ..email_controller import queue_recovery_code
 from ..auth.code_repository import CodeRepository
+from ..auth.token_cache import token_cache
 
 load_dotenv()
 SECRET_KEY = os.getenv('SECRET_KEY')
@@ -25,7 +26,8 @@ class CodeService:
     def create_access_token(login: str, id: str, expires_delta: timedelta):
         encode = {'login': login, 'id': id}
         expires = datetime.utcnow() + expires_delta
-        encode.update({'exp': expires})
+        # iat keeps its fraction of a second, see TokenCache.revoke_user
+        encode.update({'exp': expires, 'iat': datetime.now(timezone.utc).timestamp()})
         return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
     @staticmethod
@@ -66,19 +68,14 @@ class CodeService:
     def create_access_token(login: str, id: str, expires_delta: timedelta):
         encode = {'login': login, 'id': id}
         expires = datetime.utcnow() + expires_delta
-        encode.update({'exp': expires})
+        # iat keeps its fraction of a second, see TokenCache.revoke_user
+        encode.update({'exp': expires, 'iat': datetime.now(timezone.utc).timestamp()})
         return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
     def create_password_restore_code(self, user_email: str):
         code = CodeRepository.generate_code()
-        result = send_recovery_code(
-            email=user_email,
-            code=code
-        )
-        if not result:
-            raise HTTPException(
-                status_code=500, detail=f"An unexpected error occurred.")
         CodeRepository(self.db).commit_code(user_email, code)
+        queue_recovery_code(self.db, user_email, code)
 
     def auth_with_code(self, code: str) -> str:
         is_valid, user_id = CodeRepository(self.db).verify_code(code)
@@ -109,4 +106,5 @@ class CodeService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Passwords don't match"
             )
-        UserRepository(self.db).reset_user_password(user.id, reset_data.new_password)
\ No newline at end of file
+        UserRepository(self.db).reset_user_password(user.id, reset_data.new_password)
+        token_cache.revoke_user(user.id)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+from ..exceptions import TooManyRequests
+
+load_dotenv()
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+# Requests allowed to wait for or run a hash at once, the rest get 429
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', PASSWORD_HASH_WORKERS * 4))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 0.5))
+
+_context = None
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY)
+
+def _get_context() -> CryptContext:
+    global _context
+    if _context is None:
+        _context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=BCRYPT_ROUNDS)
+    return _context
+
+def _hash(password: str) -> str:
+    return _get_context().hash(password)
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return _get_context().verify(password, hashed_password)
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that already runs the threadpool can deadlock
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def _discard_executor(broken: ProcessPoolExecutor):
+    """Drops a pool that lost a worker, the next call starts a new one. Only the
+    pool that broke is dropped, another thread may have replaced it already"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _run(func, *args):
+    executor = _get_executor()
+    try:
+        return executor.submit(func, *args).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory), every later submit would fail too
+        _discard_executor(executor)
+        return _get_executor().submit(func, *args).result()
+
+def shutdown_hasher():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+@contextmanager
+def _password_slot():
+    if not _slots.acquire(timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise TooManyRequests()
+    try:
+        yield
+    finally:
+        _slots.release()
+
+def hash_password(password: str) -> str:
+    with _password_slot():
+        return _run(_hash, password)
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    with _password_slot():
+        return _run(_verify, password, hashed_password)
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+TOKEN_CACHE_MAXSIZE = int(os.getenv('TOKEN_CACHE_MAXSIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+
+
+class TokenCache:
+    """LRU of already verified bearer tokens. Entries never outlive the token's exp
+    and are indexed by user so that revoking a user's tokens evicts them at once."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_MAXSIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() #token hash -> (expires_at, claims)
+        self._user_keys = {} #user id -> token hashes
+        self._revoked_before = {} #user id -> unix time
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, token: str, claims: dict, exp: Optional[float] = None,
+        issued_at: Optional[float] = None, valid_after: Optional[float] = None) -> bool:
+        """Caches a decoded token unless it is revoked, False then. Checked under the lock,
+        so a revoke_user that ran while the caller was decoding isn't undone.
+        valid_after is the user's persisted cutoff, it is kept for later checks"""
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        key = self._key(token)
+        user_id = claims['id']
+        with self._lock:
+            if valid_after is not None and valid_after > self._revoked_before.get(user_id, 0):
+                self._revoked_before[user_id] = valid_after
+            if self._is_revoked(user_id, issued_at):
+                return False
+            self._entries[key] = (expires_at, dict(claims))
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def _remove(self, key: str):
+        _, claims = self._entries.pop(key)
+        keys = self._user_keys.get(claims['id'])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[claims['id']]
+
+    def revoke_user(self, user_id: int):
+        """Evicts the user's cached tokens and rejects every token issued up to now.
+        Kept with sub-second precision: a token issued right after the revocation in
+        the same second stays valid, one with a whole-second iat from that second doesn't.
+        Only this process is told, the others learn the cutoff persisted by the caller
+        on their next cache miss, so a token they have cached lives up to the TTL"""
+        with self._lock:
+            self._revoked_before[user_id] = time.time()
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def _is_revoked(self, user_id: int, issued_at: Optional[float]) -> bool:
+        revoked_before = self._revoked_before.get(user_id)
+        if revoked_before is None:
+            return False
+        return issued_at is None or issued_at <= revoked_before
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+token_cache = TokenCache()
@@ -1,15 +1,18 @@
 from pydantic import BaseModel
-from fastapi import APIRouter, FastAPI, Depends, HTTPException, status
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import Annotated, List
 
 from ..category.category_service import CategoryService
 from ..models_db import Category as db_Category
 from ..database import engine, Sessionlocal
+from ..etag import etag_headers, if_none_match, not_modified
 from ..auth.auth import get_current_user
 from .schemas import CategoryResponseExample, CreateCategoryRequest, UpdateCategoryRequest
+from ..routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     prefix="/my/categories",
     tags=['Category']
 )
@@ -25,7 +28,7 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_category(category: CreateCategoryRequest, user: user_dependency, db: db_dependency):
+def create_category(category: CreateCategoryRequest, user: user_dependency, db: db_dependency):
     category_id = CategoryService(db).create_category(category.name, category.color, user['id'])
     return {
         "message": "Category created successfully",
@@ -33,17 +36,21 @@ async def create_category(category: CreateCategoryRequest, user: user_dependency
     }
 
 @router.get('/', response_model=List[CategoryResponseExample])
-async def get_categories(user: user_dependency, db: db_dependency):
+def get_categories(request: Request, response: Response, user: user_dependency, db: db_dependency):
+    etag = CategoryService(db).get_categories_etag(user['id'])
+    if if_none_match(request, etag):
+        return not_modified(etag)
     categories = CategoryService(db).get_categories(user['id'])
+    response.headers.update(etag_headers(etag))
     return categories
 
 @router.put("/{category_id}")
-async def update_category(category_id: int, update_data: UpdateCategoryRequest, 
+def update_category(category_id: int, update_data: UpdateCategoryRequest, 
     user: user_dependency, db: db_dependency):
     updated_category = CategoryService(db).update_category(user['id'], category_id, update_data)
     return updated_category
 
 @router.delete('/{category_id}', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_category(category_id: int, user: user_dependency, db: db_dependency):
+def delete_category(category_id: int, user: user_dependency, db: db_dependency):
     CategoryService(db).delete_category(user['id'], category_id)
     
\ No newline at end of file
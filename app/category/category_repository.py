@@ -1,10 +1,13 @@
 from typing import List
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from ..category.schemas import UpdateCategoryRequest
 from ..category.schemas import CategoryResponseSchema
 from ..models_db import Category as db_category
 from ..exceptions import CategoryNotFound
+from ..sync.tombstone_repository import TombstoneRepository
+from ..user.user_repository import UserRepository
 
 class CategoryRepository:
     def __init__(self, db: Session):
@@ -30,6 +33,13 @@ class CategoryRepository:
             color = category.color
         )
     
+    def get_categories_version(self, user_id: int) -> tuple:
+        return tuple(self.db.query(
+            func.count(db_category.id),
+            func.sum(db_category.id),
+            func.max(db_category.updated_at)
+        ).filter(db_category.user_id==user_id).one())
+    
     def get_categories(self, user_id: int) -> List[CategoryResponseSchema]:
         categories = self.db.query(db_category).filter(db_category.user_id==user_id).all()
         return [CategoryResponseSchema(
@@ -66,5 +76,13 @@ class CategoryRepository:
 
     def delete_category(self, user_id: int, category_id: int):
         category = self._get_category(category_id, user_id)
+        # The memberships filed under the category are deleted with it by the ORM cascade
+        project_ids = [association.project_id for association in category.projects]
         self.db.delete(category)
+        tombstones = TombstoneRepository(self.db)
+        tombstones.record_category(category_id, user_id)
+        for project_id in project_ids:
+            tombstones.record_project(project_id, [user_id])
         self.db.commit()
+        if project_ids:
+            UserRepository(self.db).invalidate_principal(user_id)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 
 from ..category.schemas import UpdateCategoryRequest
 from ..category.category_repository import CategoryRepository
+from ..etag import make_etag
 from ..exceptions import CategoryNotFound
 
 class CategoryService:
@@ -12,6 +13,10 @@ class CategoryService:
     def create_category(self, name: str, color: str, user_id: int) -> int:
         return CategoryRepository(self.db).create_category(name, color, user_id)
     
+    def get_categories_etag(self, user_id: int) -> str:
+        version = CategoryRepository(self.db).get_categories_version(user_id)
+        return make_etag('categories', user_id, version)
+    
     def get_categories(self, user_id):
         categories = CategoryRepository(self.db).get_categories(user_id)
         return categories
@@ -6,8 +6,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 URL_DATABASE = os.getenv('URL_DATABASE')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 20))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
 
-engine = create_engine(URL_DATABASE)
+engine = create_engine(
+    URL_DATABASE,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True
+)
 
 Sessionlocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
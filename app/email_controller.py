@@ -1,66 +1,110 @@
 import smtplib
+import time
 from random import randint
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
-from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .outbox.outbox_repository import EmailOutboxRepository
 
 load_dotenv()
 SENDER_EMAIL = os.getenv('SENDER_EMAIL')
 SENDER_EMAIL_PASSWORD = os.getenv('SENDER_EMAIL_PASSWORD')
+SMTP_HOST = os.getenv('SMTP_HOST')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_TIMEOUT = int(os.getenv('SMTP_TIMEOUT', 30))
 
 def get_stmp(email):
     pattern = 'smtp.'
-    domain_name = email.split('@')[1]   
+    domain_name = email.split('@')[1]
     return pattern+domain_name, 587
 
 def generate_code() -> str:
     code = str(randint(0, 999999))
     return code
 
-def send_recovery_code(email: str, code: str=generate_code()):
-    recovery_code = code
-    smtp_server, smtp_port = get_stmp(SENDER_EMAIL)
-
-    subject = 'Код восстановления'
-    body = f'Ваш код восстановления: <b>{recovery_code:06}<b>'
-    
+def build_message(recipient: str, subject: str, body: str) -> MIMEMultipart:
     msg = MIMEMultipart()
     msg['Subject'] = subject
     msg['From'] = SENDER_EMAIL
-    msg['To'] = email
+    msg['To'] = recipient
     msg.attach(MIMEText(body, 'html'))
+    return msg
+
+
+class SmtpConnection:
+    """One authenticated SMTP session reused for many messages"""
+
+    def __init__(self):
+        self.client = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        if SMTP_HOST:
+            host, port = SMTP_HOST, SMTP_PORT
+        else:
+            host, port = get_stmp(SENDER_EMAIL)
+        client = smtplib.SMTP(host, port, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            client.starttls()
+        if SENDER_EMAIL_PASSWORD:
+            client.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
+        self.client = client
+
+    def _is_alive(self) -> bool:
+        try:
+            return self.client.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def send(self, recipient: str, subject: str, body: str):
+        if self.client is None or not self._is_alive():
+            self.close()
+            self._connect()
+        msg = build_message(recipient, subject, body)
+        self.client.sendmail(SENDER_EMAIL, recipient, msg.as_string())
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.client is None:
+            return
+        try:
+            self.client.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.client = None
 
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port, timeout=120) as host:
-            host.starttls()
-            host.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
-            host.sendmail(SENDER_EMAIL, email, msg.as_string())
-        print("Код восстановления отправлен на", email)
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Send email failed"
-            )
-    return recovery_code
-
-def send_project_invite(
+    def close_if_idle(self, idle_seconds: float):
+        if self.client is not None and time.monotonic() - self.last_used > idle_seconds:
+            self.close()
+
+
+def queue_recovery_code(db: Session, email: str, code: str) -> int:
+    subject = 'Код восстановления'
+    body = f'Ваш код восстановления: <b>{code}</b>'
+    return EmailOutboxRepository(db).enqueue(email, subject, body)
+
+def queue_project_invite(
+    db: Session,
     recipient_email: str,
     inviter_name: str,
     project_name: str,
     url: str,
     expire_in_minutes: int,
-):
+) -> int:
     """
-    Отправляет приглашение в проект по email
+    Ставит приглашение в проект в очередь отправки
     :param recipient_email: Email получателя
     :param inviter_name: Имя приглашающего
     :param project_name: Название проекта
-    :param invite_url: Ссылка для принятия приглашения
+    :param url: Ссылка для принятия приглашения
     :param expire_in_minutes: Время жизни приглашения
     """
-    smtp_server, smtp_port = get_stmp(SENDER_EMAIL)
-    
     subject = f"Приглашение в проект {project_name}"
     body = f"""
     <html>
@@ -74,31 +118,13 @@ def send_project_invite(
     </body>
     </html>
     """
-    
-    msg = MIMEMultipart()
-    msg['Subject'] = subject
-    msg['From'] = SENDER_EMAIL
-    msg['To'] = recipient_email
-    msg.attach(MIMEText(body, 'html'))
-
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as host:
-            host.starttls()
-            host.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
-            host.sendmail(SENDER_EMAIL, recipient_email, msg.as_string())
-        print(f"Приглашение в проект отправлено на {recipient_email}")
-        return True
-    except Exception as e:
-        print(f"Ошибка при отправке приглашения:", e)
-        return False
+    return EmailOutboxRepository(db).enqueue(recipient_email, subject, body)
 
 if __name__ == '__main__':
-    result = send_project_invite(
-        # "yakovva36@gmail.com", 
+    connection = SmtpConnection()
+    connection.send(
         "yakov.g.ruslanovich@gmail.com",
-        "Test User",
-        "Test Project", 
-        "http://example.com/invite", 
-        10
+        "Приглашение в проект Test Project",
+        '<a href="http://example.com/invite">Принять приглашение</a>'
     )
-    print(result)
\ No newline at end of file
+    connection.close()
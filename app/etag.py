@@ -0,0 +1,35 @@
+import hashlib
+from email.utils import parsedate_to_datetime
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    """Strong ETag from a cheap version tuple (counts, max timestamps...) instead of the body"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_headers(etag: str, cache_control: str = 'private, no-cache') -> dict:
+    # private: the bodies depend on the caller, no-cache: revalidate on every use
+    return {'ETag': etag, 'Cache-Control': cache_control}
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    # If-None-Match uses the weak comparison, a W/ prefix does not matter
+    return '*' in candidates or etag in (candidate.removeprefix('W/') for candidate in candidates)
+
+def if_modified_since(request: Request, last_modified: float) -> bool:
+    """Only consulted without If-None-Match, which takes precedence"""
+    header = request.headers.get('if-modified-since')
+    if not header or request.headers.get('if-none-match'):
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole seconds
+    return int(last_modified) <= since
+
+def not_modified(etag: str, cache_control: str = 'private, no-cache') -> Response:
+    return Response(status_code=304, headers=etag_headers(etag, cache_control))
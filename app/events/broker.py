@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 1000))
+
+# Admin streams follow every project through this topic
+ALL_PROJECTS_TOPIC = 'projects'
+
+def project_topic(project_id: int) -> str:
+    return f'project:{project_id}'
+
+def user_topic(user_id: int) -> str:
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """Event queue of one stream. Belongs to the event loop that created it,
+    publishers on other threads hand events over with loop.call_soon_threadsafe"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.loop = loop
+        self.topics = set()
+        self._queue = asyncio.Queue(maxsize=queue_size)
+
+    def _put(self, event: dict):
+        if self._queue.full():
+            # A client this far behind can't catch up event by event, it refetches
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            event = {'type': 'resync'}
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, None once the timeout passes without one"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker(ABC):
+    """Pub/sub between the request handlers writing changes and the /events streams.
+    A broker shared between workers (Redis, Postgres LISTEN/NOTIFY) implements the same methods"""
+
+    @abstractmethod
+    def publish(self, topics: Iterable[str], event: dict):
+        """Delivers the event once to every subscription following any of the topics"""
+
+    @abstractmethod
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        """Called from the event loop which will read the subscription"""
+
+    @abstractmethod
+    def add_topics(self, subscription: Subscription, topics: Iterable[str]):
+        pass
+
+    @abstractmethod
+    def remove_topics(self, subscription: Subscription, topics: Iterable[str]):
+        pass
+
+    def unsubscribe(self, subscription: Subscription):
+        self.remove_topics(subscription, list(subscription.topics))
+
+
+def _deliver_all(subscriptions: List[Subscription], event: dict):
+    for subscription in subscriptions:
+        subscription._put(event)
+
+
+class InMemoryBroker(EventBroker):
+    """Topic registry of the current process, events never leave the worker"""
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics = defaultdict(set) #topic -> subscriptions
+        self._lock = threading.Lock()
+
+    def publish(self, topics: Iterable[str], event: dict):
+        with self._lock:
+            subscriptions = set()
+            for topic in topics:
+                subscriptions.update(self._topics.get(topic, ()))
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = defaultdict(list)
+        for subscription in subscriptions:
+            by_loop[subscription.loop].append(subscription)
+        # One wakeup per loop rather than per subscriber
+        for loop, loop_subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver_all, loop_subscriptions, event)
+            except RuntimeError:
+                # The loop is closed, its streams are gone
+                pass
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        self.add_topics(subscription, topics)
+        return subscription
+
+    def add_topics(self, subscription: Subscription, topics: Iterable[str]):
+        with self._lock:
+            for topic in topics:
+                self._topics[topic].add(subscription)
+                subscription.topics.add(topic)
+
+    def remove_topics(self, subscription: Subscription, topics: Iterable[str]):
+        with self._lock:
+            for topic in topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+                subscription.topics.discard(topic)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'topics': len(self._topics),
+                'subscriptions': len(set().union(*self._topics.values())) if self._topics else 0
+            }
+
+
+broker: EventBroker = InMemoryBroker()
+
+def publish_task_event(event_type: str, task_ids_by_project: Dict[int, List[int]]):
+    """One event per project, the stream sends ids only and clients refetch what they show"""
+    for project_id, task_ids in task_ids_by_project.items():
+        if project_id is None:
+            continue
+        broker.publish(
+            [project_topic(project_id), ALL_PROJECTS_TOPIC],
+            {'type': event_type, 'project_id': project_id, 'task_ids': list(task_ids)}
+        )
+
+def publish_project_event(event_type: str, project_id: int):
+    broker.publish([project_topic(project_id), ALL_PROJECTS_TOPIC], {'type': event_type, 'project_id': project_id})
+
+def publish_membership_event(event_type: str, project_id: int, user_ids: Iterable[int]):
+    """Goes to the project's members and to the affected users themselves,
+    whose streams start or stop following the project on it"""
+    for user_id in user_ids:
+        broker.publish(
+            [project_topic(project_id), user_topic(user_id), ALL_PROJECTS_TOPIC],
+            {'type': event_type, 'project_id': project_id, 'user_id': user_id}
+        )
@@ -0,0 +1,73 @@
+import os
+import orjson
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Annotated, AsyncIterator, List
+
+from ..auth.auth import get_current_user
+from ..database import Sessionlocal
+from ..user.user_repository import UserRepository
+from .broker import ALL_PROJECTS_TOPIC, Subscription, broker, project_topic, user_topic
+from ..routing import SessionRoute
+
+load_dotenv()
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+
+router = APIRouter(
+    route_class=SessionRoute,
+    prefix="/events",
+    tags=['Events']
+)
+
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+def _initial_topics(user_id: int) -> List[str]:
+    db = Sessionlocal()
+    try:
+        principal = UserRepository(db).get_principal(user_id)
+    finally:
+        db.close()
+    topics = [user_topic(user_id), *(project_topic(project_id) for project_id in principal.project_roles)]
+    if principal.is_admin:
+        topics.append(ALL_PROJECTS_TOPIC)
+    return topics
+
+def _follow(user_id: int, subscription: Subscription, event: dict):
+    """Keeps the subscription's projects in line with the user's memberships"""
+    if event['type'] == 'member.added' and event['user_id'] == user_id:
+        broker.add_topics(subscription, [project_topic(event['project_id'])])
+    elif event['type'] == 'member.removed' and event['user_id'] == user_id \
+        or event['type'] == 'project.deleted':
+        broker.remove_topics(subscription, [project_topic(event['project_id'])])
+
+def _format(event: dict) -> bytes:
+    return b'event: ' + event['type'].encode() + b'\ndata: ' + orjson.dumps(event) + b'\n\n'
+
+async def _stream(user_id: int, topics: List[str]) -> AsyncIterator[bytes]:
+    # Subscribed on the first read, so a response that is never sent leaves nothing behind
+    subscription = broker.subscribe(topics)
+    try:
+        yield _format({'type': 'ready'})
+        while True:
+            event = await subscription.get(EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                # Comment line, keeps proxies from closing an idle connection
+                yield b': ping\n\n'
+                continue
+            _follow(user_id, subscription, event)
+            yield _format(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+@router.get('/')
+async def get_events(user: user_dependency):
+    """Server-sent events for the user's projects: task.created, task.updated, task.deleted,
+    member.added, member.removed, project.deleted and resync. Events carry ids only"""
+    topics = await run_in_threadpool(_initial_topics, user['id'])
+    return StreamingResponse(
+        _stream(user['id'], topics),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -50,4 +50,36 @@ class TaskNotFound(HTTPException):
         super().__init__(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=detail,
+        )
+
+class NotificationNotFound(HTTPException):
+    def __init__(self, notification_id: int = None):
+        detail = "Notification not found"
+        if notification_id:
+            detail = f"Notification with id {notification_id} not found"
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=detail,
+        )
+
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        )
+
+class InvalidSyncToken(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token",
+        )
+
+class TooManyRequests(HTTPException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(retry_after)},
         )
\ No newline at end of file
@@ -0,0 +1,132 @@
+import argparse
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+
+from .database import Base, Sessionlocal, engine
+from .migrations import run_migrations
+from .models_db import Category, Notification, Project, User, UserProjectAssociation
+from .task.models import Task
+from .task.schemas import TaskFilters
+from .task.repositories.task_repository import TaskRepository
+from .project.project_repository import ProjectRepository
+from .category.category_repository import CategoryRepository
+from .notification.notification_repository import NotificationRepository
+from .user.user_project_association_repo import UserProjectAssociation as UPARepository
+from .user.user_repository import UserRepository
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^SCAN (\w+)$'),
+}
+
+def seed(db, users: int, projects: int, tasks_per_project: int):
+    now = datetime.now(timezone.utc)
+    user_rows = [User(login=f'advisor{i}@example.com', username=f'advisor{i}') for i in range(users)]
+    db.add_all(user_rows)
+    db.flush()
+    for user in user_rows:
+        db.add(Category(name='Advisor', color='#000000', user_id=user.id))
+        db.add_all(Notification(user_id=user.id, text='Advisor', date=now - timedelta(minutes=i)) for i in range(5))
+    for i in range(projects):
+        owner = user_rows[i % users]
+        project = Project(name=f'Advisor {i}', user_id=owner.id, created_at=now)
+        db.add(project)
+        db.flush()
+        members = {owner.id} | {user.id for user in random.sample(user_rows, min(5, users))}
+        db.add_all(UserProjectAssociation(user_id=member_id, project_id=project.id, joined_at=now) for member_id in members)
+        db.add_all(Task(
+            name=f'Task {j}',
+            status=random.choice(['Назначена', 'В работе', 'Выполнена']),
+            deadline=now + timedelta(days=random.randint(-30, 30)),
+            owner_id=owner.id,
+            performer_id=random.choice(list(members)),
+            project_id=project.id
+        ) for j in range(tasks_per_project))
+    db.commit()
+
+def repository_queries(db):
+    """Every read path the API runs, so the captured statements mirror production traffic"""
+    user = db.query(User).join(UserProjectAssociation, UserProjectAssociation.user_id == User.id).first()
+    if user is None:
+        raise SystemExit('Database is empty, run with --seed first')
+    project_id = db.query(UserProjectAssociation.project_id).filter(UserProjectAssociation.user_id == user.id).limit(1).scalar()
+    task_id = db.query(Task.id).filter(Task.project_id == project_id).limit(1).scalar()
+    filters = [
+        TaskFilters(status=None, indicator=None, limit=None, fields=None),
+        TaskFilters(project_id=project_id, status=['В работе'], indicator=None, limit=None, fields=None),
+        TaskFilters(on_me=True, status=None, indicator=None, sort_by='deadline', limit=None, fields=None),
+        TaskFilters(project_id=project_id, status=None, indicator=None, sort_by='created_at', sort_order='desc', limit=50, fields=None),
+    ]
+    yield 'principal', lambda: UserRepository(db)._load_principal(user.id)
+    for i, task_filters in enumerate(filters):
+        yield f'get_accessed_tasks_filter[{i}]', lambda task_filters=task_filters: TaskRepository(db).get_accessed_tasks_filter(user.id, task_filters)
+    yield 'get_accessed_tasks_page', lambda: TaskRepository(db).get_accessed_tasks_page(user.id, filters[3])
+    if task_id is not None:
+        yield 'get_task', lambda: TaskRepository(db).get_task(task_id)
+    yield 'get_project_tasks', lambda: TaskRepository(db).get_project_tasks(project_id)
+    yield 'get_my_projects', lambda: ProjectRepository(db).get_my_projects(user.id)
+    yield 'get_accessed_projects', lambda: UPARepository(db).get_accessed_projects(user.id)
+    yield 'get_users_in_project', lambda: UPARepository(db).get_users_in_project(project_id)
+    yield 'get_categories', lambda: CategoryRepository(db).get_categories(user.id)
+    yield 'get_notifications', lambda: NotificationRepository(db).get_notifications(user.id)
+
+def explain(connection, statement: str, parameters) -> list[str]:
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).all()
+    return [row[0] for row in rows]
+
+def advise() -> int:
+    captured = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+    db = Sessionlocal()
+    flagged = 0
+    pattern = SEQ_SCAN_PATTERNS.get(engine.dialect.name)
+    try:
+        for name, run in list(repository_queries(db)):
+            captured.clear()
+            event.listen(engine, 'before_cursor_execute', capture)
+            try:
+                run()
+            finally:
+                event.remove(engine, 'before_cursor_execute', capture)
+            for statement, parameters in list(captured):
+                with engine.connect() as connection:
+                    if connection.dialect.name == 'postgresql':
+                        # Small seeded tables make the planner prefer scans, ask it whether an index path exists at all
+                        connection.exec_driver_sql('SET enable_seqscan = off')
+                    plan = explain(connection, statement, parameters)
+                matches = (pattern.search(line.strip()) for line in plan) if pattern else ()
+                scans = sorted({match.group(1) for match in matches if match})
+                status = 'SEQ SCAN on ' + ', '.join(scans) if scans else 'ok'
+                flagged += bool(scans)
+                print(f'[{status}] {name}')
+                if scans:
+                    print('    ' + ' '.join(statement.split()))
+                    for line in plan:
+                        print('    | ' + line)
+    finally:
+        db.close()
+    return flagged
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='EXPLAIN every repository query and flag sequential scans')
+    parser.add_argument('--seed', action='store_true', help='insert synthetic users, projects and tasks first')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=200, help='tasks per project')
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    if args.seed:
+        db = Sessionlocal()
+        try:
+            seed(db, args.users, args.projects, args.tasks)
+        finally:
+            db.close()
+    raise SystemExit(1 if advise() else 0)
@@ -1,3 +1,7 @@
+from contextlib import asynccontextmanager
+import os
+from anyio import to_thread
+from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from fastapi import FastAPI, Depends, HTTPException
@@ -7,6 +11,9 @@ from fastapi.middleware.cors import CORSMiddleware
 #import auth, profile, Category.category, Project.project
 
 from .database import engine, Sessionlocal, Base
+from .migrations import run_migrations
+from .outbox.worker import outbox_worker
+from .auth.password_hasher import shutdown_hasher
 from .auth.auth import get_current_user
 from .auth.auth import router as auth_router
 from .user.routers.profile import router as profile_router
@@ -17,9 +24,28 @@ from .task.task import router as task_router
 from .user.routers.project_user_controller import router as project_user_controller_router
 from .user.routers.attachments import router as file_router
 from .user.routers.admin import router as admin_router
+from .sync.sync import router as sync_router
+from .events.events import router as events_router
+from .notification.notification import router as notification_router
 
-app = FastAPI()
+load_dotenv()
+# Sync handlers run in this threadpool; keep it in line with DB_POOL_SIZE + DB_MAX_OVERFLOW.
+# SessionRoute gives a handler's connection back before the response is validated
+THREADPOOL_SIZE = int(os.getenv('THREADPOOL_SIZE', 30))
+EMAIL_WORKER_ENABLED = os.getenv('EMAIL_WORKER_ENABLED', 'true').lower() == 'true'
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    if EMAIL_WORKER_ENABLED:
+        outbox_worker.start()
+    yield
+    outbox_worker.stop()
+    shutdown_hasher()
+
+app = FastAPI(lifespan=lifespan)
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +74,9 @@ app.include_router(my_project_router)
 app.include_router(project_router)
 app.include_router(task_router)
 app.include_router(admin_router)
+app.include_router(sync_router)
+app.include_router(events_router)
+app.include_router(notification_router)
 
 @app.get("/")
 async def get_user(user: user_dependency, db: db_dependency):
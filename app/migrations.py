@@ -0,0 +1,168 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Base
+from .task.repositories.task_counter_repository import rebuild_task_counters
+from .task.repositories.task_search_repository import SEARCH_VECTOR_SQL
+
+# create_all only creates missing tables, so every change to an existing table
+# (new indexes, columns, backfills) is registered here and applied once per database
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String),
+    Column('applied_at', DateTime)
+)
+
+MIGRATIONS = []
+MIGRATION_LOCK_ID = 7411
+
+def migration(version: int, name: str):
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return decorator
+
+def create_indexes(connection: Connection, table_name: str, *index_names: str):
+    """Creates the named indexes declared on the model, skipping those that already exist.
+    Each migration lists only the indexes it introduces, an index added later may cover
+    a column that doesn't exist yet at that point of the upgrade"""
+    indexes = {index.name: index for index in Base.metadata.tables[table_name].indexes}
+    for index_name in index_names:
+        indexes[index_name].create(connection, checkfirst=True)
+
+def add_missing_column(connection: Connection, table_name: str, column_name: str) -> bool:
+    """ALTER TABLE ADD COLUMN for a column declared on the model, skipped if it already exists"""
+    if column_name in {column['name'] for column in inspect(connection).get_columns(table_name)}:
+        return False
+    column = Base.metadata.tables[table_name].c[column_name]
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(text(
+        f'ALTER TABLE {preparer.quote(table_name)} '
+        f'ADD COLUMN {preparer.quote(column_name)} {column.type.compile(connection.dialect)}'
+    ))
+    return True
+
+@migration(1, 'indexes for task, membership, project, category and notification queries')
+def add_query_indexes(connection: Connection):
+    # The unique (user_id, project_id) index cannot be built while duplicates exist
+    connection.execute(text(
+        'DELETE FROM user_project_association WHERE id NOT IN ('
+        'SELECT MIN(id) FROM user_project_association GROUP BY user_id, project_id)'
+    ))
+    create_indexes(
+        connection, 'task',
+        'ix_task_project_last_change', 'ix_task_project_created_at', 'ix_task_project_deadline',
+        'ix_task_project_status', 'ix_task_performer_status', 'ix_task_parent_task_id', 'ix_task_owner_id'
+    )
+    create_indexes(
+        connection, 'user_project_association',
+        'ux_user_project_association_user_project', 'ix_user_project_association_project_id'
+    )
+    create_indexes(connection, 'project', 'ix_project_user_id')
+    create_indexes(connection, 'category', 'ix_category_user_id')
+    create_indexes(connection, 'notification', 'ix_notification_user_date')
+
+@migration(2, 'full-text search over task name and description')
+def add_task_search(connection: Connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        connection.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING gin ({SEARCH_VECTOR_SQL})'
+        ))
+        # Lets the existing TaskFilters.name ILIKE '%...%' filter use an index too
+        connection.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_task_name_trgm ON task USING gin (name gin_trgm_ops)'
+        ))
+    elif connection.dialect.name == 'sqlite':
+        connection.execute(text('CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(name, description)'))
+        connection.execute(text(
+            "INSERT INTO task_fts(rowid, name, description) "
+            "SELECT id, coalesce(name, ''), coalesce(description, '') FROM task"
+        ))
+
+@migration(3, 'backfill per-project and per-performer task counters')
+def backfill_task_counters(connection: Connection):
+    # The counter tables themselves are new and already created by create_all
+    rebuild_task_counters(connection)
+
+@migration(4, 'updated_at on project, category and user_project_association')
+def add_updated_at(connection: Connection):
+    for table_name in ('project', 'category', 'user_project_association'):
+        add_missing_column(connection, table_name, 'updated_at')
+    now = datetime.now(timezone.utc)
+    tables = Base.metadata.tables
+    project, category, association = tables['project'], tables['category'], tables['user_project_association']
+    # Core statements, so the values go through the DateTime type like ORM writes do
+    connection.execute(project.update().where(project.c.updated_at.is_(None)).values(
+        updated_at=func.coalesce(project.c.created_at, now)
+    ))
+    connection.execute(category.update().where(category.c.updated_at.is_(None)).values(updated_at=now))
+    connection.execute(association.update().where(association.c.updated_at.is_(None)).values(
+        updated_at=func.coalesce(association.c.joined_at, now)
+    ))
+
+@migration(5, 'user.updated_at and project_task_counter.version for ETags')
+def add_etag_versions(connection: Connection):
+    add_missing_column(connection, 'user', 'updated_at')
+    add_missing_column(connection, 'project_task_counter', 'version')
+    user, counter = Base.metadata.tables['user'], Base.metadata.tables['project_task_counter']
+    connection.execute(user.update().where(user.c.updated_at.is_(None)).values(updated_at=datetime.now(timezone.utc)))
+    connection.execute(counter.update().where(counter.c.version.is_(None)).values(version=0))
+
+@migration(6, 'partial index for unread notifications')
+def add_unread_notification_index(connection: Connection):
+    notification = Base.metadata.tables['notification']
+    # The partial index and the unread queries only match is_read = false, not NULL
+    connection.execute(notification.update().where(notification.c.is_read.is_(None)).values(is_read=False))
+    create_indexes(connection, 'notification', 'ix_notification_unread')
+
+@migration(7, 'content hash on attachment')
+def add_attachment_content_hash(connection: Connection):
+    # Existing files keep a NULL hash, they are only shared by uploads made from now on
+    add_missing_column(connection, 'attachment', 'content_hash')
+    create_indexes(connection, 'attachment', 'ux_attachment_content_hash')
+
+@migration(8, 'deleted_at index on tombstone')
+def add_tombstone_deleted_at_index(connection: Connection):
+    create_indexes(connection, 'tombstone', 'ix_tombstone_deleted_at')
+
+@migration(9, 'drop performer task counters that count nothing')
+def drop_empty_performer_counters(connection: Connection):
+    counter = Base.metadata.tables['performer_task_counter']
+    connection.execute(counter.delete().where(
+        counter.c.assigned == 0, counter.c.in_progress == 0, counter.c.done == 0
+    ))
+
+@migration(10, 'attachments are kept while a user or project uses them, not by upload count')
+def replace_attachment_ref_count(connection: Connection):
+    add_missing_column(connection, 'attachment', 'uploaded_at')
+    attachment = Base.metadata.tables['attachment']
+    # Counts from version 7 of this table are dropped, existing files get a full grace period
+    connection.execute(attachment.update().where(attachment.c.uploaded_at.is_(None)).values(
+        uploaded_at=datetime.now(timezone.utc)
+    ))
+    if 'ref_count' in {column['name'] for column in inspect(connection).get_columns('attachment')}:
+        connection.execute(text('ALTER TABLE attachment DROP COLUMN ref_count'))
+
+@migration(11, 'revoked token cutoff on user')
+def add_user_tokens_valid_after(connection: Connection):
+    add_missing_column(connection, 'user', 'tokens_valid_after')
+
+def run_migrations(engine: Engine):
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Several workers may start at once, only one of them applies migrations
+            connection.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+        applied = set(connection.scalars(select(schema_migrations.c.version)))
+        for version, name, func in sorted(MIGRATIONS, key=lambda item: item[0]):
+            if version in applied:
+                continue
+            func(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.now(timezone.utc)
+            ))
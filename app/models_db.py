@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy import text as sa_text
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -13,6 +14,9 @@ class User(Base):
     icon_id = Column(Integer, ForeignKey('attachment.id', ondelete="SET NULL"))
     is_verified = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Unix time, tokens with an iat up to it are revoked
+    tokens_valid_after = Column(Float)
 
     #1:1
     icon_attachment = relationship("Attachment", foreign_keys=[icon_id], passive_deletes=True)
@@ -32,7 +36,8 @@ class Category(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String)
     color = Column(String)
-    user_id = Column(Integer, ForeignKey('user.id'))
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # M:1
     user = relationship("User", back_populates="categories")
@@ -45,8 +50,9 @@ class Project(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     icon_id = Column(Integer, ForeignKey('attachment.id', ondelete="SET NULL"))
     name = Column(String)
-    user_id = Column(Integer, ForeignKey('user.id'))
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
     created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     #1:1
     icon_attachment = relationship("Attachment", foreign_keys=[icon_id])
     # M:1
@@ -58,11 +64,16 @@ class Project(Base):
 
 class UserProjectAssociation(Base):
     __tablename__ = 'user_project_association'
+    __table_args__ = (
+        Index('ux_user_project_association_user_project', 'user_id', 'project_id', unique=True),
+        Index('ix_user_project_association_project_id', 'project_id'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('user.id'), primary_key=True)
     project_id = Column(Integer, ForeignKey('project.id'), primary_key=True)
     category_id = Column(Integer, ForeignKey('category.id', ondelete="SET NULL"))
-    joined_at = Column(DateTime, default=datetime.now(timezone.utc))
+    joined_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     user = relationship('User', back_populates='project_associations')
     project_associations = relationship('Project', back_populates='user_associations')
@@ -71,18 +82,32 @@ class UserProjectAssociation(Base):
 
 class Attachment(Base):
     __tablename__ = 'attachment'
+    __table_args__ = (
+        Index('ux_attachment_content_hash', 'content_hash', unique=True),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     path = Column(String, unique=True)
+    # sha256 of the file, identical uploads share the row. NULL for files stored before hashing
+    content_hash = Column(String(64))
+    # Last upload of this content. Once no user or project has it as icon_id the row and
+    # the file are removed, but not before UNUSED_ATTACHMENT_HOURS after this
+    uploaded_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     users = relationship("User", back_populates="icon_attachment")
     projects = relationship("Project", back_populates="icon_attachment")
 
 class Notification(Base):
     __tablename__ = 'notification'
+    __table_args__ = (
+        Index('ix_notification_user_date', 'user_id', 'date', 'id'),
+        # Only unread rows are indexed, the unread count never reads the whole inbox
+        Index('ix_notification_unread', 'user_id',
+            sqlite_where=sa_text('is_read = 0'), postgresql_where=sa_text('is_read = false')),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(DateTime, default=datetime.now(timezone.utc))
+    date = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     text = Column(String)
-    is_read = Column(Boolean, default=False)
+    is_read = Column(Boolean, default=False, nullable=False)
     user_id = Column(Integer, ForeignKey('user.id'))
 
     user = relationship('User', back_populates='notifications')
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+from typing import Annotated, Optional
+
+from ..auth.auth import get_current_user
+from ..database import Sessionlocal
+from ..responses import FastJSONResponse
+from .notification_service import NotificationService
+from .schemas import MarkAllReadResponse, NotificationPageResponse, UnreadCountResponse
+from ..routing import SessionRoute
+
+router = APIRouter(
+    route_class=SessionRoute,
+    prefix="/notifications",
+    tags=['Notification']
+)
+
+def get_db():
+    db = Sessionlocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+@router.get('/', response_model=NotificationPageResponse)
+def get_notifications(user: user_dependency, db: db_dependency,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    unread_only: bool = Query(False)):
+    page = NotificationService(db).get_notifications(user['id'], limit, cursor, unread_only)
+    return FastJSONResponse(page)
+
+@router.get('/unread-count', response_model=UnreadCountResponse)
+def get_unread_count(user: user_dependency, db: db_dependency):
+    return UnreadCountResponse(unread=NotificationService(db).count_unread(user['id']))
+
+@router.post('/read-all', response_model=MarkAllReadResponse)
+def mark_all_read(user: user_dependency, db: db_dependency,
+    up_to_id: Optional[int] = Query(None, description="newest id the client has shown, later ones stay unread")):
+    updated = NotificationService(db).mark_all_read(user['id'], up_to_id)
+    return MarkAllReadResponse(updated=updated)
+
+@router.post('/{notification_id}/read', status_code=status.HTTP_204_NO_CONTENT)
+def mark_as_read(notification_id: int, user: user_dependency, db: db_dependency):
+    NotificationService(db).mark_as_read(user['id'], notification_id)
@@ -1,17 +1,62 @@
-from typing import List, Optional
-from sqlalchemy import desc
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from sqlalchemy import and_, func, insert, literal, or_, select, update
 from sqlalchemy.orm import Session
-from ..models_db import Notification
+
+from ..exceptions import InvalidCursor, NotificationNotFound
+from ..models_db import Notification, UserProjectAssociation
+
+DEFAULT_PAGE_SIZE = 50
+NOTIFICATION_COLUMNS = (
+    Notification.id,
+    Notification.date,
+    Notification.text,
+    Notification.is_read,
+)
+
+def _encode_cursor(date: datetime, notification_id: int) -> str:
+    raw = json.dumps({'d': date.isoformat(), 'id': notification_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        return datetime.fromisoformat(payload['d']), int(payload['id'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor()
 
 class NotificationRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_notifications(self, user_id: int) -> List[Notification]:
-        query = self.db.query(Notification)\
-            .filter(Notification.user_id == user_id)\
-            .order_by(desc(Notification.date))
-        return query.all()
+    def get_notifications(self, user_id: int, limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None, unread_only: bool = False) -> dict:
+        """Newest first, keyset paged over ix_notification_user_date"""
+        query = self.db.query(*NOTIFICATION_COLUMNS).filter(Notification.user_id == user_id)
+        if unread_only:
+            query = query.filter(Notification.is_read == False)
+        if cursor:
+            date, last_id = _decode_cursor(cursor)
+            query = query.filter(or_(
+                Notification.date < date,
+                and_(Notification.date == date, Notification.id < last_id)
+            ))
+        rows = query.order_by(Notification.date.desc(), Notification.id.desc()).limit(limit + 1).all()
+        items = [row._asdict() for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor(items[-1]['date'], items[-1]['id'])
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def count_unread(self, user_id: int) -> int:
+        # Matches the predicate of the partial ix_notification_unread
+        return self.db.query(func.count()).select_from(Notification).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).scalar()
 
     def create_notification(self, user_id: int, text: str):
         notification = Notification(
@@ -22,13 +67,45 @@ class NotificationRepository:
         self.db.commit()
         self.db.refresh(notification)
         return notification
-    
-    def mark_as_read(self, notification_id: int) -> Optional[Notification]:
-        notification = self.db.query(Notification)\
-            .filter(Notification.id == notification_id)\
-            .first()
-        if notification:
-            notification.is_read = True 
-            self.db.commit()
-            self.db.refresh(notification)
-        return notification
+
+    def add_notifications(self, user_ids: Iterable[int], text: str):
+        """One multi-row INSERT, the caller commits together with the change it reports"""
+        now = datetime.now(timezone.utc)
+        rows = [{'user_id': user_id, 'text': text, 'date': now, 'is_read': False} for user_id in user_ids]
+        if rows:
+            self.db.execute(insert(Notification), rows)
+
+    def notify_project(self, project_id: int, text: str, exclude_user_id: Optional[int] = None):
+        """Fans a notification out to every member with a single INSERT ... SELECT,
+        the caller commits"""
+        members = select(
+            UserProjectAssociation.user_id,
+            literal(text),
+            literal(datetime.now(timezone.utc), Notification.date.type),
+            literal(False)
+        ).where(UserProjectAssociation.project_id == project_id)
+        if exclude_user_id is not None:
+            members = members.where(UserProjectAssociation.user_id != exclude_user_id)
+        self.db.execute(insert(Notification).from_select(['user_id', 'text', 'date', 'is_read'], members))
+
+    def mark_as_read(self, user_id: int, notification_id: int):
+        result = self.db.execute(
+            update(Notification)
+            .where(Notification.id == notification_id, Notification.user_id == user_id)
+            .values(is_read=True)
+        )
+        if result.rowcount == 0:
+            raise NotificationNotFound(notification_id)
+        self.db.commit()
+
+    def mark_all_read(self, user_id: int, up_to_id: Optional[int] = None) -> int:
+        """Single UPDATE over the unread index. up_to_id limits it to what the client has seen"""
+        query = update(Notification).where(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        )
+        if up_to_id is not None:
+            query = query.where(Notification.id <= up_to_id)
+        result = self.db.execute(query.values(is_read=True))
+        self.db.commit()
+        return result.rowcount
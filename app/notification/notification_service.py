@@ -0,0 +1,19 @@
+from typing import Optional
+
+from .notification_repository import NotificationRepository
+
+class NotificationService:
+    def __init__(self, db):
+        self.db = db
+
+    def get_notifications(self, user_id: int, limit: int, cursor: Optional[str], unread_only: bool) -> dict:
+        return NotificationRepository(self.db).get_notifications(user_id, limit, cursor, unread_only)
+
+    def count_unread(self, user_id: int) -> int:
+        return NotificationRepository(self.db).count_unread(user_id)
+
+    def mark_as_read(self, user_id: int, notification_id: int):
+        NotificationRepository(self.db).mark_as_read(user_id, notification_id)
+
+    def mark_all_read(self, user_id: int, up_to_id: Optional[int]) -> int:
+        return NotificationRepository(self.db).mark_all_read(user_id, up_to_id)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+class NotificationResponse(BaseModel):
+    id: int
+    date: datetime
+    text: Optional[str] = None
+    is_read: bool
+
+class NotificationPageResponse(BaseModel):
+    items: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+
+class UnreadCountResponse(BaseModel):
+    unread: int
+
+class MarkAllReadResponse(BaseModel):
+    updated: int
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from ..database import Base
+
+
+class EmailOutbox(Base):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String)
+    body = Column(String)
+    status = Column(String, default='pending') #pending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_error = Column(String)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime)
@@ -0,0 +1,64 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from .models import EmailOutbox
+
+load_dotenv()
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 6))
+EMAIL_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_RETRY_BASE_SECONDS', 30))
+EMAIL_RETRY_MAX_SECONDS = int(os.getenv('EMAIL_RETRY_MAX_SECONDS', 3600))
+EMAIL_LEASE_SECONDS = int(os.getenv('EMAIL_LEASE_SECONDS', 300))
+
+# Set on enqueue so the worker of this process doesn't wait for its next poll
+outbox_wakeup = threading.Event()
+
+class EmailOutboxRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, recipient: str, subject: str, body: str) -> int:
+        message = EmailOutbox(
+            recipient=recipient,
+            subject=subject,
+            body=body
+        )
+        self.db.add(message)
+        self.db.commit()
+        outbox_wakeup.set()
+        return message.id
+
+    def claim_due(self, batch_size: int) -> List[EmailOutbox]:
+        """Leases due messages to the caller by pushing next_attempt_at forward, so a
+        crashed worker's batch becomes due again once the lease runs out"""
+        now = datetime.now(timezone.utc)
+        messages = self.db.query(EmailOutbox).filter(
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(
+            EmailOutbox.next_attempt_at, EmailOutbox.id
+        ).limit(batch_size).with_for_update(skip_locked=True).all()
+        for message in messages:
+            message.next_attempt_at = now + timedelta(seconds=EMAIL_LEASE_SECONDS)
+        self.db.commit()
+        return messages
+
+    def mark_sent(self, message: EmailOutbox):
+        message.status = 'sent'
+        message.attempts += 1
+        message.sent_at = datetime.now(timezone.utc)
+        message.last_error = None
+        self.db.commit()
+
+    def mark_failed(self, message: EmailOutbox, error: str):
+        message.attempts += 1
+        message.last_error = error[:1000]
+        if message.attempts >= EMAIL_MAX_ATTEMPTS:
+            message.status = 'failed'
+        else:
+            delay = min(EMAIL_RETRY_BASE_SECONDS * 2 ** (message.attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+            message.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        self.db.commit()
@@ -0,0 +1,77 @@
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+
+from ..database import Sessionlocal
+from ..email_controller import SmtpConnection
+from .outbox_repository import EmailOutboxRepository, outbox_wakeup
+
+load_dotenv()
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+EMAIL_POLL_INTERVAL = float(os.getenv('EMAIL_POLL_INTERVAL', 5))
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', 60))
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutboxWorker:
+    """Background thread delivering queued emails over a single reused SMTP connection"""
+
+    def __init__(self, session_factory=Sessionlocal):
+        self.session_factory = session_factory
+        self.connection = SmtpConnection()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        outbox_wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.connection.close()
+
+    def run_once(self) -> int:
+        # Claimed rows are read after their commit, keep them loaded
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            repository = EmailOutboxRepository(db)
+            messages = repository.claim_due(EMAIL_BATCH_SIZE)
+            for message in messages:
+                try:
+                    self.connection.send(message.recipient, message.subject, message.body)
+                except Exception as e:
+                    # Not only SMTP and network errors: a message that can't be encoded must
+                    # count its attempts too, or it's leased again forever and stops the batch.
+                    # Drop the session, the next message reconnects
+                    self.connection.close()
+                    repository.mark_failed(message, f"{type(e).__name__}: {e}")
+                else:
+                    repository.mark_sent(message)
+            return len(messages)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("Ошибка обработки очереди писем")
+                processed = 0
+            if processed >= EMAIL_BATCH_SIZE:
+                continue
+            self.connection.close_if_idle(SMTP_IDLE_TIMEOUT)
+            outbox_wakeup.wait(EMAIL_POLL_INTERVAL)
+            outbox_wakeup.clear()
+
+
+outbox_worker = EmailOutboxWorker()
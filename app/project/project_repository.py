@@ -1,31 +1,50 @@
 from operator import and_
 from typing import List
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from ..exceptions import AttachmentNotFound, ProjectNotFound
-from ..user.attachment_repository import AttachmentRepository
+from ..user.attachment_repository import AttachmentRepository, invalidate_icon
 from ..project.schemas import UpdateProjectRequest
 from ..project.schemas import ProjectResponse, MyProjectResponse
 from ..models_db import Project as db_project, UserProjectAssociation
 from ..user.user_repository import UserRepository
+from ..task.models import ProjectTaskCounter, Task as db_Task
+from ..task.repositories.task_counter_repository import TaskCounterRepository
+from ..task.repositories.task_stats_repository import invalidate_project_stats
+from ..sync.tombstone_repository import TombstoneRepository
+from ..events.broker import publish_project_event
+from ..notification.notification_repository import NotificationRepository
+
+# Read from the materialized counters, projects without tasks have no counter row yet
+TASK_COUNT_COLUMNS = (
+    func.coalesce(ProjectTaskCounter.assigned, 0).label('tasks_assigned'),
+    func.coalesce(ProjectTaskCounter.in_progress, 0).label('tasks_in_progress'),
+    func.coalesce(ProjectTaskCounter.done, 0).label('tasks_done'),
+)
 
 class ProjectRepository:
     def __init__(self, db: Session):
         self.db = db
 
     def check_project_owner(self, user_id: int, project_id) -> bool:
-        project = self.db.query(db_project).filter(
-            db_project.user_id==user_id,
-            db_project.id==project_id
-        ).first()
-        user = UserRepository(self.db).get_user(user_id)
-        return project is not None or user.is_admin
+        principal = UserRepository(self.db).get_principal(user_id)
+        return principal.is_owner(project_id) or principal.is_admin
     
     def check_project_existing(self, project_id: int):
         project = self.get_project(project_id)
         if project is None:
             raise ProjectNotFound(project_id)
     
+    def get_existing_project_ids(self, project_ids) -> set[int]:
+        if not project_ids:
+            return set()
+        rows = self.db.query(db_project.id).filter(db_project.id.in_(project_ids)).all()
+        return {project_id for project_id, in rows}
+    
+    def get_project_ids(self) -> List[int]:
+        return [project_id for project_id, in self.db.query(db_project.id).order_by(db_project.id)]
+    
     def create_project(self, name, user_id) -> ProjectResponse:
         project = db_project(
         name = name,
@@ -33,6 +52,7 @@ class ProjectRepository:
         )
         self.db.add(project)
         self.db.commit()
+        UserRepository(self.db).invalidate_principal(user_id)
         return ProjectResponse(
             id=project.id,
             name=project.name,
@@ -56,11 +76,34 @@ class ProjectRepository:
             owner_id=project.user_id
         )
     
+    def get_my_projects_version(self, user_id: int) -> tuple:
+        return tuple(self.db.query(
+            func.count(db_project.id),
+            func.sum(db_project.id),
+            func.max(db_project.updated_at),
+            func.max(UserProjectAssociation.updated_at),
+            func.sum(ProjectTaskCounter.version)
+        ).outerjoin(
+            UserProjectAssociation,
+            and_(
+                UserProjectAssociation.project_id == db_project.id,
+                UserProjectAssociation.user_id == user_id
+            )
+        ).outerjoin(
+            ProjectTaskCounter, ProjectTaskCounter.project_id == db_project.id
+        ).filter(
+            db_project.user_id == user_id
+        ).one())
+    
     def get_my_projects(self, user_id: int) -> List[MyProjectResponse]:
         projects = (
         self.db.query(
-            db_project,
-            UserProjectAssociation.category_id
+            db_project.id,
+            db_project.name,
+            db_project.icon_id,
+            db_project.created_at,
+            UserProjectAssociation.category_id,
+            *TASK_COUNT_COLUMNS
         )
         .outerjoin(  
             UserProjectAssociation,
@@ -69,6 +112,7 @@ class ProjectRepository:
                 UserProjectAssociation.user_id == user_id
             )
         )
+        .outerjoin(ProjectTaskCounter, ProjectTaskCounter.project_id == db_project.id)
         .filter(
             db_project.user_id == user_id  
         )
@@ -77,19 +121,27 @@ class ProjectRepository:
         return [MyProjectResponse(
             project_id=project.id,
             project_name=project.name,
-            category_id=category_id,
+            category_id=project.category_id,
             icon_id=project.icon_id,
-            project_created_at=project.created_at
-        ) for project, category_id in projects]
+            project_created_at=project.created_at,
+            tasks_assigned=project.tasks_assigned,
+            tasks_in_progress=project.tasks_in_progress,
+            tasks_done=project.tasks_done
+        ) for project in projects]
     
     def update_project(self, project_id: int, project_data: UpdateProjectRequest):
         project = self.db.query(db_project).filter(db_project.id == project_id).first()
         if project_data.name is not None:
             project.name = project_data.name
+        replaced_icon_id = None
         if project_data.icon_id is not None:
             AttachmentRepository(self.db).check_attachment_exist(project_data.icon_id)
+            if project_data.icon_id != project.icon_id:
+                replaced_icon_id = project.icon_id
             project.icon_id = project_data.icon_id 
         self.db.commit()
+        invalidate_icon('project', project_id)
+        AttachmentRepository(self.db).release_attachment(replaced_icon_id)
         self.db.refresh(project)
 
     def delete_project(self, user_id: int, project_id: int, is_admin: bool = False) -> bool:
@@ -102,6 +154,24 @@ class ProjectRepository:
             ).first()
         if project is None:
             raise ProjectNotFound(project_id)
+        member_ids = {member_id for member_id, in self.db.query(UserProjectAssociation.user_id).filter(
+            UserProjectAssociation.project_id == project_id
+        ).all()}
+        member_ids.add(project.user_id)
+        icon_id = project.icon_id
+        # The tasks go with the project by the ORM cascade, clients are told about each of them
+        task_ids = [task_id for task_id, in self.db.query(db_Task.id).filter(db_Task.project_id == project_id)]
         self.db.delete(project)
+        TaskCounterRepository(self.db).delete_project(project_id)
+        tombstones = TombstoneRepository(self.db)
+        tombstones.record_project(project_id, [*member_ids, None])
+        tombstones.record_tasks((task_id, project_id) for task_id in task_ids)
+        NotificationRepository(self.db).add_notifications(member_ids - {user_id}, f'Project "{project.name}" deleted')
         self.db.commit()
+        for member_id in member_ids:
+            UserRepository(self.db).invalidate_principal(member_id)
+        invalidate_project_stats([project_id])
+        invalidate_icon('project', project_id)
+        AttachmentRepository(self.db).release_attachment(icon_id)
+        publish_project_event('project.deleted', project_id)
         
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import Annotated, List
 
@@ -11,9 +11,12 @@ from ...auth.auth import get_current_user
 from ...models_db import Project as db_project
 from ...models_db import Category as db_category
 from ...database import engine, Sessionlocal
+from ...etag import etag_headers, if_none_match, not_modified
 from ..schemas import CreateProjectRequest, UpdateProjectRequest
+from ...routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     prefix="/my/projects",
     tags=['MyProject']
 )
@@ -29,12 +32,16 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get('/', response_model=List[MyProjectResponse])
-async def get_my_projects(user: user_dependency, db: db_dependency):
+def get_my_projects(request: Request, response: Response, user: user_dependency, db: db_dependency):
+    etag = ProjectService(db).get_my_projects_etag(user['id'])
+    if if_none_match(request, etag):
+        return not_modified(etag)
     projects = ProjectService(db).get_my_projects(user['id'])
+    response.headers.update(etag_headers(etag))
     return projects
 
 @router.post('/', status_code=status.HTTP_201_CREATED)
-async def create_project(
+def create_project(
         project_data: CreateProjectRequest, 
         user: user_dependency, 
         db: db_dependency,
@@ -44,7 +51,7 @@ async def create_project(
         "project_id": project.id}
 
 @router.put('/{project_id}')
-async def update_project(
+def update_project(
         project_id: int, 
         project_data: UpdateProjectRequest, 
         user: user_dependency, 
@@ -54,7 +61,7 @@ async def update_project(
 
 
 @router.delete('/', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_project(
+def delete_project(
         project_id: int, 
         user: user_dependency, 
         db: db_dependency):
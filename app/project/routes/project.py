@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Annotated, List
 
-from ...project.schemas import ProjectWithMembershipResponse
+from ...project.schemas import ProjectStatsResponse, ProjectWithMembershipResponse
 from ...project.service.project_service import ProjectService
 from ...auth.auth import get_current_user
 from ...database import engine, Sessionlocal
+from ...etag import etag_headers, if_none_match, not_modified
 from ..schemas import MoveProjectRequest
+from ...routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     prefix="/projects",
     tags=['Project']
 )
@@ -24,14 +27,27 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get('/', response_model=List[ProjectWithMembershipResponse])
-async def get_projects(user: user_dependency, db: db_dependency, 
+def get_projects(request: Request, response: Response, user: user_dependency, db: db_dependency, 
     category_id: int = Query(None)):
+    etag = ProjectService(db).get_projects_etag(user['id'], category_id)
+    if if_none_match(request, etag):
+        return not_modified(etag)
     projects = ProjectService(db).get_projects(user['id'], category_id)
+    response.headers.update(etag_headers(etag))
     return projects
 
+@router.get('/stats', response_model=List[ProjectStatsResponse])
+def get_projects_stats(user: user_dependency, db: db_dependency):
+    stats = ProjectService(db).get_projects_stats(user['id'])
+    return stats
+
+@router.get('/{project_id}/stats', response_model=ProjectStatsResponse)
+def get_project_stats(project_id: int, user: user_dependency, db: db_dependency):
+    stats = ProjectService(db).get_project_stats(user['id'], project_id)
+    return stats
 
 @router.put('/{project_id}')
-async def move_project_in_category(project_id: int, request: MoveProjectRequest, 
+def move_project_in_category(project_id: int, request: MoveProjectRequest, 
     user: user_dependency, db: db_dependency):  
     ProjectService(db).move_project_in_category(user['id'], project_id, request)
     return {"detail": "Project category successfully changed"}
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from pydantic import BaseModel, Field
 
 class ProjectWithMembershipResponse(BaseModel):
@@ -9,6 +9,9 @@ class ProjectWithMembershipResponse(BaseModel):
     owner_id: int
     project_created_at: datetime
     user_joined_at: Optional[datetime]
+    tasks_assigned: int = 0
+    tasks_in_progress: int = 0
+    tasks_done: int = 0
 
 class MyProjectResponse(BaseModel):
     project_id: int
@@ -16,6 +19,9 @@ class MyProjectResponse(BaseModel):
     category_id: Optional[int] = None
     icon_id: Optional[int]
     project_created_at: datetime
+    tasks_assigned: int = 0
+    tasks_in_progress: int = 0
+    tasks_done: int = 0
 
 class ProjectResponse(BaseModel):
     id: int
@@ -32,4 +38,11 @@ class UpdateProjectRequest(BaseModel):
     icon_id: Optional[int] = Field(default=None) 
 
 class MoveProjectRequest(BaseModel):
-    category_id: Optional[int] = None
\ No newline at end of file
+    category_id: Optional[int] = None
+
+class ProjectStatsResponse(BaseModel):
+    project_id: int
+    total: int
+    by_status: Dict[str, int]
+    by_indicator: Dict[str, int]
+    by_deadline: Dict[str, int]
@@ -1,13 +1,15 @@
 from typing import List
 
 from fastapi import HTTPException
+from ...etag import make_etag
 from ...exceptions import ProjectNotFound
 from ...user.user_repository import UserRepository
 from ...project.project_repository import ProjectRepository
 from ...project.schemas import CreateProjectRequest, MoveProjectRequest, UpdateProjectRequest
-from ...project.schemas import ProjectResponse, MyProjectResponse, ProjectWithMembershipResponse
+from ...project.schemas import ProjectResponse, MyProjectResponse, ProjectStatsResponse, ProjectWithMembershipResponse
 from ...user.user_project_association_repo import UserProjectAssociation
 from ...category.category_repository import CategoryRepository
+from ...task.repositories.task_repository import TaskRepository
 
 class ProjectService:
     def __init__(self, db):
@@ -21,12 +23,36 @@ class ProjectService:
             projects = UserProjectAssociation(self.db).get_accessed_projects(user_id)
         return projects
     
+    def get_projects_etag(self, user_id: int, category_id: int) -> str:
+        version = UserProjectAssociation(self.db).get_accessed_projects_version(user_id)
+        return make_etag('projects', user_id, category_id, version)
+    
+    def get_project_stats(self, user_id: int, project_id: int) -> ProjectStatsResponse:
+        if not UserProjectAssociation(self.db).check_user_in_project(user_id, project_id):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        ProjectRepository(self.db).check_project_existing(project_id)
+        stats = TaskRepository(self.db).get_projects_stats(user_id, [project_id])
+        return ProjectStatsResponse(**stats[project_id])
+    
+    def get_projects_stats(self, user_id: int) -> List[ProjectStatsResponse]:
+        principal = UserRepository(self.db).get_principal(user_id)
+        if principal.is_admin:
+            project_ids = ProjectRepository(self.db).get_project_ids()
+        else:
+            project_ids = sorted(principal.project_roles)
+        stats = TaskRepository(self.db).get_projects_stats(user_id, project_ids)
+        return [ProjectStatsResponse(**stats[project_id]) for project_id in project_ids]
+    
     def move_project_in_category(self, user_id: int, project_id: int,
         request: MoveProjectRequest):
         category = CategoryRepository(self.db).get_category(user_id, request.category_id)
         ProjectRepository(self.db).check_project_existing(project_id)
         UserProjectAssociation(self.db).change_project_category(user_id, project_id, category.id)
         
+    def get_my_projects_etag(self, user_id: int) -> str:
+        version = ProjectRepository(self.db).get_my_projects_version(user_id)
+        return make_etag('my_projects', user_id, version)
+        
     def get_my_projects(self, user_id: int) -> List[MyProjectResponse]:
         projects = ProjectRepository(self.db).get_my_projects(user_id)
         return projects
@@ -0,0 +1,28 @@
+import functools
+import inspect
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+def _closing_sessions(endpoint):
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            for value in kwargs.values():
+                if isinstance(value, Session):
+                    value.close()
+    return wrapper
+
+class SessionRoute(APIRoute):
+    """Gives the request's connection back as soon as a sync handler returns.
+    FastAPI validates the response and runs get_db's cleanup in further threadpool slots;
+    a session left open until then holds its connection while it waits for a thread, and
+    with every thread waiting for a connection nothing moves until the pool times out.
+    A closed session still works if used again, it just takes a new connection"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not (inspect.iscoroutinefunction(endpoint) or inspect.isgeneratorfunction(endpoint)
+                or inspect.isasyncgenfunction(endpoint)):
+            endpoint = _closing_sessions(endpoint)
+        super().__init__(path, endpoint, **kwargs)
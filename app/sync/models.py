@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from ..database import Base
+
+
+class Tombstone(Base):
+    """Remembers deleted rows so that GET /sync can report them.
+    Task tombstones are visible to the members of project_id, the others only to user_id
+    (user_id is NULL for admin-wide project tombstones)"""
+    __tablename__ = 'tombstone'
+    __table_args__ = (
+        Index('ix_tombstone_project_deleted_at', 'project_id', 'deleted_at'),
+        Index('ix_tombstone_user_deleted_at', 'user_id', 'deleted_at'),
+        Index('ix_tombstone_deleted_at', 'deleted_at'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False) #task, project, category
+    entity_id = Column(Integer, nullable=False)
+    project_id = Column(Integer)
+    user_id = Column(Integer)
+    deleted_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
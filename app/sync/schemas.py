@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+from ..category.schemas import CategoryResponseSchema
+from ..task.schemas import TaskItemResponse
+
+class SyncTask(TaskItemResponse):
+    owner_id: int
+    performer_id: Optional[int] = None
+    parent_task_id: Optional[int] = None
+
+class SyncProject(BaseModel):
+    project_id: int
+    project_name: str
+    category_id: Optional[int] = None
+    owner_id: int
+    icon_id: Optional[int] = None
+    project_created_at: datetime
+    user_joined_at: Optional[datetime] = None
+
+class SyncDeleted(BaseModel):
+    entity: Literal['task', 'project', 'category']
+    id: int
+
+class SyncResponse(BaseModel):
+    # Pass back as ?since= on the next poll
+    token: str
+    # True when since was omitted, the client should replace its local data
+    full: bool
+    tasks: List[SyncTask]
+    projects: List[SyncProject]
+    categories: List[CategoryResponseSchema]
+    # Tasks of a deleted project are not listed separately
+    deleted: List[SyncDeleted]
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Annotated, Optional
+
+from ..auth.auth import get_current_user
+from ..database import Sessionlocal
+from ..responses import FastJSONResponse
+from .schemas import SyncResponse
+from .sync_service import SyncService
+from ..routing import SessionRoute
+
+router = APIRouter(
+    route_class=SessionRoute,
+    prefix="/sync",
+    tags=['Sync']
+)
+
+def get_db():
+    db = Sessionlocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+@router.get('/', response_model=SyncResponse)
+def get_changes(user: user_dependency, db: db_dependency,
+    since: Optional[str] = Query(None, description="token from the previous response, omit for a full sync")):
+    changes = SyncService(db).get_changes(user['id'], since)
+    return FastJSONResponse(changes)
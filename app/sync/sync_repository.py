@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import and_, literal, or_, select
+from sqlalchemy.orm import Session
+
+from ..models_db import Category as db_category
+from ..models_db import Project as db_project
+from ..models_db import UserProjectAssociation as db_UPA
+from ..user.schemas import Principal
+from .models import Tombstone
+
+
+class SyncRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_joined_project_ids(self, user_id: int, since: datetime) -> List[int]:
+        """Projects the user joined after since, all of their tasks are new to the client"""
+        rows = self.db.query(db_UPA.project_id).filter(
+            db_UPA.user_id == user_id,
+            db_UPA.joined_at > since
+        ).all()
+        return [project_id for project_id, in rows]
+
+    def get_changed_projects(self, principal: Principal, since: Optional[datetime]) -> List[dict]:
+        if principal.is_admin:
+            query = self.db.query(
+                db_project.id,
+                db_project.name,
+                literal(None).label('category_id'),
+                db_project.user_id,
+                db_project.icon_id,
+                db_project.created_at,
+                literal(None).label('joined_at')
+            )
+            if since is not None:
+                query = query.filter(db_project.updated_at > since)
+        else:
+            query = self.db.query(
+                db_project.id,
+                db_project.name,
+                db_UPA.category_id,
+                db_project.user_id,
+                db_project.icon_id,
+                db_project.created_at,
+                db_UPA.joined_at
+            ).join(
+                db_UPA, db_UPA.project_id == db_project.id
+            ).filter(
+                db_UPA.user_id == principal.id
+            )
+            if since is not None:
+                # A membership change (e.g. moving the project to another category) counts too
+                query = query.filter(or_(db_project.updated_at > since, db_UPA.updated_at > since))
+        return [{
+            'project_id': project.id,
+            'project_name': project.name,
+            'category_id': project.category_id,
+            'owner_id': project.user_id,
+            'icon_id': project.icon_id,
+            'project_created_at': project.created_at,
+            'user_joined_at': project.joined_at
+        } for project in query.order_by(db_project.id)]
+
+    def get_changed_categories(self, user_id: int, since: Optional[datetime]) -> List[dict]:
+        query = self.db.query(
+            db_category.id,
+            db_category.name,
+            db_category.color
+        ).filter(db_category.user_id == user_id)
+        if since is not None:
+            query = query.filter(db_category.updated_at > since)
+        return [category._asdict() for category in query.order_by(db_category.id)]
+
+    def get_deleted(self, principal: Principal, since: datetime) -> List[dict]:
+        if principal.is_admin:
+            visible = or_(Tombstone.user_id == principal.id, Tombstone.user_id.is_(None))
+        else:
+            # The tasks of a deleted project are no longer in project_roles, they are
+            # visible through the project tombstone recorded for the user
+            deleted_projects = select(Tombstone.project_id).where(
+                Tombstone.user_id == principal.id,
+                Tombstone.entity == 'project',
+                Tombstone.deleted_at > since
+            )
+            visible = or_(
+                Tombstone.user_id == principal.id,
+                and_(
+                    Tombstone.user_id.is_(None),
+                    Tombstone.entity == 'task',
+                    or_(
+                        Tombstone.project_id.in_(list(principal.project_roles)),
+                        Tombstone.project_id.in_(deleted_projects)
+                    )
+                )
+            )
+        rows = self.db.query(
+            Tombstone.entity,
+            Tombstone.entity_id
+        ).filter(
+            visible,
+            Tombstone.deleted_at > since
+        ).order_by(Tombstone.id).all()
+        return [{'entity': entity, 'id': entity_id} for entity, entity_id in rows]
@@ -0,0 +1,76 @@
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from dotenv import load_dotenv
+
+from ..exceptions import InvalidSyncToken
+from ..task.repositories.task_repository import TaskRepository
+from ..user.user_repository import UserRepository
+from .sync_repository import SyncRepository
+from .tombstone_repository import TombstoneRepository
+
+load_dotenv()
+# Transactions that started before a poll may commit right after it with an older timestamp,
+# so every poll reaches back this far. Clients apply changes idempotently anyway
+SYNC_OVERLAP_SECONDS = float(os.getenv('SYNC_OVERLAP_SECONDS', 5))
+# Older tombstones are pruned, a token from before that gets a full sync instead
+SYNC_TOMBSTONE_RETENTION_DAYS = float(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+TOMBSTONE_PRUNE_INTERVAL = timedelta(hours=1)
+
+_pruned_at = None
+_prune_lock = threading.Lock()
+
+def _encode_token(value: datetime) -> str:
+    raw = json.dumps({'t': value.isoformat()}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_token(token: str) -> datetime:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value = datetime.fromisoformat(json.loads(raw)['t'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidSyncToken()
+    if value.tzinfo is None:
+        raise InvalidSyncToken()
+    return value
+
+def _prune_tombstones(db, before: datetime):
+    """Done by the polls themselves, at most once per interval in a process"""
+    global _pruned_at
+    with _prune_lock:
+        if _pruned_at is not None and before - _pruned_at < TOMBSTONE_PRUNE_INTERVAL:
+            return
+        _pruned_at = before
+    TombstoneRepository(db).prune(before)
+
+class SyncService:
+    def __init__(self, db):
+        self.db = db
+
+    def get_changes(self, user_id: int, token: Optional[str]) -> dict:
+        # Taken before reading, anything committed during the reads is picked up next time
+        now = datetime.now(timezone.utc)
+        retained_since = now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+        since = None
+        if token:
+            since = _decode_token(token) - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+            if since < retained_since:
+                # Deletions since then may be pruned already
+                since = None
+        _prune_tombstones(self.db, retained_since)
+        principal = UserRepository(self.db).get_principal(user_id)
+        repository = SyncRepository(self.db)
+        joined = []
+        if since is not None and not principal.is_admin:
+            joined = repository.get_joined_project_ids(user_id, since)
+        return {
+            'token': _encode_token(now),
+            'full': since is None,
+            'tasks': TaskRepository(self.db).get_changed_tasks(user_id, since, joined),
+            'projects': repository.get_changed_projects(principal, since),
+            'categories': repository.get_changed_categories(user_id, since),
+            'deleted': repository.get_deleted(principal, since) if since is not None else []
+        }
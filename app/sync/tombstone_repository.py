@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from .models import Tombstone
+
+
+class TombstoneRepository:
+    """Records deletions, the caller commits them together with the delete itself"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _record(self, rows: list):
+        if rows:
+            deleted_at = datetime.now(timezone.utc)
+            self.db.execute(insert(Tombstone), [{**row, 'deleted_at': deleted_at} for row in rows])
+
+    def record_tasks(self, tasks: Iterable[tuple]):
+        """tasks: (task_id, project_id) pairs"""
+        self._record([
+            {'entity': 'task', 'entity_id': task_id, 'project_id': project_id, 'user_id': None}
+            for task_id, project_id in tasks
+        ])
+
+    def record_project(self, project_id: int, user_ids: Iterable[Optional[int]]):
+        """Project gone for these users, None stands for every admin"""
+        self._record([
+            {'entity': 'project', 'entity_id': project_id, 'project_id': project_id, 'user_id': user_id}
+            for user_id in user_ids
+        ])
+
+    def record_category(self, category_id: int, user_id: int):
+        self._record([{'entity': 'category', 'entity_id': category_id, 'project_id': None, 'user_id': user_id}])
+
+    def prune(self, before: datetime) -> int:
+        """Drops tombstones older than before, commits"""
+        result = self.db.execute(delete(Tombstone).where(Tombstone.deleted_at < before))
+        self.db.commit()
+        return result.rowcount
@@ -2,16 +2,29 @@
 
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
 from ..database import Base
 
+DEFAULT_TASK_STATUS = 'Назначена'
+
 class Task(Base):
     __tablename__ = 'task'
+    __table_args__ = (
+        # project_id leads because the ACL join in get_accessed_tasks_filter restricts on it,
+        # the trailing sort column + id serve the keyset pagination order
+        Index('ix_task_project_created_at', 'project_id', 'created_at', 'id'),
+        Index('ix_task_project_last_change', 'project_id', 'last_change', 'id'),
+        Index('ix_task_project_deadline', 'project_id', 'deadline', 'id'),
+        Index('ix_task_project_status', 'project_id', 'status'),
+        Index('ix_task_performer_status', 'performer_id', 'status'),
+        Index('ix_task_owner_id', 'owner_id'),
+        Index('ix_task_parent_task_id', 'parent_task_id'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String)
     description = Column(String) 
     indicator = Column(String) #Индикатор важности: red, orange, yellow, green
-    status = Column(String, default='Назначена') #Назначена, В работе, Выполнена
+    status = Column(String, default=DEFAULT_TASK_STATUS) #Назначена, В работе, Выполнена
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     last_change = Column(DateTime, default=lambda: datetime.now(timezone.utc)) 
     deadline = Column(DateTime) 
@@ -29,3 +42,22 @@ class Task(Base):
 
     # 1:M
     subtasks = relationship("Task", back_populates="parent_task", cascade="all, delete-orphan")
+
+
+class ProjectTaskCounter(Base):
+    """Task counts by status, kept up to date by TaskRepository in the same transaction as the task writes"""
+    __tablename__ = 'project_task_counter'
+    project_id = Column(Integer, ForeignKey('project.id', ondelete="CASCADE"), primary_key=True)
+    assigned = Column(Integer, nullable=False, default=0)
+    in_progress = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
+    # Bumped on every change, project list ETags are built from it
+    version = Column(Integer, default=0)
+
+class PerformerTaskCounter(Base):
+    __tablename__ = 'performer_task_counter'
+    performer_id = Column(Integer, ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    project_id = Column(Integer, ForeignKey('project.id', ondelete="CASCADE"), primary_key=True)
+    assigned = Column(Integer, nullable=False, default=0)
+    in_progress = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,125 @@
+from collections import Counter, defaultdict
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import case, delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models import PerformerTaskCounter, ProjectTaskCounter
+from ..models import Task as db_Task
+
+STATUS_COLUMNS = {
+    'Назначена': 'assigned',
+    'В работе': 'in_progress',
+    'Выполнена': 'done',
+}
+COUNTER_COLUMNS = tuple(STATUS_COLUMNS.values())
+
+# (project_id, performer_id, status, +1 or -1)
+CounterChange = Tuple[Optional[int], Optional[int], Optional[str], int]
+
+def task_change(project_id, performer_id, status, old: Optional[tuple] = None) -> list[CounterChange]:
+    """Changes moving a task from old (project_id, performer_id, status) to the given state,
+    empty if nothing the counters depend on has changed"""
+    new = (project_id, performer_id, status)
+    if old == new:
+        return []
+    changes = [(*new, 1)]
+    if old is not None:
+        changes.append((*old, -1))
+    return changes
+
+def _counts_select(*group_by):
+    counts = [
+        func.sum(case((db_Task.status == task_status, 1), else_=0)).label(column)
+        for task_status, column in STATUS_COLUMNS.items()
+    ]
+    return select(*group_by, *counts).group_by(*group_by)
+
+def rebuild_task_counters(connection):
+    """Recomputes every counter from the task table, repairs any drift.
+    Performer rows exist only while they count something, as apply() leaves them.
+    Project rows are kept, zeroed if the project has no tasks left, and their version
+    is bumped: project list ETags are built from its sum, it must never go back"""
+    connection.execute(delete(PerformerTaskCounter))
+    connection.execute(insert(PerformerTaskCounter).from_select(
+        ['performer_id', 'project_id', *COUNTER_COLUMNS],
+        _counts_select(db_Task.performer_id, db_Task.project_id).where(
+            db_Task.performer_id.is_not(None), db_Task.project_id.is_not(None)
+        )
+    ))
+    counts = _counts_select(db_Task.project_id).where(db_Task.project_id.is_not(None)).subquery()
+    connection.execute(update(ProjectTaskCounter).values(
+        **{column: func.coalesce(
+            select(counts.c[column]).where(counts.c.project_id == ProjectTaskCounter.project_id).scalar_subquery(), 0
+        ) for column in COUNTER_COLUMNS},
+        version=func.coalesce(ProjectTaskCounter.version, 0) + 1
+    ))
+    connection.execute(insert(ProjectTaskCounter).from_select(
+        ['project_id', *COUNTER_COLUMNS, 'version'],
+        select(counts.c.project_id, *(counts.c[column] for column in COUNTER_COLUMNS), literal(1)).where(
+            counts.c.project_id.not_in(select(ProjectTaskCounter.project_id))
+        )
+    ))
+
+class TaskCounterRepository:
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    def apply(self, changes: Iterable[CounterChange]):
+        """Sums the changes up and writes one upsert per affected counter row,
+        the caller commits together with the task rows"""
+        projects = defaultdict(Counter)
+        performers = defaultdict(Counter)
+        for project_id, performer_id, task_status, delta in changes:
+            column = STATUS_COLUMNS.get(task_status)
+            if column is None or project_id is None:
+                continue
+            projects[project_id][column] += delta
+            if performer_id is not None:
+                performers[(performer_id, project_id)][column] += delta
+        for project_id, deltas in projects.items():
+            self._add(ProjectTaskCounter, {'project_id': project_id}, deltas)
+        for (performer_id, project_id), deltas in performers.items():
+            self._add(PerformerTaskCounter, {'performer_id': performer_id, 'project_id': project_id}, deltas)
+        # A performer row that counts nothing is dropped, the same as a rebuild leaves it.
+        # Only rows that went down in every changed column may have reached zero
+        decreased = [key for key, deltas in performers.items() if min(deltas.values()) < 0 and max(deltas.values()) <= 0]
+        if decreased:
+            self.db.execute(delete(PerformerTaskCounter).where(
+                tuple_(PerformerTaskCounter.performer_id, PerformerTaskCounter.project_id).in_(decreased),
+                *(getattr(PerformerTaskCounter, column) == 0 for column in COUNTER_COLUMNS)
+            ))
+
+    def _add(self, counter, keys: dict, deltas: Counter):
+        if not any(deltas.values()):
+            return
+        values = {column: deltas[column] for column in COUNTER_COLUMNS}
+        increments = {column: getattr(counter, column) + value for column, value in values.items()}
+        versioned = hasattr(counter, 'version')
+        if versioned:
+            values['version'] = 1
+            increments['version'] = func.coalesce(counter.version, 0) + 1
+        if self.dialect in ('postgresql', 'sqlite'):
+            dialect_insert = pg_insert if self.dialect == 'postgresql' else sqlite_insert
+            statement = dialect_insert(counter).values(**keys, **values)
+            set_ = {column: getattr(counter, column) + statement.excluded[column] for column in COUNTER_COLUMNS}
+            if versioned:
+                set_['version'] = increments['version']
+            self.db.execute(statement.on_conflict_do_update(index_elements=list(keys), set_=set_))
+            return
+        result = self.db.execute(update(counter).filter_by(**keys).values(increments))
+        if result.rowcount == 0:
+            self.db.execute(insert(counter).values(**keys, **values))
+
+    def delete_project(self, project_id: int):
+        self.db.execute(delete(PerformerTaskCounter).where(PerformerTaskCounter.project_id == project_id))
+        self.db.execute(delete(ProjectTaskCounter).where(ProjectTaskCounter.project_id == project_id))
+
+
+if __name__ == '__main__':
+    from ...database import engine
+    with engine.begin() as connection:
+        rebuild_task_counters(connection)
+    print("Счётчики задач пересчитаны")
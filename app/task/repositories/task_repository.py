@@ -1,20 +1,131 @@
+import base64
+import json
+from collections import defaultdict
 from datetime import datetime, timezone
-from typing import List, Optional
-from sqlalchemy import asc, desc
+from typing import Dict, List, Optional
+from sqlalchemy import and_, asc, desc, func, insert, literal, or_, select, update
 from sqlalchemy.orm import Session, joinedload, aliased
 
-from ...exceptions import TaskNotFound, UserNotFound
-from ..schemas import TaskCreateRequest, TaskDetailResponse, TaskFilters, TaskItemResponse, TaskItemWithAuthorResponse, TaskUpdateRequest
-from ..models import Task as db_Task
+from ...exceptions import InvalidCursor, TaskNotFound, UserNotFound
+from ..schemas import TaskBatchCreateItem, TaskBatchUpdateItem, TaskCreateRequest, TaskDetailResponse, TaskFilters, TaskItemResponse, TaskItemWithAuthorResponse, TaskSearchResult, TaskTreeNode, TaskUpdateRequest
+from ..models import DEFAULT_TASK_STATUS, Task as db_Task
 from ...models_db import Project, User, UserProjectAssociation
 from ...user.user_repository import UserRepository
+from .task_search_repository import TaskSearchRepository
+from ...sync.tombstone_repository import TombstoneRepository
+from .task_counter_repository import TaskCounterRepository, task_change
+from .task_stats_repository import TaskStatsRepository, invalidate_project_stats
+from ...events.broker import publish_task_event
+from ...notification.notification_repository import NotificationRepository
 
 User_owner = aliased(User)
 User_performer = aliased(User)
 
+DEFAULT_PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 1000
+MAX_TREE_DEPTH = 50
+SORT_FIELDS = {
+    'created_at': db_Task.created_at,
+    'last_change': db_Task.last_change,
+    'deadline': db_Task.deadline,
+}
+
+EXPORT_COLUMNS = (
+    db_Task.id,
+    db_Task.name,
+    db_Task.status,
+    db_Task.indicator,
+    db_Task.created_at,
+    db_Task.last_change,
+    db_Task.deadline,
+    db_Task.description,
+    db_Task.project_id,
+    db_Task.owner_id,
+    db_Task.performer_id,
+    db_Task.parent_task_id,
+)
+
+# Fields of TaskItemResponse, list endpoints return these rows without building models.
+# Large text columns are only selected when asked for via TaskFilters.fields
+TASK_ITEM_COLUMNS = (
+    db_Task.id,
+    db_Task.name,
+    db_Task.status,
+    db_Task.indicator,
+    db_Task.created_at,
+    db_Task.last_change,
+    db_Task.deadline,
+    db_Task.project_id,
+)
+TASK_OPTIONAL_COLUMNS = {
+    'description': db_Task.description,
+}
+
+def _item_columns(filters: Optional[TaskFilters]) -> tuple:
+    requested = (filters.fields if filters else None) or ()
+    return TASK_ITEM_COLUMNS + tuple(TASK_OPTIONAL_COLUMNS[field] for field in requested)
+
+def rows_version(rows: List[dict]) -> tuple:
+    """get_accessed_tasks_version of rows already read, without another query"""
+    return (
+        len(rows),
+        sum(row['id'] for row in rows) if rows else None,
+        max((row['last_change'] for row in rows if row['last_change'] is not None), default=None)
+    )
+
+def _ordering(sort_by: Optional[str], descending: bool) -> tuple:
+    # id breaks ties, keyset pages and exports rely on a total order
+    sort_field = SORT_FIELDS.get(sort_by)
+    order_id = db_Task.id.desc() if descending else db_Task.id.asc()
+    if sort_field is None:
+        return (order_id,)
+    order_field = sort_field.desc() if descending else sort_field.asc()
+    return (order_field.nulls_last(), order_id)
+
+def _encode_cursor(sort_by: Optional[str], value: Optional[datetime], task_id: int) -> str:
+    payload = {
+        's': sort_by,
+        'v': value.isoformat() if value is not None else None,
+        'id': task_id
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort_by: Optional[str]) -> tuple[Optional[datetime], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload['v']) if payload['v'] is not None else None
+        task_id = int(payload['id'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor()
+    if payload.get('s') != sort_by:
+        raise InvalidCursor()
+    return value, task_id
+
+def _after_cursor(sort_field, descending: bool, value: Optional[datetime], last_id: int):
+    # Rows are ordered by (sort_field NULLS LAST, id), so NULL values form the tail of the list
+    id_after = db_Task.id < last_id if descending else db_Task.id > last_id
+    if sort_field is None:
+        return id_after
+    if value is None:
+        return and_(sort_field.is_(None), id_after)
+    beyond = sort_field < value if descending else sort_field > value
+    return or_(beyond, and_(sort_field == value, id_after), sort_field.is_(None))
+
 class TaskRepository:
     def __init__(self, db: Session):
         self.db = db
+
+    def _notify(self, texts_by_project: Dict[int, List[str]], user_id: Optional[int], summary: str = ''):
+        """One notification per project and write, a batch touching several tasks is summed up.
+        Members other than user_id get it in the caller's transaction"""
+        notifications = NotificationRepository(self.db)
+        for project_id, texts in texts_by_project.items():
+            if project_id is None or not texts:
+                continue
+            text = texts[0] if len(texts) == 1 else summary.format(count=len(texts))
+            notifications.notify_project(project_id, text, exclude_user_id=user_id)
     
     def get_task(self, task_id: int) -> TaskDetailResponse:
         result = (
@@ -64,6 +175,26 @@ class TaskRepository:
             parent_task_id=task.parent_task_id
         )
 
+    def get_task_version(self, task_id: int) -> tuple:
+        """(project_id, version) where version covers every row get_task reads from"""
+        row = (
+        self.db.query(
+            db_Task.project_id,
+            db_Task.last_change,
+            User.updated_at,
+            User_performer.updated_at,
+            Project.updated_at
+        )
+        .filter(db_Task.id == task_id)
+        .join(User, db_Task.owner_id == User.id)
+        .outerjoin(User_performer, db_Task.performer_id == User_performer.id)
+        .join(Project, db_Task.project_id == Project.id)
+        .first()
+        )
+        if not row:
+            raise TaskNotFound(task_id)
+        return row[0], tuple(row)
+
     # def get_user_tasks(self, user_id: str) -> list[db_Task]:
     #     tasks = self.db.query(
     #         db_Task.id,
@@ -84,9 +215,84 @@ class TaskRepository:
     #     ).all()
     #     return tasks
 
+    def _subtree_rows(self, task_id: int, max_depth: Optional[int] = None):
+        """The task and all of its descendants in one WITH RECURSIVE query, ordered by depth"""
+        tree = select(
+            db_Task.id,
+            db_Task.name,
+            db_Task.status,
+            db_Task.indicator,
+            db_Task.deadline,
+            db_Task.project_id,
+            db_Task.parent_task_id,
+            db_Task.performer_id,
+            literal(0).label('depth')
+        ).where(db_Task.id == task_id).cte('task_tree', recursive=True)
+        child = aliased(db_Task)
+        depth_limit = MAX_TREE_DEPTH if max_depth is None else min(max_depth, MAX_TREE_DEPTH)
+        tree = tree.union_all(
+            select(
+                child.id,
+                child.name,
+                child.status,
+                child.indicator,
+                child.deadline,
+                child.project_id,
+                child.parent_task_id,
+                child.performer_id,
+                tree.c.depth + 1
+            ).join(
+                tree, child.parent_task_id == tree.c.id
+            ).where(tree.c.depth < depth_limit)
+        )
+        return self.db.execute(select(tree).order_by(tree.c.depth, tree.c.id)).all()
+
+    def _cascade_rows(self, task_id: int):
+        """The task and every descendant however deep, the rows the ORM cascade deletes with it.
+        Not capped like _subtree_rows, so UNION: a cycle in parent_task_id can't loop forever"""
+        tree = select(
+            db_Task.id,
+            db_Task.status,
+            db_Task.project_id,
+            db_Task.performer_id
+        ).where(db_Task.id == task_id).cte('task_cascade', recursive=True)
+        child = aliased(db_Task)
+        tree = tree.union(
+            select(
+                child.id,
+                child.status,
+                child.project_id,
+                child.performer_id
+            ).join(tree, child.parent_task_id == tree.c.id)
+        )
+        return self.db.execute(select(tree).order_by(tree.c.id)).all()
+
+    def get_task_tree(self, task_id: int, max_depth: Optional[int] = None) -> TaskTreeNode:
+        rows = self._subtree_rows(task_id, max_depth)
+        if not rows:
+            raise TaskNotFound(task_id)
+        nodes = {}
+        for row in rows:
+            nodes[row.id] = {
+                **row._asdict(),
+                'status_counts': {row.status: 1},
+                'earliest_deadline': row.deadline,
+                'subtasks': []
+            }
+        # Deepest rows first, so every child is complete before it is folded into its parent
+        for row in reversed(rows[1:]):
+            node, parent = nodes[row.id], nodes[row.parent_task_id]
+            parent['subtasks'].insert(0, node)
+            for task_status, count in node['status_counts'].items():
+                parent['status_counts'][task_status] = parent['status_counts'].get(task_status, 0) + count
+            if node['earliest_deadline'] is not None and (
+                parent['earliest_deadline'] is None or node['earliest_deadline'] < parent['earliest_deadline']):
+                parent['earliest_deadline'] = node['earliest_deadline']
+        return TaskTreeNode(**nodes[rows[0].id])
+
     def get_project_tasks(self, project_id: int) -> List[TaskItemWithAuthorResponse]:
         tasks = self.db.query(
-            db_Task,
+            *TASK_ITEM_COLUMNS,
             User.login.label('author_email'), 
             User.username.label('author_name')
         ).join(
@@ -96,13 +302,7 @@ class TaskRepository:
             db_Task.project_id == project_id
         ).all()
 
-        return [
-            TaskItemWithAuthorResponse(
-                **task.__dict__,  
-                author_email=author_email,
-                author_name=author_name
-            ) for task, author_email, author_name in tasks
-       ]   
+        return [TaskItemWithAuthorResponse(**task._asdict()) for task in tasks]
     
     def get_owner_task(self, task_id: int, user_id: int) -> Optional[TaskItemResponse]:
         query = self.db.query(db_Task)
@@ -129,8 +329,7 @@ class TaskRepository:
             project_id=task.project_id
         )
     
-    def get_accessed_tasks_filter(self, user_id: int, 
-        filters: Optional[TaskFilters] = None) -> List[TaskItemResponse]:
+    def _accessed_tasks_query(self, user_id: int, filters: Optional[TaskFilters] = None):
         if UserRepository(self.db).check_admin_perms(user_id):
             query = self.db.query(db_Task)
         else:
@@ -155,37 +354,78 @@ class TaskRepository:
                 query = query.filter(db_Task.owner_id == filters.owner_id)
             if filters.parent_task_id:
                 query = query.filter(db_Task.parent_task_id == filters.parent_task_id)
-            if filters.sort_by:
-                sort_field = None
-                if filters.sort_by == "created_at":
-                    sort_field = db_Task.created_at
-                elif filters.sort_by == "last_change":
-                    sort_field = db_Task.last_change
-                elif filters.sort_by == "deadline":
-                    sort_field = db_Task.deadline
-                if sort_field:
-                    if filters.sort_order == "desc":
-                        query = query.order_by(desc(sort_field))
-                    else:
-                        query = query.order_by(asc(sort_field))
-        tasks = query.all()
-        return [
-            TaskItemResponse(
-                id=task.id,
-                name=task.name,
-                status=task.status,
-                indicator=task.indicator,
-                created_at=task.created_at,
-                last_change=task.last_change,
-                deadline=task.deadline,
-                description=task.description,
-                project_id=task.project_id,
-                owner_id=task.owner_id,
-                performer_id=task.performer_id,
-                parent_task_id=task.parent_task_id
-            ) for task in tasks
-        ]
-    
+        return query
+
+    def get_accessed_tasks_version(self, user_id: int, filters: Optional[TaskFilters] = None) -> tuple:
+        """Changes whenever a task is added to, removed from or updated in the filtered set"""
+        return tuple(self._accessed_tasks_query(user_id, filters).with_entities(
+            func.count(db_Task.id),
+            func.sum(db_Task.id),
+            func.max(db_Task.last_change)
+        ).one())
+
+    def get_accessed_tasks_filter(self, user_id: int, 
+        filters: Optional[TaskFilters] = None) -> List[dict]:
+        query = self._accessed_tasks_query(user_id, filters).with_entities(*_item_columns(filters))
+        if filters and filters.sort_by:
+            sort_field = SORT_FIELDS.get(filters.sort_by)
+            if sort_field is not None:
+                if filters.sort_order == "desc":
+                    query = query.order_by(desc(sort_field))
+                else:
+                    query = query.order_by(asc(sort_field))
+        return [row._asdict() for row in query.all()]
+
+    def get_accessed_tasks_page(self, user_id: int, 
+        filters: TaskFilters) -> dict:
+        """TaskPageResponse shaped dict of plain rows"""
+        query = self._accessed_tasks_query(user_id, filters).with_entities(*_item_columns(filters))
+        sort_field = SORT_FIELDS.get(filters.sort_by)
+        descending = filters.sort_order == "desc"
+        limit = filters.limit or DEFAULT_PAGE_SIZE
+        if filters.cursor:
+            value, last_id = _decode_cursor(filters.cursor, filters.sort_by)
+            query = query.filter(_after_cursor(sort_field, descending, value, last_id))
+        tasks = [row._asdict() for row in query.order_by(*_ordering(filters.sort_by, descending)).limit(limit + 1)]
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            last_value = last[filters.sort_by] if sort_field is not None else None
+            next_cursor = _encode_cursor(filters.sort_by, last_value, last['id'])
+        return {'items': tasks, 'next_cursor': next_cursor}
+
+    def iter_accessed_tasks(self, user_id: int, filters: Optional[TaskFilters] = None,
+        batch_size: int = EXPORT_BATCH_SIZE):
+        """EXPORT_COLUMNS rows read from a server-side cursor once iterated, at most one batch
+        is held in memory. The query is built here, the rows are only fetched by the caller"""
+        query = self._accessed_tasks_query(user_id, filters).with_entities(*EXPORT_COLUMNS)
+        sort_by = filters.sort_by if filters else None
+        descending = bool(filters) and filters.sort_order == "desc"
+        query = query.order_by(*_ordering(sort_by, descending))
+        return query.execution_options(yield_per=batch_size)
+
+    def get_changed_tasks(self, user_id: int, since: Optional[datetime],
+        joined_project_ids: List[int]) -> List[dict]:
+        """Tasks changed after since plus every task of the projects joined since then"""
+        query = self._accessed_tasks_query(user_id).with_entities(*EXPORT_COLUMNS)
+        if since is not None:
+            changed = db_Task.last_change > since
+            if joined_project_ids:
+                changed = or_(changed, db_Task.project_id.in_(joined_project_ids))
+            query = query.filter(changed)
+        return [row._asdict() for row in query.order_by(db_Task.id)]
+
+    def get_projects_stats(self, user_id: int, project_ids: List[int]) -> Dict[int, dict]:
+        return TaskStatsRepository(self.db).get_stats(self._accessed_tasks_query(user_id), project_ids)
+
+    def search_tasks(self, user_id: int, query: str, project_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE) -> List[TaskSearchResult]:
+        accessed = self._accessed_tasks_query(user_id)
+        if project_id:
+            accessed = accessed.filter(db_Task.project_id == project_id)
+        return TaskSearchRepository(self.db).search(accessed, query, limit)
+
     def create_task(self, project_id: int, task_data: TaskCreateRequest, user_id: int) -> int:
         task = db_Task(
             name=task_data.name,
@@ -198,11 +438,99 @@ class TaskRepository:
             parent_task_id=task_data.parent_task_id
         )
         self.db.add(task)
+        self.db.flush()
+        TaskSearchRepository(self.db).index_task(task.id, task.name, task.description)
+        TaskCounterRepository(self.db).apply(task_change(project_id, task.performer_id, task.status))
+        self._notify({project_id: [f'New task "{task.name}"']}, user_id)
         self.db.commit()
+        invalidate_project_stats([project_id])
+        publish_task_event('task.created', {project_id: [task.id]})
         return task.id
 
-    def update_task(self, task_id: int, task_data: TaskUpdateRequest) -> int:
+    def create_tasks(self, user_id: int, items: List[TaskBatchCreateItem]) -> List[int]:
+        """Inserts all tasks in one transaction, performers must already be validated"""
+        values = [
+            {
+                'name': item.name,
+                'description': item.description,
+                'deadline': item.deadline,
+                'indicator': item.indicator,
+                'owner_id': user_id,
+                'performer_id': item.performer_id,
+                'project_id': item.project_id,
+                'parent_task_id': item.parent_task_id
+            } for item in items
+        ]
+        # Core-level bulk insert: the self-referential parent_task relationship would make
+        # the unit of work emit one INSERT per task
+        task_ids = self.db.scalars(
+            insert(db_Task).returning(db_Task.id, sort_by_parameter_order=True), values
+        ).all()
+        TaskSearchRepository(self.db).index_tasks([
+            (task_id, item.name, item.description) for task_id, item in zip(task_ids, items)
+        ])
+        TaskCounterRepository(self.db).apply(
+            change for item in items
+            for change in task_change(item.project_id, item.performer_id, DEFAULT_TASK_STATUS)
+        )
+        created = defaultdict(list)
+        for item in items:
+            created[item.project_id].append(f'New task "{item.name}"')
+        self._notify(created, user_id, '{count} new tasks')
+        self.db.commit()
+        invalidate_project_stats(item.project_id for item in items)
+        created_ids = defaultdict(list)
+        for task_id, item in zip(task_ids, items):
+            created_ids[item.project_id].append(task_id)
+        publish_task_event('task.created', created_ids)
+        return list(task_ids)
+
+    def get_tasks_by_ids(self, task_ids) -> Dict[int, db_Task]:
+        if not task_ids:
+            return {}
+        tasks = self.db.query(db_Task).filter(db_Task.id.in_(task_ids)).all()
+        return {task.id: task for task in tasks}
+
+    def update_tasks(self, items: List[TaskBatchUpdateItem], tasks: Dict[int, db_Task],
+        performer_ids: set[int], user_id: Optional[int] = None):
+        """Bulk UPDATE by primary key in one transaction, same field rules as update_task"""
+        now = datetime.now(timezone.utc)
+        values, indexed, counted = [], [], []
+        status_changes = defaultdict(list)
+        for item in items:
+            task = tasks[item.id]
+            row = {'id': item.id, 'last_change': now}
+            for field in ('name', 'description', 'deadline', 'indicator'):
+                value = getattr(item, field)
+                if value is not None:
+                    row[field] = value
+            if item.performer_id is not None and item.performer_id in performer_ids:
+                row['performer_id'] = item.performer_id
+            if item.status:
+                row['status'] = item.status
+                if item.status != task.status:
+                    status_changes[task.project_id].append(f'Task "{row.get("name", task.name)}": {item.status}')
+            values.append(row)
+            indexed.append((item.id, row.get('name', task.name), row.get('description', task.description)))
+            counted += task_change(
+                task.project_id, row.get('performer_id', task.performer_id), row.get('status', task.status),
+                old=(task.project_id, task.performer_id, task.status)
+            )
+        if values:
+            self.db.execute(update(db_Task), values)
+        TaskSearchRepository(self.db).index_tasks(indexed)
+        TaskCounterRepository(self.db).apply(counted)
+        self._notify(status_changes, user_id, '{count} tasks changed status')
+        self.db.commit()
+        invalidate_project_stats(tasks[item.id].project_id for item in items)
+        updated = defaultdict(list)
+        for item in items:
+            updated[tasks[item.id].project_id].append(item.id)
+        publish_task_event('task.updated', updated)
+
+    def update_task(self, task_id: int, task_data: TaskUpdateRequest, user_id: Optional[int] = None) -> int:
         task = self.db.query(db_Task).filter(db_Task.id == task_id).first()
+        counted_state = (task.project_id, task.performer_id, task.status)
         if task_data.name is not None:
             task.name = task_data.name
         if task_data.description is not None:
@@ -217,14 +545,34 @@ class TaskRepository:
                 pass
         if task_data.indicator is not None:
             task.indicator = task_data.indicator
-        if task_data.status:
+        if task_data.status and task_data.status != task.status:
             task.status = task_data.status
+            self._notify({task.project_id: [f'Task "{task.name}": {task.status}']}, user_id)
         task.last_change = datetime.now(timezone.utc)
+        TaskSearchRepository(self.db).index_task(task.id, task.name, task.description)
+        TaskCounterRepository(self.db).apply(
+            task_change(task.project_id, task.performer_id, task.status, old=counted_state)
+        )
         self.db.commit()
+        invalidate_project_stats([task.project_id])
+        publish_task_event('task.updated', {task.project_id: [task_id]})
         self.db.refresh(task)
         return task.id
     
-    def delete_task(self, task_id: int):
+    def delete_task(self, task_id: int, user_id: Optional[int] = None):
         task = self.db.query(db_Task).filter(db_Task.id == task_id).first()
+        project_id = task.project_id
+        # The subtasks are removed by the ORM cascade, their counters and search rows go too
+        subtree = self._cascade_rows(task_id)
         self.db.delete(task)
-        self.db.commit()
\ No newline at end of file
+        search = TaskSearchRepository(self.db)
+        for row in subtree:
+            search.remove_task(row.id)
+        TaskCounterRepository(self.db).apply(
+            (row.project_id, row.performer_id, row.status, -1) for row in subtree
+        )
+        TombstoneRepository(self.db).record_tasks((row.id, row.project_id) for row in subtree)
+        self._notify({project_id: [f'Task "{task.name}" deleted']}, user_id)
+        self.db.commit()
+        invalidate_project_stats([project_id])
+        publish_task_event('task.deleted', {project_id: [row.id for row in subtree]})
\ No newline at end of file
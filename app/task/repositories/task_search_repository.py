@@ -0,0 +1,89 @@
+import re
+from typing import List, Optional
+from sqlalchemy import column, func, literal, literal_column, or_, table, text
+from sqlalchemy.orm import Session
+
+from ..models import Task as db_Task
+from ..schemas import TaskSearchResult
+
+# Must stay identical to the expression of ix_task_search_vector (see migrations), otherwise
+# PostgreSQL will not match the query against the index
+SEARCH_VECTOR_SQL = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+SEARCH_VECTOR = literal_column(
+    "to_tsvector('simple', coalesce(task.name, '') || ' ' || coalesce(task.description, ''))"
+)
+
+task_fts = table('task_fts', column('rowid'))
+
+def _fts5_query(query: str) -> str:
+    # Quote every word so user input can't inject FTS5 operators, '*' enables prefix matching
+    words = re.findall(r'\w+', query)
+    return ' '.join('"' + word + '"*' for word in words)
+
+class TaskSearchRepository:
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    def index_task(self, task_id: int, name: Optional[str], description: Optional[str]):
+        """SQLite keeps a task_fts shadow table in sync, PostgreSQL indexes the task table itself"""
+        if self.dialect != 'sqlite':
+            return
+        self.remove_task(task_id)
+        self.db.execute(
+            text('INSERT INTO task_fts(rowid, name, description) VALUES (:id, :name, :description)'),
+            {'id': task_id, 'name': name or '', 'description': description or ''}
+        )
+
+    def index_tasks(self, rows: List[tuple]):
+        """Batched index_task for (id, name, description) rows"""
+        if self.dialect != 'sqlite' or not rows:
+            return
+        self.db.execute(text('DELETE FROM task_fts WHERE rowid = :id'), [{'id': row[0]} for row in rows])
+        self.db.execute(
+            text('INSERT INTO task_fts(rowid, name, description) VALUES (:id, :name, :description)'),
+            [{'id': task_id, 'name': name or '', 'description': description or ''} for task_id, name, description in rows]
+        )
+
+    def remove_task(self, task_id: int):
+        if self.dialect != 'sqlite':
+            return
+        self.db.execute(text('DELETE FROM task_fts WHERE rowid = :id'), {'id': task_id})
+
+    def search(self, accessed_tasks_query, query: str, limit: int) -> List[TaskSearchResult]:
+        if self.dialect == 'postgresql':
+            ts_query = func.plainto_tsquery(literal_column("'simple'"), query)
+            rank = func.ts_rank(SEARCH_VECTOR, ts_query)
+            results = accessed_tasks_query.add_columns(rank.label('rank')).filter(
+                SEARCH_VECTOR.op('@@')(ts_query)
+            ).order_by(rank.desc(), db_Task.id)
+        elif self.dialect == 'sqlite':
+            match = _fts5_query(query)
+            if not match:
+                return []
+            # bm25() is lower for better matches
+            rank = literal_column('bm25(task_fts)')
+            results = accessed_tasks_query.join(
+                task_fts, task_fts.c.rowid == db_Task.id
+            ).add_columns((-rank).label('rank')).filter(
+                text('task_fts MATCH :match').bindparams(match=match)
+            ).order_by(rank, db_Task.id)
+        else:
+            pattern = f"%{query}%"
+            results = accessed_tasks_query.add_columns(literal(0.0).label('rank')).filter(
+                or_(db_Task.name.ilike(pattern), db_Task.description.ilike(pattern))
+            ).order_by(db_Task.id)
+        return [
+            TaskSearchResult(
+                id=task.id,
+                name=task.name,
+                status=task.status,
+                indicator=task.indicator,
+                created_at=task.created_at,
+                last_change=task.last_change,
+                deadline=task.deadline,
+                description=task.description,
+                project_id=task.project_id,
+                rank=rank
+            ) for task, rank in results.limit(limit).all()
+        ]
@@ -0,0 +1,86 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, get_args
+from dotenv import load_dotenv
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from ...cache import create_cache
+from ..models import Task as db_Task
+from ..schemas import IndicatorType, StatusType
+
+load_dotenv()
+PROJECT_STATS_CACHE_TTL = int(os.getenv('PROJECT_STATS_CACHE_TTL', 60))
+PROJECT_STATS_CACHE_MAXSIZE = int(os.getenv('PROJECT_STATS_CACHE_MAXSIZE', 10000))
+
+DONE_STATUS = 'Выполнена'
+DEADLINE_BUCKETS = ('overdue', 'due_this_week', 'later', 'no_deadline')
+
+# Deadline buckets depend on the clock, so the TTL also bounds how long a bucket can lag behind
+stats_cache = create_cache('project_stats', maxsize=PROJECT_STATS_CACHE_MAXSIZE, ttl=PROJECT_STATS_CACHE_TTL)
+
+def invalidate_project_stats(project_ids: Iterable[int]):
+    for project_id in set(project_ids):
+        stats_cache.delete(str(project_id))
+
+def _empty_stats(project_id: int) -> dict:
+    return {
+        'project_id': project_id,
+        'total': 0,
+        'by_status': {task_status: 0 for task_status in get_args(StatusType)},
+        'by_indicator': {**{indicator: 0 for indicator in get_args(IndicatorType)}, 'none': 0},
+        'by_deadline': {bucket: 0 for bucket in DEADLINE_BUCKETS},
+    }
+
+class TaskStatsRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_stats(self, accessed_tasks_query, project_ids: List[int]) -> Dict[int, dict]:
+        """Stats per project, cached ones are reused and the rest come from one grouped query"""
+        stats = {}
+        missing = []
+        for project_id in project_ids:
+            cached = stats_cache.get(str(project_id))
+            if cached is not None:
+                stats[project_id] = cached
+            else:
+                missing.append(project_id)
+        if missing:
+            computed = self._compute(accessed_tasks_query, missing)
+            for project_id, project_stats in computed.items():
+                stats_cache.set(str(project_id), project_stats)
+            stats.update(computed)
+        return stats
+
+    def _compute(self, accessed_tasks_query, project_ids: List[int]) -> Dict[int, dict]:
+        now = datetime.now(timezone.utc)
+        # Completed tasks are not due anymore and stay out of the deadline buckets
+        bucket = case(
+            (db_Task.status == DONE_STATUS, None),
+            (db_Task.deadline.is_(None), 'no_deadline'),
+            (db_Task.deadline < now, 'overdue'),
+            (db_Task.deadline < now + timedelta(days=7), 'due_this_week'),
+            else_='later'
+        ).label('bucket')
+        rows = accessed_tasks_query.filter(
+            db_Task.project_id.in_(project_ids)
+        ).with_entities(
+            db_Task.project_id,
+            db_Task.status,
+            db_Task.indicator,
+            bucket,
+            func.count().label('count')
+        ).group_by(
+            db_Task.project_id, db_Task.status, db_Task.indicator, bucket
+        ).all()
+        stats = {project_id: _empty_stats(project_id) for project_id in project_ids}
+        for row in rows:
+            project_stats = stats[row.project_id]
+            project_stats['total'] += row.count
+            project_stats['by_status'][row.status] = project_stats['by_status'].get(row.status, 0) + row.count
+            indicator = row.indicator or 'none'
+            project_stats['by_indicator'][indicator] = project_stats['by_indicator'].get(indicator, 0) + row.count
+            if row.bucket is not None:
+                project_stats['by_deadline'][row.bucket] += row.count
+        return stats
@@ -1,7 +1,7 @@
 from datetime import datetime
 import os
 import re
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 from dotenv import load_dotenv
 from fastapi import Query
 from pydantic import BaseModel, Field, field_validator
@@ -13,6 +13,8 @@ IndicatorType = Literal['red', 'orange', 'yellow', 'green']
 StatusType = Literal['Назначена', 'В работе', 'Выполнена']
 SortByType = Literal['created_at', 'last_change', 'deadline']
 SortOrderType = Literal['asc', 'desc']
+# Large columns left out of task lists unless requested with ?fields=
+TaskListField = Literal['description']
 
 def validate_login(value: str) -> str:
     if not re.match(EMAIL_MASK, value):
@@ -35,6 +37,27 @@ class TaskUpdateRequest(BaseModel):
     indicator: Optional[IndicatorType] = Field(default=None)
     status: Optional[StatusType] = Field(default=None)
     
+class TaskBatchCreateItem(TaskCreateRequest):
+    project_id: int
+
+class TaskBatchCreateRequest(BaseModel):
+    items: List[TaskBatchCreateItem] = Field(min_length=1, max_length=2000)
+
+class TaskBatchUpdateItem(TaskUpdateRequest):
+    id: int
+
+class TaskBatchUpdateRequest(BaseModel):
+    items: List[TaskBatchUpdateItem] = Field(min_length=1, max_length=2000)
+
+class TaskBatchItemResult(BaseModel):
+    index: int
+    task_id: Optional[int] = None
+    status: Literal['created', 'updated', 'error']
+    detail: Optional[str] = None
+
+class TaskBatchResponse(BaseModel):
+    results: List[TaskBatchItemResult]
+    
 class TaskResponseSchema(BaseModel):
     name: str
     indicator: str
@@ -92,7 +115,10 @@ class TaskFilters:
         indicator: Optional[list[IndicatorType]] = Query(None),
         on_me: Optional[bool] = False,
         sort_by: Optional[SortByType] = None,
-        sort_order: Optional[SortOrderType] = "asc"
+        sort_order: Optional[SortOrderType] = "asc",
+        cursor: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1, le=500),
+        fields: Optional[List[TaskListField]] = Query(None)
     ):
         self.name = name
         self.project_id = project_id
@@ -103,6 +129,9 @@ class TaskFilters:
         self.on_me = on_me
         self.sort_by = sort_by
         self.sort_order = sort_order
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = fields
 
 class TaskItemResponse(BaseModel):
     id: int
@@ -116,8 +145,30 @@ class TaskItemResponse(BaseModel):
     project_id: int
 
 
+class TaskSearchResult(TaskItemResponse):
+    rank: float
+
+
+class TaskPageResponse(BaseModel):
+    items: List[TaskItemResponse]
+    next_cursor: Optional[str] = None
+
+
 class TaskItemWithAuthorResponse(TaskItemResponse):
     author_email: Optional[str] = None
     author_name: Optional[str] = None
 
-    
\ No newline at end of file
+
+class TaskTreeNode(BaseModel):
+    id: int
+    name: str
+    status: str
+    indicator: Optional[str] = None
+    deadline: Optional[datetime] = None
+    project_id: int
+    parent_task_id: Optional[int] = None
+    depth: int
+    # Rollups over the node and its returned descendants
+    status_counts: Dict[str, int]
+    earliest_deadline: Optional[datetime] = None
+    subtasks: List['TaskTreeNode'] = Field(default_factory=list)
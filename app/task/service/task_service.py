@@ -1,13 +1,43 @@
-
+import csv
+import io
+import json
 from fastapi import Depends, HTTPException, status
-from typing import Optional
+from typing import Iterator, List, Optional
 
+from ...etag import make_etag
 from ...exceptions import UserNotFound
 from ...user.user_repository import UserRepository
 from ...project.project_repository import ProjectRepository
 from ...user.user_project_association_repo import UserProjectAssociation
-from ...task.repositories.task_repository import TaskRepository
-from ..schemas import TaskCreateRequest, TaskDetailResponse, TaskFilters, TaskUpdateRequest
+from ...task.repositories.task_repository import EXPORT_BATCH_SIZE, EXPORT_COLUMNS, TaskRepository, rows_version
+from ..schemas import TaskBatchCreateItem, TaskBatchItemResult, TaskBatchUpdateItem, TaskCreateRequest, TaskDetailResponse, TaskFilters, TaskSearchResult, TaskTreeNode, TaskUpdateRequest
+
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+def _json_default(value):
+    return value.isoformat()
+
+def _ndjson_chunks(rows) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row._asdict(), ensure_ascii=False, default=_json_default))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def _csv_chunks(rows) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
 
 class TaskService:
     def __init__(self, db):
@@ -17,12 +47,58 @@ class TaskService:
         task = TaskRepository(self.db).get_task(task_id)
         if not UserProjectAssociation(self.db).check_user_in_project(user_id, task.project_id):
             raise HTTPException(status_code=403, detail="Access denied to project")
-        project = ProjectRepository(self.db).get_project(task.project_id)
         return task
     
+    def get_task_etag(self, task_id: int, user_id: int) -> str:
+        project_id, version = TaskRepository(self.db).get_task_version(task_id)
+        if not UserProjectAssociation(self.db).check_user_in_project(user_id, project_id):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        return make_etag('task', task_id, version)
+    
+    def get_task_tree(self, task_id: int, user_id: int, max_depth: Optional[int] = None) -> TaskTreeNode:
+        tree = TaskRepository(self.db).get_task_tree(task_id, max_depth)
+        if not UserProjectAssociation(self.db).check_user_in_project(user_id, tree.project_id):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        return tree
+    
     def get_tasks(self, user_id, filters: TaskFilters = Depends()):
         tasks = TaskRepository(self.db).get_accessed_tasks_filter(user_id, filters)
         return tasks
+
+    def get_tasks_etag(self, user_id: int, filters: TaskFilters, query_string: str,
+        tasks: Optional[List[dict]] = None) -> str:
+        """From the tasks already listed if given, otherwise from a version query. Both give the same tag"""
+        if tasks is not None:
+            version = rows_version(tasks)
+        else:
+            version = TaskRepository(self.db).get_accessed_tasks_version(user_id, filters)
+        return make_etag('tasks', user_id, query_string, version)
+
+    def get_page_etag(self, user_id: int, query_string: str, page: dict) -> str:
+        # A page covers only part of the filtered set, so it is tagged by its own rows
+        return make_etag('tasks_page', user_id, query_string, rows_version(page['items']), page['next_cursor'])
+
+    def get_tasks_page(self, user_id: int, filters: TaskFilters) -> dict:
+        page = TaskRepository(self.db).get_accessed_tasks_page(user_id, filters)
+        return page
+    
+    def export_tasks(self, user_id: int, filters: TaskFilters, export_format: str) -> Iterator[str]:
+        """Checks access and builds the query right away, so errors get their status code
+        before StreamingResponse has sent a 200. Only reading the rows is left to the body"""
+        if filters.cursor or filters.limit:
+            raise HTTPException(status_code=400, detail="Export doesn't support cursor and limit")
+        if filters.project_id and not UserProjectAssociation(self.db).check_user_in_project(user_id, filters.project_id):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        rows = TaskRepository(self.db).iter_accessed_tasks(user_id, filters)
+        if export_format == 'csv':
+            return _csv_chunks(rows)
+        return _ndjson_chunks(rows)
+    
+    def search_tasks(self, user_id: int, query: str, project_id: Optional[int],
+        limit: int) -> List[TaskSearchResult]:
+        if project_id and not UserProjectAssociation(self.db).check_user_in_project(user_id, project_id):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        return TaskRepository(self.db).search_tasks(user_id, query, project_id, limit)
     
     def create_task(self, user_id: int, project_id: int, task_data: TaskCreateRequest) -> int:
         if not UserProjectAssociation(self.db).check_user_in_project(user_id, project_id):
@@ -36,6 +112,67 @@ class TaskService:
         task_id = TaskRepository(self.db).create_task(project_id, task_data, user_id)
         return task_id
     
+    def create_tasks(self, user_id: int, items: List[TaskBatchCreateItem]) -> List[TaskBatchItemResult]:
+        access = UserProjectAssociation(self.db)
+        project_ids = {item.project_id for item in items}
+        allowed = {project_id for project_id in project_ids if access.check_user_in_project(user_id, project_id)}
+        allowed &= ProjectRepository(self.db).get_existing_project_ids(allowed)
+        performers = UserRepository(self.db).get_existing_user_ids(
+            {item.performer_id for item in items if item.performer_id is not None}
+        )
+        results, accepted = {}, []
+        for index, item in enumerate(items):
+            if item.project_id not in allowed:
+                results[index] = TaskBatchItemResult(index=index, status='error', detail="Access denied to project")
+                continue
+            if item.performer_id not in performers:
+                item.performer_id = user_id
+            accepted.append(index)
+        if accepted:
+            task_ids = TaskRepository(self.db).create_tasks(user_id, [items[index] for index in accepted])
+            for index, task_id in zip(accepted, task_ids):
+                results[index] = TaskBatchItemResult(index=index, task_id=task_id, status='created')
+        return [results[index] for index in range(len(items))]
+    
+    def update_tasks(self, user_id: int, items: List[TaskBatchUpdateItem]) -> List[TaskBatchItemResult]:
+        repository = TaskRepository(self.db)
+        tasks = repository.get_tasks_by_ids({item.id for item in items})
+        access = UserProjectAssociation(self.db)
+        projects = ProjectRepository(self.db)
+        project_access = {}
+        for task in tasks.values():
+            if task.project_id not in project_access:
+                project_access[task.project_id] = (
+                    access.check_user_in_project(user_id, task.project_id),
+                    projects.check_project_owner(user_id, task.project_id)
+                )
+        performers = UserRepository(self.db).get_existing_user_ids(
+            {item.performer_id for item in items if item.performer_id is not None}
+        )
+        results, accepted, seen = [], [], set()
+        for index, item in enumerate(items):
+            task = tasks.get(item.id)
+            detail = None
+            if task is None:
+                detail = "Task not found"
+            elif item.id in seen:
+                detail = "Duplicate task id"
+            else:
+                is_member, is_project_owner = project_access[task.project_id]
+                if not is_member:
+                    detail = "Access denied to project"
+                elif not (task.owner_id == user_id or is_project_owner):
+                    detail = "Access denied to tasks"
+            if detail:
+                results.append(TaskBatchItemResult(index=index, task_id=item.id, status='error', detail=detail))
+                continue
+            seen.add(item.id)
+            accepted.append(item)
+            results.append(TaskBatchItemResult(index=index, task_id=item.id, status='updated'))
+        if accepted:
+            repository.update_tasks(accepted, tasks, performers, user_id)
+        return results
+    
     def update_task(self, user_id, task_id: int, task_data: TaskUpdateRequest) -> int:
         task = TaskRepository(self.db).get_task(task_id)
         if not UserProjectAssociation(self.db).check_user_in_project(user_id, task.project_id):
@@ -44,7 +181,7 @@ class TaskService:
         is_project_owner = ProjectRepository(self.db).check_project_owner(user_id, task.project_id)
         if not (is_task_owner or is_project_owner):
             raise HTTPException(status_code=403, detail="Access denied to tasks")
-        task_id = TaskRepository(self.db).update_task(task.id, task_data)
+        task_id = TaskRepository(self.db).update_task(task.id, task_data, user_id)
         return task_id
     
     def delete_task(self, user_id: int, task_id: int):
@@ -55,4 +192,4 @@ class TaskService:
         is_project_owner = ProjectRepository(self.db).check_project_owner(user_id, task.project_id)
         if not (is_task_owner or is_project_owner):
             raise HTTPException(status_code=403, detail="Access denied to task")
-        TaskRepository(self.db).delete_task(task_id)
\ No newline at end of file
+        TaskRepository(self.db).delete_task(task_id, user_id)
\ No newline at end of file
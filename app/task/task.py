@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Annotated, List, Optional
+from typing import Annotated, List, Literal, Optional, Union
 
 from ..task.service.task_service import TaskService
 from ..auth.auth import get_current_user
 from ..database import engine, Sessionlocal
-from .schemas import TaskCreateRequest, TaskDetailResponse, TaskFilters, TaskItemResponse, TaskResponseSchema, TaskUpdateRequest
+from ..etag import etag_headers, if_none_match, not_modified
+from ..responses import FastJSONResponse
+from .schemas import TaskBatchCreateRequest, TaskBatchResponse, TaskBatchUpdateRequest, TaskCreateRequest, TaskDetailResponse, TaskFilters, TaskItemResponse, TaskPageResponse, TaskResponseSchema, TaskSearchResult, TaskTreeNode, TaskUpdateRequest
+from ..routing import SessionRoute
 from pydantic import BaseModel
 
 router = APIRouter(
+    route_class=SessionRoute,
     prefix="/tasks",
     tags=['Task']
 )
@@ -23,19 +28,80 @@ def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
-@router.get('/', response_model = List[TaskItemResponse]) 
-async def get_tasks_v2(user: user_dependency, db: db_dependency,
+@router.get('/', response_model = Union[List[TaskItemResponse], TaskPageResponse]) 
+def get_tasks_v2(request: Request, user: user_dependency, db: db_dependency,
     filters: TaskFilters = Depends()):
-    tasks = TaskService(db).get_tasks(user['id'], filters)
+    service = TaskService(db)
+    # Rows come straight from the columns of TaskItemResponse, returning a Response
+    # skips FastAPI's per-item response_model validation
+    if filters.limit is not None or filters.cursor:
+        page = service.get_tasks_page(user['id'], filters)
+        etag = service.get_page_etag(user['id'], request.url.query, page)
+        if if_none_match(request, etag):
+            return not_modified(etag)
+        return FastJSONResponse(page, headers=etag_headers(etag))
+    # The version query only runs to revalidate, a full response tags itself from its rows
+    if request.headers.get('if-none-match'):
+        etag = service.get_tasks_etag(user['id'], filters, request.url.query)
+        if if_none_match(request, etag):
+            return not_modified(etag)
+    tasks = service.get_tasks(user['id'], filters)
+    etag = service.get_tasks_etag(user['id'], filters, request.url.query, tasks)
+    return FastJSONResponse(tasks, headers=etag_headers(etag))
+
+@router.get('/search', response_model=List[TaskSearchResult])
+def search_tasks(user: user_dependency, db: db_dependency,
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: Optional[int] = Query(None),
+    limit: int = Query(50, ge=1, le=200)):
+    tasks = TaskService(db).search_tasks(user['id'], q, project_id, limit)
     return tasks
 
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+@router.get('/export')
+def export_tasks(user: user_dependency, db: db_dependency, filters: TaskFilters = Depends(),
+    format: Literal['ndjson', 'csv'] = Query('ndjson')):
+    # get_db is torn down after the response has been sent (or the client went away),
+    # the body reads its rows on the request's session on a connection of its own
+    rows = TaskService(db).export_tasks(user['id'], filters, format)
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="tasks.{format}"'}
+    )
+
+@router.post('/batch', response_model=TaskBatchResponse)
+def create_tasks(batch: TaskBatchCreateRequest, user: user_dependency, db: db_dependency):
+    results = TaskService(db).create_tasks(user['id'], batch.items)
+    return TaskBatchResponse(results=results)
+
+@router.patch('/batch', response_model=TaskBatchResponse)
+def update_tasks(batch: TaskBatchUpdateRequest, user: user_dependency, db: db_dependency):
+    results = TaskService(db).update_tasks(user['id'], batch.items)
+    return TaskBatchResponse(results=results)
+
 @router.get('/{task_id}', response_model=TaskDetailResponse)
-async def get_task(task_id: int, user: user_dependency, db: db_dependency):
+def get_task(task_id: int, request: Request, response: Response, 
+    user: user_dependency, db: db_dependency):
+    etag = TaskService(db).get_task_etag(task_id, user['id'])
+    if if_none_match(request, etag):
+        return not_modified(etag)
     task = TaskService(db).get_task(task_id, user['id'])
+    response.headers.update(etag_headers(etag))
     return task
 
+@router.get('/{task_id}/tree', response_model=TaskTreeNode)
+def get_task_tree(task_id: int, user: user_dependency, db: db_dependency,
+    max_depth: Optional[int] = Query(None, ge=0, le=50)):
+    tree = TaskService(db).get_task_tree(task_id, user['id'], max_depth)
+    return tree
+
 @router.post('/{project_id}', status_code=status.HTTP_201_CREATED)
-async def create_task(project_id: int, task_data: TaskCreateRequest, 
+def create_task(project_id: int, task_data: TaskCreateRequest, 
     user: user_dependency, db: db_dependency):
     task_id = TaskService(db).create_task(user['id'], project_id, task_data)
     return {
@@ -44,7 +110,7 @@ async def create_task(project_id: int, task_data: TaskCreateRequest,
         }
 
 @router.put('/{task_id}')
-async def update_task(task_id: int, task_data: TaskUpdateRequest, user: user_dependency, db: db_dependency):
+def update_task(task_id: int, task_data: TaskUpdateRequest, user: user_dependency, db: db_dependency):
     task_id = TaskService(db).update_task(user['id'], task_id, task_data)
     return {
         "message": "Task updated successfully", 
@@ -52,5 +118,5 @@ async def update_task(task_id: int, task_data: TaskUpdateRequest, user: user_dep
         }
 
 @router.delete('/{task_id}', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_task(task_id, user: user_dependency, db: db_dependency):
+def delete_task(task_id, user: user_dependency, db: db_dependency):
     TaskService(db).delete_task(user['id'], task_id)
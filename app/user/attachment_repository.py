@@ -1,21 +1,40 @@
 import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import delete, exists, literal, select, union_all, update
 from sqlalchemy.orm import Session
 
-from ..exceptions import AttachmentNotFound
+from ..cache import create_cache
+from ..exceptions import AttachmentNotFound, ProjectNotFound, UserNotFound
 from ..user.schemas import AttachmentResponse
 from ..database import Sessionlocal
 from ..models_db import Attachment as db_Attachment
 from ..models_db import User as db_User
 from ..models_db import Project as db_Project
+from .thumbnails import remove_thumbnails
 
-UPLOAD_DIRECTORY = r'C:\Users\Пользователь\Documents\Python\projects\MultiTasker\data\attachments'
+load_dotenv()
+UPLOAD_DIRECTORY = os.getenv('UPLOAD_DIRECTORY', r'C:\Users\Пользователь\Documents\Python\projects\MultiTasker\data\attachments')
+ICON_CACHE_TTL = int(os.getenv('ICON_CACHE_TTL', 60))
+ICON_CACHE_MAXSIZE = int(os.getenv('ICON_CACHE_MAXSIZE', 10000))
+# Time an upload has to be set as an icon before it counts as unused
+UNUSED_ATTACHMENT_HOURS = float(os.getenv('UNUSED_ATTACHMENT_HOURS', 24))
+# 'user:<id>' / 'project:<id>' -> {'icon_id': ...}, 'attachment:<id>' -> [path, content_hash].
+# An attachment row never changes its file, only the owners' icon_id needs invalidating
+icon_cache = create_cache('icons', maxsize=ICON_CACHE_MAXSIZE, ttl=ICON_CACHE_TTL)
+
+def invalidate_icon(owner: str, owner_id: int):
+    icon_cache.delete(f'{owner}:{owner_id}')
 
 class AttachmentRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def add_attachment(self, path: str) -> AttachmentResponse:
-        new_attachment = db_Attachment(path=path)
+    def add_attachment(self, path: str, content_hash: Optional[str] = None) -> AttachmentResponse:
+        """Raises IntegrityError when a concurrent upload stored the same content first"""
+        new_attachment = db_Attachment(path=path, content_hash=content_hash)
         self.db.add(new_attachment)
         self.db.commit()
         self.db.refresh(new_attachment)
@@ -23,6 +42,76 @@ class AttachmentRepository:
             id = new_attachment.id,
             path = new_attachment.path
         )
+
+    def acquire_attachment(self, content_hash: str) -> Optional[int]:
+        """Id of the attachment holding this content, None if there is none yet.
+        The upload restarts its grace period, so it isn't removed before being set as an icon"""
+        attachment_id = self.db.execute(
+            update(db_Attachment)
+            .where(db_Attachment.content_hash == content_hash)
+            .values(uploaded_at=datetime.now(timezone.utc))
+            .returning(db_Attachment.id)
+        ).scalar()
+        self.db.commit()
+        return attachment_id
+
+    def get_icon_id(self, owner: str, owner_id: int) -> Optional[int]:
+        """icon_id of a 'user' or 'project', None when it uses the default icon"""
+        key = f'{owner}:{owner_id}'
+        cached = icon_cache.get(key)
+        if cached is not None:
+            return cached['icon_id']
+        model = db_User if owner == 'user' else db_Project
+        row = self.db.query(model.icon_id).filter(model.id == owner_id).first()
+        if row is None:
+            raise UserNotFound(owner_id) if owner == 'user' else ProjectNotFound(owner_id)
+        icon_cache.set(key, {'icon_id': row.icon_id})
+        return row.icon_id
+
+    def get_attachment_file(self, attachment_id: int) -> tuple[str, Optional[str]]:
+        """(path, content_hash) of the attachment"""
+        key = f'attachment:{attachment_id}'
+        cached = icon_cache.get(key)
+        if cached is None:
+            row = self.db.query(db_Attachment.path, db_Attachment.content_hash)\
+                .filter(db_Attachment.id == attachment_id).first()
+            if row is None:
+                raise AttachmentNotFound(attachment_id)
+            cached = [row.path, row.content_hash]
+            icon_cache.set(key, cached)
+        return cached[0], cached[1]
+
+    def get_icons(self, user_ids, project_ids) -> list:
+        """(owner, id, icon_id, path, content_hash) of every user and project asked for,
+        one UNION ALL query. Also fills icon_cache for the icon requests that follow"""
+        selects = []
+        for owner, model, ids in (('user', db_User, user_ids), ('project', db_Project, project_ids)):
+            if ids:
+                selects.append(
+                    select(literal(owner).label('owner'), model.id, model.icon_id,
+                        db_Attachment.path, db_Attachment.content_hash)
+                    .outerjoin(db_Attachment, db_Attachment.id == model.icon_id)
+                    .where(model.id.in_(set(ids)))
+                )
+        if not selects:
+            return []
+        rows = self.db.execute(union_all(*selects) if len(selects) > 1 else selects[0]).all()
+        for row in rows:
+            icon_cache.set(f'{row.owner}:{row.id}', {'icon_id': row.icon_id})
+            if row.icon_id is not None and row.path is not None:
+                icon_cache.set(f'attachment:{row.icon_id}', [row.path, row.content_hash])
+        return rows
+
+    def is_icon_visible(self, attachment_id: int, project_ids) -> bool:
+        """True when the attachment is some user's icon or the icon of one of project_ids,
+        None for project_ids lets every project's icon through"""
+        project_icon = exists().where(db_Project.icon_id == attachment_id)
+        if project_ids is not None:
+            project_icon = project_icon.where(db_Project.id.in_(set(project_ids)))
+        return self.db.query(exists().where(db_User.icon_id == attachment_id) | project_icon).scalar()
+
+    def is_path_used(self, path: str) -> bool:
+        return self.db.query(db_Attachment.id).filter(db_Attachment.path == path).first() is not None
     
     def get_attachment_by_id(self, attachment_id: int) -> db_Attachment:
         attachment = self.db.query(db_Attachment).filter(db_Attachment.id == attachment_id).first()
@@ -30,13 +119,48 @@ class AttachmentRepository:
             raise AttachmentNotFound(attachment_id)
         return attachment
     
-    def delete_attachment(self, attachment_id: int):
-        attachment = self.get_attachment_by_id(attachment_id)
-        self.db.delete(attachment)
+    def release_attachment(self, attachment_id: Optional[int]):
+        """Called after a user or project stopped using the attachment as its icon (replaced,
+        unset or the owner deleted). Removes it when no one else uses it either"""
+        if attachment_id is not None:
+            self._remove_unused(db_Attachment.id == attachment_id)
+
+    def remove_unused_attachments(self) -> int:
+        """Removes every attachment no user or project uses, e.g. uploads never set as an icon"""
+        return self._remove_unused()
+
+    def _remove_unused(self, *criteria) -> int:
+        # The owners are looked at by the DELETE itself, an icon set concurrently keeps the row.
+        # So does a recent upload: its uploader may not have set it as an icon yet
+        uploaded_before = datetime.now(timezone.utc) - timedelta(hours=UNUSED_ATTACHMENT_HOURS)
+        removed = self.db.execute(
+            delete(db_Attachment).where(
+                *criteria,
+                db_Attachment.uploaded_at < uploaded_before,
+                ~exists().where(db_User.icon_id == db_Attachment.id),
+                ~exists().where(db_Project.icon_id == db_Attachment.id)
+            ).returning(db_Attachment.id, db_Attachment.path)
+        ).all()
         self.db.commit()
-        file_path = os.path.join(UPLOAD_DIRECTORY, attachment.path)
-        if os.path.exists(file_path):
-                os.remove(file_path)
+        for attachment_id, path in removed:
+            icon_cache.delete(f'attachment:{attachment_id}')
+            self._remove_file(path)
+        return len(removed)
+
+    def _remove_file(self, path: str):
+        file_path = os.path.join(UPLOAD_DIRECTORY, path)
+        # Moved aside before the check, an upload of the same content recorded in the meantime
+        # either finds it missing and links it again or is seen here and gets it back
+        removed_path = f'{file_path}.{uuid.uuid4().hex}.removed'
+        try:
+            os.replace(file_path, removed_path)
+        except FileNotFoundError:
+            return
+        if self.is_path_used(path):
+            os.replace(removed_path, file_path)
+            return
+        os.remove(removed_path)
+        remove_thumbnails(file_path)
     
     def update_user_icon(self, user_id: int, attachment_id: int) -> db_User|None:
         user = self.db.query(db_User).filter(db_User.id == user_id).first()
@@ -44,6 +168,7 @@ class AttachmentRepository:
             return None
         user.icon_id = attachment_id
         self.db.commit()
+        invalidate_icon('user', user_id)
         self.db.refresh(user)
         return user
     
@@ -53,6 +178,7 @@ class AttachmentRepository:
             return False
         project.icon_id = attachment_id
         self.db.commit()
+        invalidate_icon('project', project_id)
         return True
 
     def check_attachment_exist(self, attach_id):
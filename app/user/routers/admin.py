@@ -8,8 +8,10 @@ from ...user.service.user_service import UserService
 from ..user_repository import UserRepository
 from ...database import Sessionlocal
 from ...auth.auth import get_current_user
+from ...routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     prefix="/admin",
     tags=['Admin']
 )
@@ -25,10 +27,12 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.put('/admin/{user_id}')
-async def change_admin(user_id: int, is_admin: bool, user: user_dependency, db: db_dependency):
+def change_admin(user_id: int, is_admin: bool, user: user_dependency, db: db_dependency):
     UserService(db).update_admin(user['id'], user_id, is_admin)
     return {
         "message": "Данные пользователя обновлены"
     }
 
-    
\ No newline at end of file
+@router.get('/token-cache')
+def get_token_cache_stats(user: user_dependency, db: db_dependency):
+    return UserService(db).get_token_cache_stats(user['id'])
@@ -1,18 +1,23 @@
 import os
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, logger, status, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, UploadFile, logger, status, Response
 from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 
-from ...user.service.attachment_service import AttachmentService
+from ...user.service.attachment_service import AttachmentService, icon_etag
 from ..user_repository import UserRepository
 from ..attachment_repository import AttachmentRepository
 from ...database import engine, Sessionlocal
 from ...auth.auth import get_current_user
+from ...responses import FastJSONResponse
+from ..schemas import IconResolveRequest, IconResolveResponse
+from ...etag import etag_headers, if_modified_since, if_none_match, not_modified
 from ...project.project_repository import ProjectRepository
+from ...routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     prefix="/files",
     tags=['FilesController']
 )
@@ -27,49 +32,84 @@ def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
-UPLOAD_DIRECTORY = r'C:\Users\Пользователь\Documents\Python\projects\MultiTasker\data\attachments'
-DEFAULT_USER_ICON = 'user_icon.png'
-DEFAULT_PROJECT_ICON = 'project.png'
-ALLOWED_MIME_TYPES = ["image/jpeg", "image/png"]
-MAX_FILE_SIZE = 50 * 1024 * 1024
-
 @router.post('/', status_code=status.HTTP_201_CREATED)
-async def post_attachment(uploaded_file: UploadFile, user: user_dependency, db: db_dependency):
-    attachment_id = AttachmentService(db).post_attachment_service(user['id'], uploaded_file)
+def post_attachment(uploaded_file: UploadFile, background_tasks: BackgroundTasks,
+    user: user_dependency, db: db_dependency):
+    attachment_id = AttachmentService(db).post_attachment_service(user['id'], uploaded_file, background_tasks)
     return {"message": "Файл успено загружен",
             "attachment_id": attachment_id}
 
+# Served by attachment id, whose file never changes
+IMMUTABLE_ICON_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+DEFAULT_ICON_CACHE_CONTROL = 'private, max-age=86400'
+
+def _icon_response(request: Request, service: AttachmentService, file_path: str,
+    version: Optional[str], size: Optional[int], cache_control: str):
+    etag = icon_etag(file_path, version, size)
+    if if_none_match(request, etag):
+        return not_modified(etag, cache_control)
+    file_path = service.get_icon_variant(file_path, size)
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Icon file not found on server")
+    if if_modified_since(request, stat_result.st_mtime):
+        return not_modified(etag, cache_control)
+    return FileResponse(file_path, headers=etag_headers(etag, cache_control), stat_result=stat_result)
+
 @router.get('/icon', response_class=FileResponse)
-async def get_icon(
+def get_icon(
+    request: Request,
     user: user_dependency,
     db: db_dependency,
-    response: Response = None,
     user_id: int = Query(None, description="ID пользователя"),
     project_id: int = Query(None, description="ID проекта"),
+    size: int = Query(None, ge=1, description="Сторона квадратной миниатюры в пикселях"),
 ):
-    response.headers.update({
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0"
-    })
+    # The icon behind this URL changes, so it is revalidated on every use
     if all([user_id, project_id]):
         raise HTTPException(
             status_code=400,
             detail="Должен быть указан ровно один параметр: user_id ИЛИ project_id"
         )
+    service = AttachmentService(db)
     if project_id is not None:
-        file_path = AttachmentService(db).get_project_icon(project_id)
+        service.check_project_icon_access(user['id'], project_id)
+        file_path, version = service.get_project_icon(project_id)
     else:
         if user_id is not None:
-            file_path = AttachmentService(db).get_user_icon(user_id)
+            file_path, version = service.get_user_icon(user_id)
         else: 
-            file_path = AttachmentService(db).get_user_icon(user['id'])
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Icon file not found on server")
-    return FileResponse(file_path)
+            file_path, version = service.get_user_icon(user['id'])
+    return _icon_response(request, service, file_path, version, size, 'private, no-cache')
+
+@router.post('/icons/resolve', response_model=IconResolveResponse)
+def resolve_icons(request_data: IconResolveRequest, user: user_dependency, db: db_dependency):
+    """Icon URLs for a whole list view in one request, each is then loaded from
+    /files/icons/... and kept by the browser cache"""
+    resolved = AttachmentService(db).resolve_icons(
+        user['id'], request_data.user_ids, request_data.project_ids, request_data.size
+    )
+    return FastJSONResponse(resolved)
+
+@router.get('/icons/default/{kind}', response_class=FileResponse)
+def get_default_icon(kind: Literal['user', 'project'], request: Request, user: user_dependency, db: db_dependency,
+    size: int = Query(None, ge=1, description="Сторона квадратной миниатюры в пикселях")):
+    service = AttachmentService(db)
+    file_path = service.get_default_user_icon() if kind == 'user' else service.get_default_project_icon()
+    return _icon_response(request, service, file_path, None, size, DEFAULT_ICON_CACHE_CONTROL)
+
+@router.get('/icons/{attachment_id}', response_class=FileResponse)
+def get_icon_by_id(attachment_id: int, request: Request, user: user_dependency, db: db_dependency,
+    size: int = Query(None, ge=1, description="Сторона квадратной миниатюры в пикселях")):
+    service = AttachmentService(db)
+    # Checked before the ETag, a cached copy is only revalidated by someone who may see it
+    service.check_icon_access(user['id'], attachment_id)
+    file_path, version = service.get_attachment_icon(attachment_id)
+    return _icon_response(request, service, file_path, version, size, IMMUTABLE_ICON_CACHE_CONTROL)
 
 @router.delete('/', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_icon(
+def delete_icon(
     user: user_dependency, 
     db: db_dependency,
     project_id: int = Query(None, description="ID проекта")
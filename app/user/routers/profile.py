@@ -13,8 +13,10 @@ from ..attachment_repository import AttachmentRepository
 from ...database import engine, Sessionlocal
 from ...auth.auth import get_current_user, bcrypt_context
 from ...project.project_repository import ProjectRepository
+from ...routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     tags=['Profile']
 )
 
@@ -29,7 +31,7 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.put('/me')
-async def update_user(user_data: UpdateUserRequest, user: user_dependency, db: db_dependency):
+def update_user(user_data: UpdateUserRequest, user: user_dependency, db: db_dependency):
     ProfileService(db).update_profile(user['id'], user_data)
     return {
         "message": "User updated successfully",
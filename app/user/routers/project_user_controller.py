@@ -1,5 +1,5 @@
 import datetime
-from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, Request, Query
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, Request, Response, Query
 from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
 from typing import Annotated, List, Optional
@@ -10,12 +10,14 @@ from ...user.schemas import UserResponse
 from ...models_db import Project
 from ..user_repository import UserRepository
 from ...database import engine, Sessionlocal
+from ...etag import etag_headers, if_none_match, not_modified
 from ...auth.auth import get_current_user, bcrypt_context
-from ...email_controller import send_project_invite
 from ..user_project_association_repo import UserProjectAssociation 
 from ...project.project_repository import ProjectRepository
+from ...routing import SessionRoute
 
 router = APIRouter(
+    route_class=SessionRoute,
     tags=['ProjectUserContoller']
 )
 
@@ -30,12 +32,18 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get('/users', response_model=List[UserResponse])
-async def get_users(
+def get_users(
+    request: Request,
+    response: Response,
     user: user_dependency,
     db: db_dependency,
     project_id: Optional[int] = Query(None)
 ):
+    etag = UserService(db).get_users_etag(user['id'], project_id)
+    if if_none_match(request, etag):
+        return not_modified(etag)
     users = UserService(db).get_users_service(user['id'], project_id)
+    response.headers.update(etag_headers(etag))
     return users
 
 @router.post('/users/{user_id}/invite', status_code=status.HTTP_201_CREATED)
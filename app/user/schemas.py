@@ -1,7 +1,7 @@
 
 import os
 import re
-from typing import Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, field_validator
 
@@ -84,3 +84,29 @@ class ProjectUserResponse(BaseModel):
 class AttachmentResponse(BaseModel):
     id: int
     path: str
+
+class IconResolveRequest(BaseModel):
+    user_ids: List[int] = Field(default_factory=list, max_length=1000)
+    project_ids: List[int] = Field(default_factory=list, max_length=1000)
+    size: Optional[int] = Field(default=None, ge=1)
+
+class ResolvedIcon(BaseModel):
+    id: int
+    url: str
+    etag: str
+
+class IconResolveResponse(BaseModel):
+    # Unknown ids are left out
+    users: List[ResolvedIcon]
+    projects: List[ResolvedIcon]
+
+class Principal(BaseModel):
+    id: int
+    is_admin: bool = False
+    project_roles: Dict[int, str] = Field(default_factory=dict) #project_id -> owner | member
+
+    def is_member(self, project_id: int) -> bool:
+        return project_id in self.project_roles
+
+    def is_owner(self, project_id: int) -> bool:
+        return self.project_roles.get(project_id) == 'owner'
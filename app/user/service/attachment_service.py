@@ -1,66 +1,235 @@
-
-from fastapi import HTTPException, UploadFile
+from fastapi import BackgroundTasks, HTTPException, UploadFile
 from fastapi.responses import FileResponse
+from sqlalchemy.exc import IntegrityError
+from typing import BinaryIO, List, Optional
 
+from ...etag import make_etag
 from ...exceptions import AttachmentNotFound
 from ...project.project_repository import ProjectRepository
-from ...user.attachment_repository import AttachmentRepository
+from ...user.attachment_repository import UPLOAD_DIRECTORY, AttachmentRepository
 from ...user.user_repository import UserRepository
+from ...user.thumbnails import generate_thumbnails, get_thumbnail, pick_size
+import hashlib
 import os
-import uuid
+import tempfile
+import threading
+import time
 
-UPLOAD_DIRECTORY = r'C:\Users\Пользователь\Documents\Python\projects\MultiTasker\data\attachments'
 DEFAULT_USER_ICON = 'user_icon.png'
 DEFAULT_PROJECT_ICON = 'project.png'
 ALLOWED_MIME_TYPES = ["image/jpeg", "image/png"]
 MAX_FILE_SIZE = 50 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Uploads never set as an icon are swept by the uploads themselves, at most this often
+UNUSED_SWEEP_INTERVAL = 3600
+
+_swept_at = None
+_sweep_lock = threading.Lock()
+# Leading bytes of every allowed type -> (mime type, extension the file is stored with)
+MAGIC_NUMBERS = {
+    b'\xff\xd8\xff': ('image/jpeg', '.jpg'),
+    b'\x89PNG\r\n\x1a\n': ('image/png', '.png'),
+}
+
+def sniff_image_type(head: bytes) -> Optional[tuple[str, str]]:
+    for magic, file_type in MAGIC_NUMBERS.items():
+        if head.startswith(magic) and file_type[0] in ALLOWED_MIME_TYPES:
+            return file_type
+    return None
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE//(1024*1024)} МБ"
+    )
+
+def _invalid_type() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail="Недопустимый формат файла. Разрешены только JPEG и PNG"
+    )
+
+def attachment_version(path: str, content_hash: Optional[str]) -> str:
+    # An attachment's file never changes, files stored before hashing are told apart by their name
+    return content_hash or path
+
+def icon_etag(file_path: str, version: Optional[str], size: Optional[int]) -> str:
+    """From the attachment version and the variant served, so it is known before touching the file.
+    Default icons have no version and use their mtime and size"""
+    variant = pick_size(size) if size else None
+    if version is None:
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Icon file not found on server")
+        version = f'{stat_result.st_mtime}-{stat_result.st_size}'
+    return make_etag('icon', version, variant)
+
+def _sweep_due() -> bool:
+    global _swept_at
+    now = time.monotonic()
+    with _sweep_lock:
+        if _swept_at is not None and now - _swept_at < UNUSED_SWEEP_INTERVAL:
+            return False
+        _swept_at = now
+        return True
+
+def _link(temp_path: str, file_path: str) -> bool:
+    """Hard link of the upload at its final path, False when the file is already there"""
+    try:
+        os.link(temp_path, file_path)
+    except FileExistsError:
+        return False
+    return True
 
 class AttachmentService:
     def __init__(self, db):
         self.db = db
 
-    def post_attachment_service(self, user_id: int, uploaded_file: UploadFile) -> int:
+    def post_attachment_service(self, user_id: int, uploaded_file: UploadFile,
+        background_tasks: Optional[BackgroundTasks] = None) -> int:
         founded_user = UserRepository(self.db).get_user(user_id)
-        file = uploaded_file.file
-        filename = str(uuid.uuid4()) + os.path.splitext(uploaded_file.filename)[1]
+        if uploaded_file.size is not None and uploaded_file.size > MAX_FILE_SIZE:
+            raise _too_large()
+        temp_path, content_hash, extension = self._receive_upload(uploaded_file.file)
+        try:
+            attachment_id = self._store_upload(temp_path, content_hash, extension, background_tasks)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        if _sweep_due():
+            AttachmentRepository(self.db).remove_unused_attachments()
+        return attachment_id
+
+    def _receive_upload(self, source: BinaryIO) -> tuple[str, str, str]:
+        """Copies the upload in UPLOAD_CHUNK_SIZE pieces into a temp file next to its final place,
+        checking the type from the first chunk and the size and sha256 as it goes.
+        Returns (temp path, content hash, extension)"""
+        os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+        temp = tempfile.NamedTemporaryFile(dir=UPLOAD_DIRECTORY, prefix='.upload-', delete=False)
+        try:
+            with temp:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                file_type = sniff_image_type(chunk)
+                if file_type is None:
+                    raise _invalid_type()
+                digest = hashlib.sha256()
+                file_size = 0
+                while chunk:
+                    file_size += len(chunk)
+                    if file_size > MAX_FILE_SIZE:
+                        raise _too_large()
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    chunk = source.read(UPLOAD_CHUNK_SIZE)
+        except BaseException:
+            os.remove(temp.name)
+            raise
+        return temp.name, digest.hexdigest(), file_type[1]
+
+    def _store_upload(self, temp_path: str, content_hash: str, extension: str,
+        background_tasks: Optional[BackgroundTasks] = None) -> int:
+        """Known content only gains a reference, new content is linked under its hash and recorded.
+        Thumbnails of new content are rendered after the response is sent"""
+        repository = AttachmentRepository(self.db)
+        attachment_id = repository.acquire_attachment(content_hash)
+        if attachment_id is not None:
+            return attachment_id
+        filename = content_hash + extension
         file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-        content_type = uploaded_file.content_type
-        file_size = 0
-        for chunk in uploaded_file.file:
-            file_size += len(chunk)
-            if file_size > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE//(1024*1024)} МБ"
-                )
-        uploaded_file.file.seek(0)
-        if content_type not in ALLOWED_MIME_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail="Недопустимый формат файла. Разрешены только JPEG и PNG"
-            )
-        with open(file_path, 'wb') as f:
-            f.write(file.read())
-        attachment = AttachmentRepository(self.db).add_attachment(filename)
-        print(type(attachment.id))
-        return attachment.id
-
-    def get_user_icon(self, user_id):
-        founded_user = UserRepository(self.db).get_user(user_id)
-        if founded_user.icon_id is None:
-            return self.get_default_user_icon()
-        attachment = AttachmentRepository(self.db).get_attachment_by_id(founded_user.icon_id)
-        return os.path.join(UPLOAD_DIRECTORY, attachment.path)
-
-    def get_project_icon(self, project_id):
-        project = ProjectRepository(self.db).get_project(project_id)
-        if project.icon_id is None:
-            return self.get_default_project_icon()
-        attachment = AttachmentRepository(self.db).get_attachment_by_id(project.icon_id)
-        if not attachment:
-            raise HTTPException(status_code=404, detail="Project attachment not found")
-        return os.path.join(UPLOAD_DIRECTORY, attachment.path)
-    
+        # Linked rather than moved, the temp file stays until the row is committed
+        linked = _link(temp_path, file_path)
+        try:
+            attachment_id = repository.add_attachment(filename, content_hash).id
+        except IntegrityError:
+            # A concurrent upload of the same bytes was recorded first, the file is the same
+            self.db.rollback()
+            attachment_id = repository.acquire_attachment(content_hash)
+            if attachment_id is None:
+                self._discard(file_path, filename, linked)
+                raise
+            return attachment_id
+        except BaseException:
+            self._discard(file_path, filename, linked)
+            raise
+        # A delete of the previous attachment with this content may have removed the file meanwhile
+        _link(temp_path, file_path)
+        if background_tasks is not None:
+            background_tasks.add_task(generate_thumbnails, file_path)
+        return attachment_id
+
+    def _discard(self, file_path: str, filename: str, linked: bool):
+        """Removes the file linked by a failed upload unless a recorded attachment uses it"""
+        if not linked:
+            return
+        self.db.rollback()
+        if not AttachmentRepository(self.db).is_path_used(filename) and os.path.exists(file_path):
+            os.remove(file_path)
+
+    def get_user_icon(self, user_id) -> tuple[str, Optional[str]]:
+        """(file path, version for icon_etag) of the user's icon or of the default one"""
+        icon_id = AttachmentRepository(self.db).get_icon_id('user', user_id)
+        if icon_id is None:
+            return self.get_default_user_icon(), None
+        return self.get_attachment_icon(icon_id)
+
+    def get_project_icon(self, project_id) -> tuple[str, Optional[str]]:
+        icon_id = AttachmentRepository(self.db).get_icon_id('project', project_id)
+        if icon_id is None:
+            return self.get_default_project_icon(), None
+        return self.get_attachment_icon(icon_id)
+
+    def get_attachment_icon(self, attachment_id: int) -> tuple[str, Optional[str]]:
+        """(file path, version for icon_etag)"""
+        path, content_hash = AttachmentRepository(self.db).get_attachment_file(attachment_id)
+        return os.path.join(UPLOAD_DIRECTORY, path), attachment_version(path, content_hash)
+
+    def check_icon_access(self, user_id: int, attachment_id: int):
+        """Attachments are served by id only as the icon of a user or of a project the user is in"""
+        principal = UserRepository(self.db).get_principal(user_id)
+        project_ids = None if principal.is_admin else principal.project_roles.keys()
+        if not AttachmentRepository(self.db).is_icon_visible(attachment_id, project_ids):
+            raise HTTPException(status_code=403, detail="Access Denied")
+
+    def check_project_icon_access(self, user_id: int, project_id: int):
+        """A project's icon is shown only to its members, as on /files/icons/{attachment_id}"""
+        principal = UserRepository(self.db).get_principal(user_id)
+        if not (principal.is_admin or principal.is_member(project_id)):
+            raise HTTPException(status_code=403, detail="Access Denied")
+
+    def resolve_icons(self, user_id: int, user_ids: List[int], project_ids: List[int],
+        size: Optional[int]) -> dict:
+        """IconResolveResponse shaped dict: icon URL and ETag of each user and project.
+        Owners without an icon get the default's URL, whose file is looked at once per kind.
+        Projects the user isn't in are left out"""
+        principal = UserRepository(self.db).get_principal(user_id)
+        if not principal.is_admin:
+            project_ids = [project_id for project_id in project_ids if principal.is_member(project_id)]
+        query = f'?size={size}' if size else ''
+        default_etags = {}
+        resolved = {'users': [], 'projects': []}
+        for row in AttachmentRepository(self.db).get_icons(user_ids, project_ids):
+            if row.path is not None:
+                url = f'/files/icons/{row.icon_id}{query}'
+                etag = icon_etag(None, attachment_version(row.path, row.content_hash), size)
+            else:
+                url = f'/files/icons/default/{row.owner}{query}'
+                if row.owner not in default_etags:
+                    default_path = self.get_default_user_icon() if row.owner == 'user' else self.get_default_project_icon()
+                    default_etags[row.owner] = icon_etag(default_path, None, size)
+                etag = default_etags[row.owner]
+            resolved[row.owner + 's'].append({'id': row.id, 'url': url, 'etag': etag})
+        return resolved
+
+    def get_icon_variant(self, file_path: str, size: Optional[int]) -> str:
+        """The thumbnail covering size, or the original without a size or beyond the largest one"""
+        if size is None:
+            return file_path
+        variant = pick_size(size)
+        if variant is None:
+            return file_path
+        return get_thumbnail(file_path, variant)
+
     def get_default_user_icon(self):
         base_dir = os.path.dirname(UPLOAD_DIRECTORY)
         default_icon_path = os.path.join(base_dir, "defaults", DEFAULT_USER_ICON)
@@ -76,6 +245,7 @@ class AttachmentService:
         return default_icon_path
     
     def delete_icon(self, user_id: int, project_id: int):
+        # The attachment may be shared, the icon is unset first and the attachment released
         if project_id is not None:
             project = ProjectRepository(self.db).get_project(project_id)
             if project.owner_id != user_id:
@@ -83,10 +253,12 @@ class AttachmentService:
             if project.icon_id is None:
                 raise AttachmentNotFound()
             attachment = AttachmentRepository(self.db).get_attachment_by_id(project.icon_id)
-            AttachmentRepository(self.db).delete_attachment(attachment_id=project.icon_id)
+            AttachmentRepository(self.db).update_project_icon(project_id, None)
+            AttachmentRepository(self.db).release_attachment(attachment.id)
             return
         founded_user = UserRepository(self.db).get_user(user_id)
         if founded_user.icon_id is None:
             raise AttachmentNotFound()
         attachment = AttachmentRepository(self.db).get_attachment_by_id(founded_user.icon_id)
-        AttachmentRepository(self.db).delete_attachment(attachment.id)
\ No newline at end of file
+        AttachmentRepository(self.db).update_user_icon(user_id, None)
+        AttachmentRepository(self.db).release_attachment(attachment.id)
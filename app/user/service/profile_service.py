@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 
 from ..schemas import UpdateUserRequest
 from ..user_repository import UserRepository
+from ...auth.token_cache import token_cache
 
 class ProfileService:
     def __init__(self, db: Session):
@@ -16,3 +17,4 @@ class ProfileService:
                 raise HTTPException(status_code=400, detail="Новый пароль и подтверждение пароля не совпадают")
             if not UserRepository(self.db).update_user_password(user_id, user_data.old_password, user_data.new_password):
                 raise HTTPException(status_code=400, detail="Неверный пароль")
+            token_cache.revoke_user(user_id)
@@ -7,11 +7,13 @@ from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 
 from ...auth.code_service import CodeService
-from ...email_controller import send_project_invite
+from ...auth.token_cache import token_cache
+from ...email_controller import queue_project_invite
 from ...project.project_repository import ProjectRepository
 from ...user.user_project_association_repo import UserProjectAssociation
 from ..schemas import CreateUser, UserResponse
 from ..user_repository import UserRepository
+from ...etag import make_etag
 from ...exceptions import ProjectNotFound, UserNotFound
 
 load_dotenv()
@@ -51,6 +53,15 @@ class UserService:
             datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
         return token
 
+    def get_users_etag(self, user_id: int, project_id: int = None) -> str:
+        if project_id is not None:
+            if not UserProjectAssociation(self.db).check_user_in_project(user_id, project_id):
+                raise HTTPException(status_code=403, detail="Access is denied")
+            version = UserProjectAssociation(self.db).get_users_in_project_version(project_id)
+        else:
+            version = UserRepository(self.db).get_users_version()
+        return make_etag('users', project_id, version)
+    
     def get_users_service(self, user_id: int, project_id: int = None) -> List[UserResponse]:
         if project_id is not None:
             if not UserProjectAssociation(self.db).check_user_in_project(user_id, project_id):
@@ -88,16 +99,12 @@ class UserService:
             expires_delta=datetime.timedelta(minutes=TEMP_TOKEN_EXPIRE_MINUTES)
         )
         url = f"{request.base_url}/users/invite?access_token={access_token}"
-        result = send_project_invite(recipient_email=invited_user.login, 
+        queue_project_invite(self.db,
+            recipient_email=invited_user.login, 
             inviter_name=user['login'], 
             url=url, 
             expire_in_minutes=TEMP_TOKEN_EXPIRE_MINUTES,
             project_name=project.name)
-        if not result:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
-                detail=f"Couldn't send email"
-                )
 
     def confirm_invite(self, access_token: str) -> tuple[int, int]:
         token_data =  CodeService(self.db).decode_and_verify_invite_token(access_token)
@@ -154,4 +161,12 @@ class UserService:
                 detail="Access is denied"
             )
         target_user = UserRepository(self.db).get_user(upd_user_id)
-        UserRepository(self.db).update_admin(target_user.id, is_admin)
\ No newline at end of file
+        UserRepository(self.db).update_admin(target_user.id, is_admin)
+
+    def get_token_cache_stats(self, user_id: int) -> dict:
+        if not UserRepository(self.db).check_admin_perms(user_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access is denied"
+            )
+        return token_cache.stats()
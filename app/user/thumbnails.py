@@ -0,0 +1,61 @@
+import os
+import tempfile
+from typing import Optional
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+# Square variants kept next to every icon, clients ask for the one they render
+THUMBNAIL_SIZES = (32, 64, 128, 256)
+THUMBNAIL_FORMAT, THUMBNAIL_EXTENSION = ('WEBP', '.webp') if features.check('webp') else ('PNG', '.png')
+
+def pick_size(size: int) -> Optional[int]:
+    """Smallest variant covering the requested size, None when only the original does"""
+    for variant in THUMBNAIL_SIZES:
+        if variant >= size:
+            return variant
+    return None
+
+def thumbnail_path(original_path: str, size: int) -> str:
+    base, _ = os.path.splitext(original_path)
+    return f'{base}.{size}{THUMBNAIL_EXTENSION}'
+
+def _render(original_path: str, size: int) -> str:
+    path = thumbnail_path(original_path, size)
+    with Image.open(original_path) as image:
+        # JPEG decodes straight to a reduced scale, a large photo is never expanded in full
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    # Written aside and renamed, concurrent requests for a missing variant never see half a file
+    temp = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix='.thumb-', delete=False)
+    try:
+        with temp:
+            thumbnail.save(temp, THUMBNAIL_FORMAT)
+        os.replace(temp.name, path)
+    except BaseException:
+        os.remove(temp.name)
+        raise
+    return path
+
+def get_thumbnail(original_path: str, size: int) -> str:
+    """Path of the variant, rendered on first use. Falls back to the original
+    when Pillow can't read it"""
+    path = thumbnail_path(original_path, size)
+    if os.path.exists(path):
+        return path
+    try:
+        return _render(original_path, size)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return original_path
+
+def generate_thumbnails(original_path: str):
+    """Renders every missing variant, run as a background task after an upload"""
+    for size in THUMBNAIL_SIZES:
+        get_thumbnail(original_path, size)
+
+def remove_thumbnails(original_path: str):
+    for size in THUMBNAIL_SIZES:
+        path = thumbnail_path(original_path, size)
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,6 +1,6 @@
 from typing import Any, Dict, List, Optional
 from fastapi import HTTPException
-from sqlalchemy import literal
+from sqlalchemy import func, literal
 from sqlalchemy.orm import Session
 
 from ..user.schemas import UserResponse
@@ -9,19 +9,19 @@ from ..task.schemas import TaskFilters
 from ..models_db import UserProjectAssociation as db_UPA
 from ..models_db import Project as db_project
 from ..models_db import User as db_user
-from ..task.models import Task
+from ..task.models import ProjectTaskCounter, Task
+from ..project.project_repository import TASK_COUNT_COLUMNS
 from ..user.user_repository import UserRepository
+from ..sync.tombstone_repository import TombstoneRepository
+from ..events.broker import publish_membership_event
 
 class UserProjectAssociation:
     def __init__(self, db: Session):
         self.db = db
 
     def check_user_in_project(self, user_id: int, project_id: int) -> bool:
-        inviting_user_assoc = self.db.query(db_UPA).filter(
-            db_UPA.user_id == user_id,
-            db_UPA.project_id == project_id
-        ).first()   
-        return inviting_user_assoc is not None or UserRepository(self.db).check_admin_perms(user_id)
+        principal = UserRepository(self.db).get_principal(user_id)
+        return principal.is_member(project_id) or principal.is_admin
 
     def add_user_in_project(self, user_id: int, project_id: int):
         new_association = db_UPA(
@@ -29,6 +29,8 @@ class UserProjectAssociation:
             project_id=project_id)
         self.db.add(new_association)
         self.db.commit()
+        UserRepository(self.db).invalidate_principal(user_id)
+        publish_membership_event('member.added', project_id, [user_id])
     
     def create_project(self, user_id: int, project_id: int, category_id: int):
         new_association = db_UPA(
@@ -37,6 +39,8 @@ class UserProjectAssociation:
             category_id=category_id)
         self.db.add(new_association)
         self.db.commit()
+        UserRepository(self.db).invalidate_principal(user_id)
+        publish_membership_event('member.added', project_id, [user_id])
 
     def leave_project(self, user_id, project_id):
         project_user_assoc = self.db.query(db_UPA).filter(
@@ -44,7 +48,10 @@ class UserProjectAssociation:
             db_UPA.project_id == project_id
         ).first() 
         self.db.delete(project_user_assoc)
+        TombstoneRepository(self.db).record_project(project_id, [user_id])
         self.db.commit()
+        UserRepository(self.db).invalidate_principal(user_id)
+        publish_membership_event('member.removed', project_id, [user_id])
     
     def get_users_in_project(self, project_id) -> List[UserResponse]:
         users = self.db.query(
@@ -66,6 +73,37 @@ class UserProjectAssociation:
             is_verified=user.is_verified
         ) for user in users]
 
+    def get_users_in_project_version(self, project_id: int) -> tuple:
+        return tuple(self.db.query(
+            func.count(db_user.id),
+            func.sum(db_user.id),
+            func.max(db_user.updated_at)
+        ).join(
+            db_UPA, db_UPA.user_id == db_user.id
+        ).filter(
+            db_UPA.project_id == project_id
+        ).one())
+
+    def get_accessed_projects_version(self, user_id: int) -> tuple:
+        """Covers the rows of get_accessed_projects (with or without a category filter)"""
+        columns = (
+            func.count(db_project.id),
+            func.sum(db_project.id),
+            func.max(db_project.updated_at),
+            func.sum(ProjectTaskCounter.version)
+        )
+        if UserRepository(self.db).check_admin_perms(user_id):
+            query = self.db.query(*columns)
+        else:
+            query = self.db.query(*columns, func.max(db_UPA.updated_at)).join(
+                db_UPA, db_UPA.project_id == db_project.id
+            ).filter(
+                db_UPA.user_id == user_id
+            )
+        return tuple(query.outerjoin(
+            ProjectTaskCounter, ProjectTaskCounter.project_id == db_project.id
+        ).one())
+
     def get_accessed_projects(self, user_id: int) -> List[ProjectWithMembershipResponse]:
         if not UserRepository(self.db).check_admin_perms(user_id):
             projects = self.db.query(
@@ -74,10 +112,13 @@ class UserProjectAssociation:
                 db_UPA.category_id,
                 db_project.user_id,
                 db_project.created_at,
-                db_UPA.joined_at
+                db_UPA.joined_at,
+                *TASK_COUNT_COLUMNS
             ).join(
                 db_project,
                 db_UPA.project_id == db_project.id
+            ).outerjoin(
+                ProjectTaskCounter, ProjectTaskCounter.project_id == db_project.id
             ).filter(
                 db_UPA.user_id == user_id
             ).all()
@@ -88,7 +129,10 @@ class UserProjectAssociation:
                 literal(None).label('category_id'), 
                 db_project.user_id,
                 db_project.created_at,
-                literal(None).label('joined_at')   
+                literal(None).label('joined_at'),
+                *TASK_COUNT_COLUMNS
+            ).outerjoin(
+                ProjectTaskCounter, ProjectTaskCounter.project_id == db_project.id
             ).all()
         print(projects)
         return [ProjectWithMembershipResponse(
@@ -97,7 +141,10 @@ class UserProjectAssociation:
             category_id=project.category_id,
             owner_id=project.user_id,
             project_created_at=project.created_at,
-            user_joined_at=project.joined_at
+            user_joined_at=project.joined_at,
+            tasks_assigned=project.tasks_assigned,
+            tasks_in_progress=project.tasks_in_progress,
+            tasks_done=project.tasks_done
         ) for project in projects]
         # for project in projects:
         #     result.append({
@@ -117,10 +164,13 @@ class UserProjectAssociation:
             db_UPA.category_id,
             db_project.user_id,
             db_project.created_at,
-            db_UPA.joined_at
+            db_UPA.joined_at,
+            *TASK_COUNT_COLUMNS
         ).join(
             db_project,
             db_UPA.project_id == db_project.id
+        ).outerjoin(
+            ProjectTaskCounter, ProjectTaskCounter.project_id == db_project.id
         ).filter(
             db_UPA.user_id == user_id,
             db_UPA.category_id==category_id
@@ -133,7 +183,10 @@ class UserProjectAssociation:
                 "category_id": project.category_id,
                 "owner_id": project.user_id,
                 "project_created_at": project.created_at.isoformat() if project.created_at else None,
-                "user_joined_at": project.joined_at.isoformat() if project.joined_at else None
+                "user_joined_at": project.joined_at.isoformat() if project.joined_at else None,
+                "tasks_assigned": project.tasks_assigned,
+                "tasks_in_progress": project.tasks_in_progress,
+                "tasks_done": project.tasks_done
             })
         return result
         
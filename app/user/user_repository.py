@@ -1,12 +1,24 @@
+import os
+import time
 from typing import List
+from dotenv import load_dotenv
 from fastapi import HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from ..user.schemas import UpdateUserRequest, UserResponse
+from ..user.schemas import Principal, UpdateUserRequest, UserResponse
 from ..models_db import User as db_User
+from ..models_db import Project as db_Project
+from ..models_db import UserProjectAssociation as db_UPA
 from ..exceptions import UserNotFound
+from ..cache import create_cache
+from ..user.attachment_repository import AttachmentRepository, invalidate_icon
+from ..auth.password_hasher import hash_password, verify_password
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+load_dotenv()
+ACL_CACHE_TTL = int(os.getenv('ACL_CACHE_TTL', 60))
+ACL_CACHE_MAXSIZE = int(os.getenv('ACL_CACHE_MAXSIZE', 10000))
+
+principal_cache = create_cache('principals', maxsize=ACL_CACHE_MAXSIZE, ttl=ACL_CACHE_TTL)
 
 class UserRepository:
     def __init__(self, db: Session):
@@ -27,7 +39,7 @@ class UserRepository:
     def create_user(self, login: str, password: str) -> UserResponse:
         user = db_User(
             login = login,
-            hashed_password = bcrypt_context.hash(password)
+            hashed_password = hash_password(password)
         )
         self.db.add(user)
         self.db.commit()
@@ -41,7 +53,7 @@ class UserRepository:
 
     def auth_user(self, login: str, password: str) -> UserResponse:
         user = self._get_user_by_email(login)
-        if not bcrypt_context.verify(password, user.hashed_password):  
+        if not verify_password(password, user.hashed_password):  
             raise HTTPException(status_code=401, detail='Could not validate user.')
         return UserResponse(
             id = user.id,
@@ -62,8 +74,21 @@ class UserRepository:
             is_admin=user.is_admin
         )
     
+    def get_users_version(self) -> tuple:
+        return tuple(self.db.query(
+            func.count(db_User.id),
+            func.sum(db_User.id),
+            func.max(db_User.updated_at)
+        ).one())
+    
     def get_users(self) -> List[UserResponse]:
-        users = self.db.query(db_User).all()
+        users = self.db.query(
+            db_User.id,
+            db_User.login,
+            db_User.username,
+            db_User.icon_id,
+            db_User.is_verified
+        ).all()
         return [UserResponse(
             id=user.id,
             login=user.login,
@@ -72,6 +97,12 @@ class UserRepository:
             is_verified=user.is_verified
         ) for user in users]
     
+    def get_existing_user_ids(self, user_ids) -> set[int]:
+        if not user_ids:
+            return set()
+        rows = self.db.query(db_User.id).filter(db_User.id.in_(user_ids)).all()
+        return {user_id for user_id, in rows}
+    
     def get_user_by_email(self, email: str) -> UserResponse:
         user = self._get_user_by_email(email)
         if user is None:
@@ -95,9 +126,53 @@ class UserRepository:
         self.db.commit()
         return new_user_model
     
+    def get_principal(self, user_id: int) -> Principal:
+        """Looks up the session (i.e. request) memo first, then the cross-request
+        principal_cache, and only then queries the database"""
+        principals = self.db.info.setdefault('principals', {})
+        principal = principals.get(user_id)
+        if principal is None:
+            cached = principal_cache.get(str(user_id))
+            if cached is not None:
+                principal = Principal(**cached)
+            else:
+                principal = self._load_principal(user_id)
+                principal_cache.set(str(user_id), principal.model_dump(mode='json'))
+            principals[user_id] = principal
+        return principal
+
+    def _load_principal(self, user_id: int) -> Principal:
+        rows = self.db.query(
+            db_User.id,
+            db_User.is_admin,
+            db_UPA.project_id,
+            db_Project.user_id.label('owner_id')
+        ).outerjoin(
+            db_UPA, db_UPA.user_id == db_User.id
+        ).outerjoin(
+            db_Project, db_Project.id == db_UPA.project_id
+        ).filter(
+            db_User.id == user_id
+        ).all()
+        if not rows:
+            raise UserNotFound(user_id)
+        return Principal(
+            id=rows[0].id,
+            is_admin=bool(rows[0].is_admin),
+            project_roles={
+                row.project_id: 'owner' if row.owner_id == user_id else 'member'
+                for row in rows if row.project_id is not None
+            }
+        )
+
+    def invalidate_principal(self, user_id: int):
+        principals = self.db.info.get('principals')
+        if principals is not None:
+            principals.pop(user_id, None)
+        principal_cache.delete(str(user_id))
+
     def check_admin_perms(self, user_id):
-        user = self._get_user_by_id(user_id)
-        return user.is_admin
+        return self.get_principal(user_id).is_admin
     
     def update_user(self, user_id: int, user_data: UpdateUserRequest):
         user = self._get_user_by_id(user_id)
@@ -105,26 +180,36 @@ class UserRepository:
             user.username = user_data.new_username
         if user_data.new_email is not None:
             user.login = user_data.new_email
-        if user_data.attachment_id is not None:
+        replaced_icon_id = None
+        if user_data.attachment_id is not None and user_data.attachment_id != user.icon_id:
+            replaced_icon_id = user.icon_id
             user.icon_id = user_data.attachment_id
         self.db.commit()
+        invalidate_icon('user', user_id)
+        AttachmentRepository(self.db).release_attachment(replaced_icon_id)
         self.db.refresh(user)
 
     def update_user_password(self, user_id: int, password: str, new_password: str) -> bool:
         user = self._get_user_by_id(user_id)
-        if not bcrypt_context.verify(password, user.hashed_password):
+        if not verify_password(password, user.hashed_password):
             return False
-        user.hashed_password = bcrypt_context.hash(new_password)
+        user.hashed_password = hash_password(new_password)
+        user.tokens_valid_after = time.time()
         self.db.commit()
         self.db.refresh(user)
         return True
 
     def reset_user_password(self, user_id: int, new_password: str):
         user = self._get_user_by_id(user_id)
-        user.hashed_password = bcrypt_context.hash(new_password)
+        user.hashed_password = hash_password(new_password)
+        user.tokens_valid_after = time.time()
         self.db.commit()
         self.db.refresh(user)
 
+    def get_tokens_valid_after(self, user_id: int):
+        """Persisted revocation cutoff, shared by every process, None if never revoked"""
+        return self.db.query(db_User.tokens_valid_after).filter(db_User.id == user_id).scalar()
+
     def verify_user(self, email: str):
         user = self._get_user_by_email(email)
         user.is_verified = True
@@ -136,3 +221,4 @@ class UserRepository:
         user.is_admin = is_admin
         self.db.commit()
         self.db.refresh(user)
+        self.invalidate_principal(user_id)
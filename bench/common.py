@@ -0,0 +1,137 @@
+"""Shared setup of the benchmarks: a throwaway SQLite database and a way to call
+the app in-process without an HTTP client buffering the responses.
+
+Every script is run from the repository root, e.g. `python bench/task_list_encoding.py`.
+Numbers from SQLite on one machine are only good for comparing runs with each other"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup(**env: str) -> str:
+    """Points the app at a fresh database in a temp directory. Must run before anything
+    from app is imported, the settings are read at import time. Returns the data directory"""
+    data_dir = tempfile.mkdtemp(prefix='multitasker-bench-')
+    db_path = os.path.join(data_dir, 'db.sqlite')
+    settings = {
+        'URL_DATABASE': f'sqlite:///{db_path}',
+        'UPLOAD_DIRECTORY': os.path.join(data_dir, 'attachments'),
+        'SECRET_KEY': 'bench-secret',
+        'ALGORITHM': 'HS256',
+        'ACCESS_TOKEN_EXPIRE_MINUTES': '60',
+        'TEMP_TOKEN_EXPIRE_MINUTES': '60',
+        'SENDER_EMAIL': 'bench@example.com',
+        'SENDER_EMAIL_PASSWORD': 'unused',
+        'LOGIN_MASK': r'^[A-Za-z0-9\-_.]+@[A-Za-z0-9\-]+\.[A-Za-z0-9\-.]{2,}$',
+        'PASSWORD_MASK': r'^[A-Za-z0-9!#$%&*+\-<=>?@^_]{8,16}$',
+        'CACHE_BACKEND': 'memory',
+        'EMAIL_WORKER_ENABLED': 'false',
+        'BCRYPT_ROUNDS': '4',
+    }
+    settings.update(env)
+    os.environ.update(settings)
+    sys.path.insert(0, ROOT)
+    # Same workaround as tests/conftest.py: the composite primary key with an
+    # autoincrement id can't be created on SQLite by create_all
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        'CREATE TABLE user_project_association (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+        'user_id INTEGER REFERENCES user(id), project_id INTEGER REFERENCES project(id), '
+        'category_id INTEGER REFERENCES category(id) ON DELETE SET NULL, '
+        'joined_at DATETIME, updated_at DATETIME)'
+    )
+    connection.commit()
+    connection.close()
+    return data_dir
+
+async def request(app, method: str, path: str, headers: Optional[dict] = None,
+    json_body=None, form: Optional[dict] = None, params: Optional[dict] = None,
+    on_chunk: Optional[Callable[[bytes], None]] = None) -> tuple[int, bytes]:
+    """Runs one request through the ASGI app. With on_chunk the body is handed over
+    piece by piece and not kept, so a streamed response is never held in memory"""
+    request_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    body = b''
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        request_headers.append((b'content-type', b'application/json'))
+    elif form is not None:
+        body = urlencode(form).encode()
+        request_headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+    request_headers.append((b'content-length', str(len(body)).encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': urlencode(params or {}).encode(), 'root_path': '',
+        'headers': request_headers, 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    sent = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            # The client stays connected, a streamed response is read to its end
+            await asyncio.Event().wait()
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunk = message.get('body', b'')
+            if on_chunk is not None:
+                on_chunk(chunk)
+            else:
+                chunks.append(chunk)
+
+    await app(scope, receive, send)
+    return status, b''.join(chunks)
+
+async def register(app, login: str, password: str = 'Password123') -> dict:
+    """Registers and logs in a user, returns the Authorization header"""
+    await request(app, 'POST', '/register', json_body={'login': login, 'password': password})
+    status, body = await request(app, 'POST', '/login', form={'username': login, 'password': password})
+    assert status == 201, body
+    return {'Authorization': f"Bearer {json.loads(body)['access_token']}"}
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def insert_tasks(count: int, project_id: int, owner_id: int, batch: int = 10000):
+    """Bulk inserts tasks straight into the table, bypassing counters, FTS and events"""
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.task.models import Task
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        for start in range(0, count, batch):
+            connection.execute(insert(Task), [{
+                'name': f'task {i}',
+                'description': 'benchmark task with a description of typical length',
+                'indicator': 'green',
+                'status': 'Назначена',
+                'created_at': now,
+                'last_change': now,
+                'deadline': now + timedelta(days=i % 30),
+                'owner_id': owner_id,
+                'performer_id': owner_id,
+                'project_id': project_id,
+            } for i in range(start, min(count, start + batch))])
+
+def elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,100 @@
+"""Fan-out latency of task events to concurrent GET /events/ streams on one worker.
+Every stream is a real request through the app, its chunks are parsed as they arrive.
+Events are published from a separate thread, as a request handler in the threadpool
+does after its commit, and timed from publish to the chunk reaching the client.
+
+    python bench/events_fanout.py --connections 100 1000 5000 --events 200
+
+All streams follow the same project, so every event goes to every connection:
+the worst case for one publish"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+async def _run_level(connections: int, headers: dict, project_id: int) -> dict:
+    published = {}
+    latencies = []
+    ready = asyncio.Semaphore(0)
+    loop = asyncio.get_running_loop()
+
+    def on_chunk(chunk: bytes):
+        received = time.perf_counter()
+        if chunk.startswith(b'event: ready'):
+            ready.release()
+        elif chunk.startswith(b'event: task.updated'):
+            event = json.loads(chunk.split(b'data: ', 1)[1])
+            latencies.append((received - published[event['task_ids'][0]]) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    streams = [asyncio.create_task(common.request(app, 'GET', '/events/', headers=headers, on_chunk=on_chunk))
+        for _ in range(connections)]
+    for _ in range(connections):
+        await ready.acquire()
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    def publisher():
+        for sequence in range(args.events):
+            published[sequence] = time.perf_counter()
+            publish_task_event('task.updated', {project_id: [sequence]})
+            time.sleep(args.interval_ms / 1000)
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    expected = connections * args.events
+    while len(latencies) < expected and time.perf_counter() - start < args.timeout:
+        await asyncio.sleep(0.05)
+    await loop.run_in_executor(None, thread.join)
+    duration = time.perf_counter() - start
+
+    for stream in streams:
+        stream.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+    return {
+        'delivered': len(latencies),
+        'expected': expected,
+        'per_second': len(latencies) / duration,
+        'p50': common.percentile(latencies, 50),
+        'p99': common.percentile(latencies, 99),
+        'max': max(latencies, default=0.0),
+        'kb': per_connection / 1024,
+        'left': broker.stats()['subscriptions'],
+    }
+
+async def main():
+    headers = await common.register(app, 'bench@example.com')
+    _, body = await common.request(app, 'POST', '/my/projects/', headers=headers, json_body={'name': 'Bench'})
+    project_id = json.loads(body)['project_id']
+    print(f'events={args.events} interval={args.interval_ms}ms')
+    print(f"{'streams':>7} {'delivered':>12} {'per s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'KB/stream':>10} {'left subscribed':>16}")
+    for connections in args.connections:
+        result = await _run_level(connections, headers, project_id)
+        print(f"{connections:>7} {result['delivered']:>6}/{result['expected']:<5} {result['per_second']:>9.0f} "
+              f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['max']:>8.1f} "
+              f"{result['kb']:>10.1f} {result['left']:>16}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connections', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--interval-ms', type=float, default=20)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for every delivery')
+    args = parser.parse_args()
+
+    common.setup(EVENTS_HEARTBEAT_SECONDS='60', DB_POOL_SIZE='50')
+
+    from app.events.broker import broker, publish_task_event
+    from app.main import app
+
+    asyncio.run(main())
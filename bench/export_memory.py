@@ -0,0 +1,75 @@
+"""Peak memory of GET /tasks/export over a large project, next to the same rows served
+as one GET /tasks/ list. Tasks are bulk inserted first, which takes a while for 1M rows.
+
+    python bench/export_memory.py --rows 1000000 --format ndjson
+    python bench/export_memory.py --rows 100000 --compare-list
+
+The peak is what tracemalloc saw allocated by Python during the request, so it leaves
+out SQLite's own page cache. The body is counted and dropped as it arrives, like a
+client writing it to disk would"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+async def _run(method: str, path: str, headers: dict, params: dict) -> dict:
+    received = {'bytes': 0, 'chunks': 0}
+
+    def on_chunk(chunk: bytes):
+        received['bytes'] += len(chunk)
+        received['chunks'] += 1
+
+    status, _ = await common.request(app, method, path, headers=headers, params=params, on_chunk=on_chunk)
+    assert status == 200, status
+    return received
+
+async def _measure(method: str, path: str, headers: dict, params: dict) -> dict:
+    """Timed on one pass and traced on a second, tracemalloc slows the request down several times"""
+    start = time.perf_counter()
+    received = await _run(method, path, headers, params)
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    await _run(method, path, headers, params)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': duration, 'peak_mb': peak / 2 ** 20, 'mb': received['bytes'] / 2 ** 20,
+        'chunks': received['chunks']}
+
+def _report(name: str, result: dict):
+    print(f"{name:<22} {result['seconds']:>8.1f} {args.rows / result['seconds']:>10.0f} "
+          f"{result['mb']:>9.1f} {result['chunks']:>8} {result['peak_mb']:>13.1f}")
+
+async def main():
+    headers = await common.register(app, 'bench@example.com')
+    _, body = await common.request(app, 'POST', '/my/projects/', headers=headers, json_body={'name': 'Bench'})
+    project_id = json.loads(body)['project_id']
+    start = time.perf_counter()
+    common.insert_tasks(args.rows, project_id, owner_id=1)
+    print(f'inserted {args.rows} tasks in {time.perf_counter() - start:.0f} s')
+    print(f"{'request':<22} {'seconds':>8} {'rows/s':>10} {'body MB':>9} {'chunks':>8} {'peak heap MB':>13}")
+    _report(f'export {args.format}',
+        await _measure('GET', '/tasks/export', headers, {'format': args.format}))
+    if args.compare_list:
+        _report('list (GET /tasks/)', await _measure('GET', '/tasks/', headers, {}))
+    print(f'max RSS of the process: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--compare-list', action='store_true',
+        help='also serve all rows as one list, its peak grows with --rows')
+    args = parser.parse_args()
+
+    common.setup()
+
+    from app.main import app
+
+    asyncio.run(main())
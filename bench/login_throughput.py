@@ -0,0 +1,96 @@
+"""Logins per second through POST /login with bcrypt verification in the process pool
+(what the app does) or in the request thread (--mode inline, as before), for a number
+of concurrent clients. Requests shed with 429 are counted apart from the logins.
+
+    python bench/login_throughput.py --workers 4 --rounds 12 --concurrency 1 4 16 64
+    python bench/login_throughput.py --mode inline --rounds 12"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+class _InlineExecutor:
+    """Runs the hash in the calling request thread, under the GIL"""
+
+    def submit(self, func, *call_args):
+        future = Future()
+        future.set_result(func(*call_args))
+        return future
+
+async def _run_level(concurrency: int, form: dict) -> dict:
+    latencies, shed, failed = [], 0, 0
+    deadline = time.perf_counter() + args.seconds
+
+    async def client():
+        nonlocal shed, failed
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await common.request(app, 'POST', '/login', form=form)
+            if status == 201:
+                latencies.append(common.elapsed_ms(start))
+            elif status == 429:
+                shed += 1
+            else:
+                failed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    return {
+        'logins': len(latencies) / duration,
+        'p50': common.percentile(latencies, 50),
+        'p99': common.percentile(latencies, 99),
+        'shed': shed,
+        'failed': failed,
+    }
+
+async def main():
+    to_thread.current_default_thread_limiter().total_tokens = args.threadpool_size
+    await common.register(app, 'bench@example.com')
+    form = {'username': 'bench@example.com', 'password': 'Password123'}
+    # Under the GIL inline hashing uses one core at most
+    cores = min(args.workers, os.cpu_count() or 1) if args.mode == 'pool' else 1
+    print(f'mode={args.mode} workers={args.workers} rounds={args.rounds} '
+          f'concurrency limit={password_hasher.PASSWORD_HASH_CONCURRENCY} cpus={os.cpu_count()}')
+    print(f"{'clients':>7} {'logins/s':>9} {'per core':>9} {'p50 ms':>8} {'p99 ms':>8} {'429':>5} {'failed':>7}")
+    try:
+        for concurrency in args.concurrency:
+            result = await _run_level(concurrency, form)
+            print(f"{concurrency:>7} {result['logins']:>9.1f} {result['logins'] / cores:>9.1f} "
+                  f"{result['p50']:>8.0f} {result['p99']:>8.0f} {result['shed']:>5} {result['failed']:>7}")
+    finally:
+        password_hasher.shutdown_hasher()
+
+# The pool's workers are started with spawn and import this module again,
+# so everything app related stays under the guard
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--mode', choices=('pool', 'inline'), default='pool')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--hash-concurrency', type=int, default=None,
+        help='PASSWORD_HASH_CONCURRENCY, four per worker by default')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--seconds', type=float, default=10, help='duration of every level')
+    parser.add_argument('--threadpool-size', type=int, default=30)
+    args = parser.parse_args()
+
+    env = {'PASSWORD_HASH_WORKERS': str(args.workers), 'BCRYPT_ROUNDS': str(args.rounds)}
+    if args.hash_concurrency is not None:
+        env['PASSWORD_HASH_CONCURRENCY'] = str(args.hash_concurrency)
+    common.setup(**env)
+
+    from anyio import to_thread
+
+    from app.auth import password_hasher
+    from app.main import app
+
+    if args.mode == 'inline':
+        password_hasher._get_executor = _InlineExecutor
+
+    asyncio.run(main())
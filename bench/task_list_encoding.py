@@ -0,0 +1,86 @@
+"""Rows per second for a task list: plain column rows encoded by FastJSONResponse (what
+GET /tasks/ does) against one TaskItemResponse per ORM row validated and dumped the way
+FastAPI handles a response_model (how it was done before). Both bodies are checked to
+decode to the same JSON. The end-to-end line is GET /tasks/ through the app, query included.
+
+    python bench/task_list_encoding.py --rows 10000 --repeat 20"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+def _rate(func, repeat: int) -> tuple[float, bytes]:
+    body = func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return args.rows * repeat / (time.perf_counter() - start), body
+
+async def main():
+    headers = await common.register(app, 'bench@example.com')
+    _, body = await common.request(app, 'POST', '/my/projects/', headers=headers, json_body={'name': 'Bench'})
+    project_id = json.loads(body)['project_id']
+    common.insert_tasks(args.rows, project_id, owner_id=1)
+
+    db = Sessionlocal()
+    # With the description, as every item had it before the list went to plain rows
+    filters = TaskFilters(status=None, indicator=None, limit=None, fields=['description'])
+    rows = TaskRepository(db).get_accessed_tasks_filter(1, filters)
+    tasks = db.query(Task).filter(Task.project_id == project_id).all()
+    adapter = TypeAdapter(List[TaskItemResponse])
+
+    def plain_rows() -> bytes:
+        return FastJSONResponse(rows).body
+
+    def pydantic_models() -> bytes:
+        items = [TaskItemResponse(
+            id=task.id, name=task.name, status=task.status, indicator=task.indicator,
+            created_at=task.created_at, last_change=task.last_change, deadline=task.deadline,
+            description=task.description, project_id=task.project_id
+        ) for task in tasks]
+        # FastAPI validates the returned value against response_model, dumps it to
+        # JSON-compatible data and JSONResponse encodes that with the json module
+        content = adapter.dump_python(adapter.validate_python(items), mode='json')
+        return JSONResponse(content).body
+
+    print(f'rows={args.rows} repeat={args.repeat}')
+    print(f"{'path':<34} {'rows/s':>10}")
+    pydantic_rate, pydantic_body = _rate(pydantic_models, args.repeat)
+    print(f"{'TaskItemResponse + response_model':<34} {pydantic_rate:>10.0f}")
+    plain_rate, plain_body = _rate(plain_rows, args.repeat)
+    print(f"{'plain rows + orjson':<34} {plain_rate:>10.0f}   x{plain_rate / pydantic_rate:.1f}")
+    assert json.loads(plain_body) == json.loads(pydantic_body), 'the two paths encode different JSON'
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        status, _ = await common.request(app, 'GET', '/tasks/', headers=headers, params={'fields': 'description'})
+        assert status == 200, status
+    end_to_end = args.rows * args.repeat / (time.perf_counter() - start)
+    print(f"{'GET /tasks/ end to end':<34} {end_to_end:>10.0f}")
+    db.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    common.setup()
+
+    from typing import List
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from app.database import Sessionlocal
+    from app.main import app
+    from app.responses import FastJSONResponse
+    from app.task.models import Task
+    from app.task.repositories.task_repository import TaskRepository
+    from app.task.schemas import TaskFilters, TaskItemResponse
+
+    asyncio.run(main())
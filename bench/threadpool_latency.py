@@ -0,0 +1,133 @@
+"""Latency of mixed task/project traffic at rising concurrency, with the sync handlers
+dispatched to the size-capped threadpool (what the app does) or run inline on the event
+loop (how the async def handlers behaved before). --query-delay-ms adds a sleep per SQL
+statement, standing in for the network round trip to PostgreSQL that SQLite doesn't have.
+
+    python bench/threadpool_latency.py --mode threadpool --threadpool-size 30
+    python bench/threadpool_latency.py --mode inline
+
+Besides p50/p99 it reports the worst event loop lag, how late a 5 ms timer fired while
+the load ran: everything else on the worker (SSE streams, health checks) waits that long.
+Errors are requests that failed. Past the connection pool size these used to be pool
+timeouts, when a finished handler kept its session until FastAPI had validated the response
+in another threadpool slot; SessionRoute now closes it as the handler returns"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+async def _monitor_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(common.elapsed_ms(start) - 5)
+
+async def _run_level(concurrency: int, traffic: list) -> dict:
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(traffic[i % len(traffic)])
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            method, path, kwargs = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                status, _ = await common.request(app, method, path, **kwargs)
+            except Exception:
+                # What the server would answer with a 500, e.g. a connection pool timeout
+                status = 500
+            latencies.append(common.elapsed_ms(start))
+            if status >= 400:
+                errors += 1
+
+    stop, lags = asyncio.Event(), []
+    monitor = asyncio.create_task(_monitor_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    stop.set()
+    await monitor
+    return {
+        'rps': len(latencies) / duration,
+        'p50': common.percentile(latencies, 50),
+        'p99': common.percentile(latencies, 99),
+        'lag': max(lags, default=0.0),
+        'errors': errors,
+    }
+
+async def main():
+    to_thread.current_default_thread_limiter().total_tokens = args.threadpool_size
+    headers = await common.register(app, 'bench@example.com')
+    _, body = await common.request(app, 'POST', '/my/projects/', headers=headers, json_body={'name': 'Bench'})
+    project_id = json.loads(body)['project_id']
+    for i in range(50):
+        await common.request(app, 'POST', f'/tasks/{project_id}', headers=headers, json_body={
+            'name': f'task {i}', 'description': 'bench', 'deadline': '2030-01-01T00:00:00'
+        })
+    _, body = await common.request(app, 'GET', '/tasks/', headers=headers)
+    task_id = json.loads(body)[0]['id']
+    # Mostly reads, as in production, with a status change every tenth request
+    traffic = [
+        ('GET', '/tasks/', {'headers': headers}),
+        ('GET', f'/tasks/{task_id}', {'headers': headers}),
+        ('GET', '/projects/', {'headers': headers}),
+        ('GET', '/my/projects/', {'headers': headers}),
+        ('GET', '/notifications/', {'headers': headers}),
+        ('GET', '/tasks/', {'headers': headers, 'params': {'limit': 20}}),
+        ('GET', f'/tasks/{task_id}', {'headers': headers}),
+        ('GET', '/projects/stats', {'headers': headers}),
+        ('GET', '/tasks/', {'headers': headers}),
+        ('PUT', f'/tasks/{task_id}', {'headers': headers, 'json_body': {'description': 'changed'}}),
+    ]
+    print(f'mode={args.mode} threadpool={args.threadpool_size} query_delay={args.query_delay_ms}ms '
+          f'requests/level={args.requests}')
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max loop lag ms':>16} {'errors':>7}")
+    for concurrency in args.concurrency:
+        result = await _run_level(concurrency, traffic)
+        print(f"{concurrency:>11} {result['rps']:>8.0f} {result['p50']:>8.1f} {result['p99']:>8.1f} "
+              f"{result['lag']:>16.1f} {result['errors']:>7}")
+
+# Everything app related happens under the guard, the password hashing pool starts
+# its workers with spawn and they import this module again
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--mode', choices=('threadpool', 'inline'), default='threadpool')
+    parser.add_argument('--threadpool-size', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64, 128])
+    parser.add_argument('--requests', type=int, default=2000, help='requests per concurrency level')
+    parser.add_argument('--query-delay-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    # Inline, a request blocking the loop on an exhausted connection pool waits for a
+    # session only the loop can close, so that mode gets a connection per client
+    pool_size = max(args.concurrency) if args.mode == 'inline' else args.threadpool_size
+    common.setup(DB_POOL_SIZE=str(pool_size), DB_MAX_OVERFLOW='0')
+
+    from anyio import to_thread
+    from sqlalchemy import event
+    import fastapi.concurrency
+    import fastapi.dependencies.utils
+    import fastapi.routing
+
+    from app.database import engine
+    from app.main import app
+
+    if args.query_delay_ms:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _round_trip(conn, cursor, statement, parameters, context, executemany):
+            time.sleep(args.query_delay_ms / 1000)
+
+    if args.mode == 'inline':
+        async def _inline(func, *call_args, **call_kwargs):
+            return func(*call_args, **call_kwargs)
+        for module in (fastapi.routing, fastapi.dependencies.utils, fastapi.concurrency):
+            module.run_in_threadpool = _inline
+
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings at import time, so they are set before anything from it is imported
+_data_dir = tempfile.mkdtemp(prefix='multitasker-tests-')
+_db_path = os.path.join(_data_dir, 'db.sqlite')
+os.environ.update({
+    'URL_DATABASE': f'sqlite:///{_db_path}',
+    'UPLOAD_DIRECTORY': os.path.join(_data_dir, 'attachments'),
+    'SECRET_KEY': 'test-secret',
+    'ALGORITHM': 'HS256',
+    'ACCESS_TOKEN_EXPIRE_MINUTES': '30',
+    'TEMP_TOKEN_EXPIRE_MINUTES': '60',
+    'SENDER_EMAIL': 'tests@example.com',
+    'SENDER_EMAIL_PASSWORD': 'unused',
+    'LOGIN_MASK': r'^[A-Za-z0-9\-_.]+@[A-Za-z0-9\-]+\.[A-Za-z0-9\-.]{2,}$',
+    'PASSWORD_MASK': r'^[A-Za-z0-9!#$%&*+\-<=>?@^_]{8,16}$',
+    'CACHE_BACKEND': 'memory',
+    'EMAIL_WORKER_ENABLED': 'false',
+    'BCRYPT_ROUNDS': '4',
+    'PASSWORD_HASH_WORKERS': '1',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# user_project_association has an autoincrement id inside a composite primary key,
+# which create_all can't express on SQLite. The table is created here the way Postgres has it
+_connection = sqlite3.connect(_db_path)
+_connection.execute(
+    'CREATE TABLE user_project_association (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'user_id INTEGER REFERENCES user(id), project_id INTEGER REFERENCES project(id), '
+    'category_id INTEGER REFERENCES category(id) ON DELETE SET NULL, '
+    'joined_at DATETIME, updated_at DATETIME)'
+)
+_connection.commit()
+_connection.close()
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import engine
+from app.main import app
+
+
+class StatementCounter:
+    """Counts the statements sent to the database while active"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.count += 1
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self.count = 0
+        self.statements = []
+        self.active = True
+        return self
+
+    def __exit__(self, *exc_info):
+        self.active = False
+
+
+@pytest.fixture(scope='session')
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope='session')
+def statement_counter():
+    counter = StatementCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    yield counter
+    event.remove(engine, 'before_cursor_execute', counter)
+
+
+@pytest.fixture(scope='session')
+def register(client):
+    """Registers and logs in a user, returns the Authorization header"""
+    def register(login: str, password: str = 'Password123') -> dict:
+        client.post('/register', json={'login': login, 'password': password})
+        response = client.post('/login', data={'username': login, 'password': password})
+        assert response.status_code == 201, response.text
+        return {'Authorization': f"Bearer {response.json()['access_token']}"}
+    return register
@@ -0,0 +1,111 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image
+
+from app.database import Sessionlocal
+from app.models_db import Attachment
+from app.user import attachment_repository
+from app.user.attachment_repository import UPLOAD_DIRECTORY
+from app.user.service import attachment_service
+
+
+def _png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _upload(client, headers: dict, content: bytes) -> int:
+    response = client.post('/files/', files={'uploaded_file': ('icon.png', content, 'image/png')}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()['attachment_id']
+
+
+def _file_of(attachment_id: int):
+    """Path of the attachment's file, None once the row is gone"""
+    db = Sessionlocal()
+    try:
+        attachment = db.get(Attachment, attachment_id)
+        return None if attachment is None else os.path.join(UPLOAD_DIRECTORY, attachment.path)
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def no_sweep(monkeypatch):
+    """Uploads don't sweep unless a test asks for it"""
+    monkeypatch.setattr(attachment_service, '_swept_at', time.monotonic())
+
+
+@pytest.fixture
+def no_grace(monkeypatch):
+    """Unused attachments are removed at once instead of after UNUSED_ATTACHMENT_HOURS"""
+    monkeypatch.setattr(attachment_repository, 'UNUSED_ATTACHMENT_HOURS', 0)
+
+
+def test_identical_uploads_share_one_file(client, register):
+    headers = register('same-content@example.com')
+    first = _upload(client, headers, _png('navy'))
+    assert _upload(client, headers, _png('navy')) == first
+    assert os.path.exists(_file_of(first))
+
+
+def test_replaced_icon_is_removed(client, register, no_grace):
+    headers = register('replacing@example.com')
+    old = _upload(client, headers, _png('red'))
+    client.put('/me', json={'attachment_id': old}, headers=headers)
+    old_path = _file_of(old)
+
+    new = _upload(client, headers, _png('green'))
+    client.put('/me', json={'attachment_id': new}, headers=headers)
+
+    assert _file_of(old) is None and not os.path.exists(old_path)
+    assert os.path.exists(_file_of(new))
+
+
+def test_shared_icon_stays_until_last_owner_goes(client, register, no_grace):
+    headers = register('sharing@example.com')
+    attachment_id = _upload(client, headers, _png('blue'))
+    project_id = client.post('/my/projects/', json={'name': 'Iconic'}, headers=headers).json()['project_id']
+    client.put('/me', json={'attachment_id': attachment_id}, headers=headers)
+    client.put(f'/my/projects/{project_id}', json={'icon_id': attachment_id}, headers=headers)
+    path = _file_of(attachment_id)
+
+    assert client.delete('/files/', headers=headers).status_code == 204
+    assert os.path.exists(path)
+
+    assert client.delete('/my/projects/', params={'project_id': project_id}, headers=headers).status_code == 204
+    assert _file_of(attachment_id) is None and not os.path.exists(path)
+
+
+def test_upload_never_set_as_icon_is_swept(client, register, monkeypatch):
+    headers = register('abandoning@example.com')
+    abandoned = _upload(client, headers, _png('yellow'))
+    path = _file_of(abandoned)
+    db = Sessionlocal()
+    db.get(Attachment, abandoned).uploaded_at = datetime.now(timezone.utc) - timedelta(days=2)
+    db.commit()
+    db.close()
+    monkeypatch.setattr(attachment_service, '_swept_at', None)
+
+    fresh = _upload(client, headers, _png('purple'))
+
+    assert _file_of(abandoned) is None and not os.path.exists(path)
+    # Within its grace period, there is still time to set it as an icon
+    assert os.path.exists(_file_of(fresh))
+
+
+def test_project_icon_is_shown_only_to_members(client, register):
+    owner = register('icon-owner@example.com')
+    stranger = register('icon-stranger@example.com')
+    attachment_id = _upload(client, owner, _png('orange'))
+    project_id = client.post('/my/projects/', json={'name': 'Private icon'}, headers=owner).json()['project_id']
+    client.put(f'/my/projects/{project_id}', json={'icon_id': attachment_id}, headers=owner)
+
+    for path, params in (('/files/icon', {'project_id': project_id}), (f'/files/icons/{attachment_id}', {})):
+        assert client.get(path, params=params, headers=owner).status_code == 200
+        assert client.get(path, params=params, headers=stranger).status_code == 403
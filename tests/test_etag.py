@@ -0,0 +1,34 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def tagged(client, register):
+    headers = register('etag@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Tagged'}, headers=headers).json()['project_id']
+    for i in range(3):
+        client.post(f'/tasks/{project_id}', json={'name': f'tagged {i}', 'deadline': '2030-01-01T00:00:00'}, headers=headers)
+    return {'headers': headers, 'project_id': project_id}
+
+
+@pytest.mark.parametrize('extra', [{}, {'limit': 2}])
+def test_task_list_revalidates_until_a_change(client, tagged, extra):
+    params = {'project_id': tagged['project_id'], **extra}
+    first = client.get('/tasks/', params=params, headers=tagged['headers'])
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+
+    revalidated = client.get('/tasks/', params=params, headers={**tagged['headers'], 'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.headers['ETag'] == etag
+
+    body = first.json()
+    task_id = (body['items'] if extra else body)[0]['id']
+    client.put(f'/tasks/{task_id}', json={'name': f'renamed {etag}'}, headers=tagged['headers'])
+    changed = client.get('/tasks/', params=params, headers={**tagged['headers'], 'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_task_detail_revalidates(client, tagged):
+    task_id = client.get('/tasks/', params={'project_id': tagged['project_id']}, headers=tagged['headers']).json()[0]['id']
+    etag = client.get(f'/tasks/{task_id}', headers=tagged['headers']).headers['ETag']
+    response = client.get(f'/tasks/{task_id}', headers={**tagged['headers'], 'If-None-Match': etag})
+    assert response.status_code == 304
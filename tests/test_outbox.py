@@ -0,0 +1,118 @@
+import socket
+from datetime import datetime, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app import email_controller
+from app.database import Sessionlocal
+from app.outbox import outbox_repository
+from app.outbox.models import EmailOutbox
+from app.outbox.outbox_repository import EmailOutboxRepository
+from app.outbox.worker import EmailOutboxWorker
+
+REJECTED = 'rejected@example.com'
+
+
+class RecordingHandler:
+    """Local SMTP stand-in: keeps what it receives, refuses REJECTED"""
+
+    def __init__(self):
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REJECTED:
+            return '550 mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server(client, monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    monkeypatch.setattr(email_controller, 'SMTP_HOST', '127.0.0.1')
+    monkeypatch.setattr(email_controller, 'SMTP_PORT', port)
+    monkeypatch.setattr(email_controller, 'SMTP_STARTTLS', False)
+    monkeypatch.setattr(email_controller, 'SENDER_EMAIL_PASSWORD', '')
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def worker():
+    worker = EmailOutboxWorker()
+    yield worker
+    worker.connection.close()
+
+
+def _enqueue(*recipients: str) -> list:
+    db = Sessionlocal()
+    try:
+        return [EmailOutboxRepository(db).enqueue(recipient, 'Subject', 'Body') for recipient in recipients]
+    finally:
+        db.close()
+
+
+def _load(message_id: int) -> EmailOutbox:
+    db = Sessionlocal()
+    try:
+        return db.get(EmailOutbox, message_id)
+    finally:
+        db.close()
+
+
+def _make_due(message_id: int):
+    db = Sessionlocal()
+    try:
+        db.get(EmailOutbox, message_id).next_attempt_at = datetime.now(timezone.utc)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_sends_queued_messages(smtp_server, worker):
+    first, second = _enqueue('first@example.com', 'second@example.com')
+
+    worker.run_once()
+
+    assert {'first@example.com', 'second@example.com'} <= set(smtp_server.received)
+    for message_id in (first, second):
+        message = _load(message_id)
+        assert (message.status, message.attempts, message.last_error) == ('sent', 1, None)
+
+
+def test_retries_then_gives_up(smtp_server, worker, monkeypatch):
+    monkeypatch.setattr(outbox_repository, 'EMAIL_MAX_ATTEMPTS', 2)
+    message_id, = _enqueue(REJECTED)
+
+    worker.run_once()
+    message = _load(message_id)
+    assert (message.status, message.attempts) == ('pending', 1)
+    assert 'SMTPRecipientsRefused' in message.last_error
+    assert message.next_attempt_at > datetime.now()
+
+    _make_due(message_id)
+    worker.run_once()
+    message = _load(message_id)
+    assert (message.status, message.attempts) == ('failed', 2)
+
+
+def test_unencodable_message_does_not_stop_the_batch(smtp_server, worker):
+    poison, healthy = _enqueue('пользователь@example.com', 'after-poison@example.com')
+
+    worker.run_once()
+
+    message = _load(poison)
+    assert (message.status, message.attempts) == ('pending', 1)
+    assert 'UnicodeEncodeError' in message.last_error
+    assert _load(healthy).status == 'sent'
+    assert 'after-poison@example.com' in smtp_server.received
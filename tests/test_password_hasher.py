@@ -0,0 +1,26 @@
+import os
+import signal
+import threading
+
+from app.auth import password_hasher
+
+
+def test_login_is_shed_when_every_slot_is_busy(client, register, monkeypatch):
+    register('shed@example.com')
+    monkeypatch.setattr(password_hasher, '_slots', threading.Semaphore(0))
+    monkeypatch.setattr(password_hasher, 'PASSWORD_HASH_QUEUE_TIMEOUT', 0.01)
+
+    response = client.post('/login', data={'username': 'shed@example.com', 'password': 'Password123'})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_hasher_recovers_from_a_dead_worker():
+    hashed = password_hasher.hash_password('Password123')
+    for process in list(password_hasher._get_executor()._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+    assert password_hasher.verify_password('Password123', hashed)
+    assert not password_hasher.verify_password('Password456', hashed)
@@ -0,0 +1,56 @@
+import pytest
+
+from app.user.user_repository import UserRepository, principal_cache
+
+# Upper bounds on the statements one request sends with an empty principal cache,
+# raising one means a change added queries to a hot path
+STATEMENT_BOUNDS = {
+    ('GET', '/tasks/'): 2,
+    ('GET', '/tasks/{task_id}'): 3,
+    ('PUT', '/tasks/{task_id}'): 11,
+    ('GET', '/projects/'): 3,
+    ('GET', '/my/projects/'): 2,
+    ('GET', '/notifications/'): 1,
+}
+
+
+@pytest.fixture(scope='module')
+def project(client, register):
+    owner = register('owner@example.com')
+    response = client.post('/my/projects/', json={'name': 'Counted'}, headers=owner)
+    project_id = response.json()['project_id']
+    for i in range(5):
+        response = client.post(
+            f'/tasks/{project_id}',
+            json={'name': f'task {i}', 'description': 'counted', 'deadline': f'2030-01-0{i + 1}T00:00:00'},
+            headers=owner
+        )
+        assert response.status_code == 201, response.text
+    task_ids = [task['id'] for task in client.get('/tasks/', headers=owner).json()]
+    return {'owner': owner, 'project_id': project_id, 'task_id': task_ids[0]}
+
+
+@pytest.fixture
+def principal_loads(monkeypatch):
+    loads = []
+    original = UserRepository._load_principal
+
+    def counting_load(self, user_id):
+        loads.append(user_id)
+        return original(self, user_id)
+
+    monkeypatch.setattr(UserRepository, '_load_principal', counting_load)
+    return loads
+
+
+@pytest.mark.parametrize('method, path', list(STATEMENT_BOUNDS))
+def test_statement_bound(client, statement_counter, principal_loads, project, method, path):
+    url = path.format(task_id=project['task_id'])
+    kwargs = {'json': {'status': 'В работе'}} if method == 'PUT' else {}
+    principal_cache.clear()
+    with statement_counter:
+        response = client.request(method, url, headers=project['owner'], **kwargs)
+    assert response.status_code == 200, response.text
+    assert statement_counter.count <= STATEMENT_BOUNDS[(method, path)], statement_counter.statements
+    # Every permission check of the request reads the same principal
+    assert len(principal_loads) <= 1
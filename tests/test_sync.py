@@ -0,0 +1,44 @@
+from app.task.repositories.task_repository import MAX_TREE_DEPTH
+
+
+def _create_task(client, headers: dict, project_id: int, name: str, parent_id=None) -> int:
+    response = client.post(f'/tasks/{project_id}', json={
+        'name': name, 'deadline': '2030-01-01T00:00:00', 'parent_task_id': parent_id
+    }, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()['task_id']
+
+
+def test_incremental_sync_returns_new_tasks(client, register):
+    headers = register('syncing@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Synced'}, headers=headers).json()['project_id']
+    old_id = _create_task(client, headers, project_id, 'before')
+
+    full = client.get('/sync/', headers=headers).json()
+    assert full['full'] is True and old_id in {task['id'] for task in full['tasks']}
+
+    new_id = _create_task(client, headers, project_id, 'after')
+    delta = client.get('/sync/', params={'since': full['token']}, headers=headers).json()
+    assert delta['full'] is False
+    assert new_id in {task['id'] for task in delta['tasks']}
+
+
+def test_deleted_subtree_is_tombstoned_at_any_depth(client, register):
+    headers = register('sync-deep@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Deep sync'}, headers=headers).json()['project_id']
+    # Deeper than the /tree cap, every level has to reach the clients
+    chain = []
+    for level in range(MAX_TREE_DEPTH + 5):
+        chain.append(_create_task(client, headers, project_id, f'level {level}', chain[-1] if chain else None))
+    token = client.get('/sync/', headers=headers).json()['token']
+
+    assert client.delete(f'/tasks/{chain[0]}', headers=headers).status_code == 204
+
+    delta = client.get('/sync/', params={'since': token}, headers=headers).json()
+    deleted = {item['id'] for item in delta['deleted'] if item['entity'] == 'task'}
+    assert set(chain) <= deleted
+
+
+def test_invalid_token_is_rejected(client, register):
+    headers = register('sync-token@example.com')
+    assert client.get('/sync/', params={'since': 'not a token'}, headers=headers).status_code == 400
@@ -0,0 +1,36 @@
+def test_batch_create_reports_each_item(client, register):
+    headers = register('batching@example.com')
+    stranger = register('batch-stranger@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Batched'}, headers=headers).json()['project_id']
+    foreign_id = client.post('/my/projects/', json={'name': 'Foreign'}, headers=stranger).json()['project_id']
+
+    response = client.post('/tasks/batch', json={'items': [
+        {'project_id': project_id, 'name': 'first', 'deadline': '2030-01-01T00:00:00'},
+        {'project_id': foreign_id, 'name': 'denied', 'deadline': '2030-01-01T00:00:00'},
+        {'project_id': project_id, 'name': 'second', 'deadline': '2030-01-01T00:00:00'},
+    ]}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    results = response.json()['results']
+    assert [(result['index'], result['status']) for result in results] == [(0, 'created'), (1, 'error'), (2, 'created')]
+    names = {task['id']: task['name'] for task in client.get('/tasks/', params={'project_id': project_id}, headers=headers).json()}
+    assert names == {results[0]['task_id']: 'first', results[2]['task_id']: 'second'}
+
+
+def test_batch_update_reports_each_item(client, register):
+    headers = register('batch-updating@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Batch updated'}, headers=headers).json()['project_id']
+    task_id = client.post(f'/tasks/{project_id}', json={'name': 'old', 'deadline': '2030-01-01T00:00:00'},
+        headers=headers).json()['task_id']
+
+    response = client.patch('/tasks/batch', json={'items': [
+        {'id': task_id, 'name': 'renamed', 'status': 'В работе'},
+        {'id': 10 ** 9, 'name': 'missing'},
+    ]}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert [(result['status'], result['detail']) for result in response.json()['results']] == [
+        ('updated', None), ('error', 'Task not found')
+    ]
+    task = client.get(f'/tasks/{task_id}', headers=headers).json()
+    assert (task['name'], task['status']) == ('renamed', 'В работе')
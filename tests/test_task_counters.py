@@ -0,0 +1,43 @@
+from sqlalchemy import select
+
+from app.database import engine
+from app.task.models import PerformerTaskCounter, ProjectTaskCounter
+from app.task.repositories.task_counter_repository import rebuild_task_counters
+from app.task.repositories.task_repository import MAX_TREE_DEPTH
+
+
+def _counters():
+    with engine.connect() as connection:
+        performers = connection.execute(select(
+            PerformerTaskCounter.performer_id, PerformerTaskCounter.project_id,
+            PerformerTaskCounter.assigned, PerformerTaskCounter.in_progress, PerformerTaskCounter.done
+        ).order_by(PerformerTaskCounter.performer_id, PerformerTaskCounter.project_id)).all()
+        projects = connection.execute(select(
+            ProjectTaskCounter.project_id,
+            ProjectTaskCounter.assigned, ProjectTaskCounter.in_progress, ProjectTaskCounter.done
+        ).order_by(ProjectTaskCounter.project_id)).all()
+    return performers, projects
+
+
+def test_incremental_counters_match_a_rebuild(client, register):
+    headers = register('counted@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Deep'}, headers=headers).json()['project_id']
+    # A chain deeper than the /tree cap, deleting the root takes every level with it
+    parent_id = None
+    for level in range(MAX_TREE_DEPTH + 5):
+        response = client.post(f'/tasks/{project_id}', json={
+            'name': f'level {level}', 'deadline': '2030-01-01T00:00:00', 'parent_task_id': parent_id
+        }, headers=headers)
+        assert response.status_code == 201, response.text
+        parent_id = response.json()['task_id']
+    root_id = client.get('/tasks/', params={'project_id': project_id, 'sort_by': 'created_at'}, headers=headers).json()[0]['id']
+    other = client.post(f'/tasks/{project_id}', json={'name': 'kept', 'deadline': '2030-01-01T00:00:00'}, headers=headers)
+    client.put(f"/tasks/{other.json()['task_id']}", json={'status': 'В работе'}, headers=headers)
+
+    assert client.delete(f'/tasks/{root_id}', headers=headers).status_code == 204
+
+    incremental = _counters()
+    with engine.begin() as connection:
+        rebuild_task_counters(connection)
+    assert _counters() == incremental
+    assert (project_id, 0, 1, 0) in incremental[1]
@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.database import engine
+
+
+@pytest.fixture(scope='module')
+def exporter(client, register):
+    owner = register('exporter@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Exported'}, headers=owner).json()['project_id']
+    for i in range(3):
+        client.post(f'/tasks/{project_id}', json={'name': f'export {i}', 'deadline': '2030-01-01T00:00:00'}, headers=owner)
+    return {'headers': owner, 'project_id': project_id}
+
+
+def test_export_formats(client, exporter):
+    params = {'project_id': exporter['project_id']}
+    response = client.get('/tasks/export', params=params, headers=exporter['headers'])
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['name'] for row in rows] == ['export 0', 'export 1', 'export 2']
+
+    response = client.get('/tasks/export', params={**params, 'format': 'csv'}, headers=exporter['headers'])
+    assert response.status_code == 200
+    header, *lines = csv.reader(io.StringIO(response.text))
+    assert 'name' in header and len(lines) == 3
+    # The session of the streamed body is closed with the request
+    assert engine.pool.checkedout() == 0
+
+
+def test_export_checks_access_before_streaming(client, register, exporter):
+    stranger = register('export-stranger@example.com')
+    response = client.get('/tasks/export', params={'project_id': exporter['project_id']}, headers=stranger)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize('params', [{'cursor': 'anything'}, {'limit': 10}])
+def test_export_rejects_pagination(client, exporter, params):
+    response = client.get('/tasks/export', params=params, headers=exporter['headers'])
+    assert response.status_code == 400
@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def paged(client, register):
+    headers = register('paging@example.com')
+    project_id = client.post('/my/projects/', json={'name': 'Paged'}, headers=headers).json()['project_id']
+    for day in (3, 1, 5, 2, 4):
+        response = client.post(f'/tasks/{project_id}', json={
+            'name': f'day {day}', 'deadline': f'2030-01-0{day}T00:00:00'
+        }, headers=headers)
+        assert response.status_code == 201, response.text
+    return {'headers': headers, 'project_id': project_id}
+
+
+def _walk(client, paged, **params) -> list:
+    names, cursor = [], None
+    while True:
+        response = client.get('/tasks/', params={
+            'project_id': paged['project_id'], 'limit': 2, **params, **({'cursor': cursor} if cursor else {})
+        }, headers=paged['headers'])
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page['items']) <= 2
+        names += [task['name'] for task in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize('sort_order, expected', [
+    ('asc', ['day 1', 'day 2', 'day 3', 'day 4', 'day 5']),
+    ('desc', ['day 5', 'day 4', 'day 3', 'day 2', 'day 1']),
+])
+def test_pages_cover_every_task_once(client, paged, sort_order, expected):
+    assert _walk(client, paged, sort_by='deadline', sort_order=sort_order) == expected
+
+
+def test_cursor_of_another_sort_is_rejected(client, paged):
+    cursor = client.get('/tasks/', params={
+        'project_id': paged['project_id'], 'limit': 2, 'sort_by': 'deadline'
+    }, headers=paged['headers']).json()['next_cursor']
+    response = client.get('/tasks/', params={
+        'project_id': paged['project_id'], 'limit': 2, 'sort_by': 'created_at', 'cursor': cursor
+    }, headers=paged['headers'])
+    assert response.status_code == 400
+
+
+def test_malformed_cursor_is_rejected(client, paged):
+    response = client.get('/tasks/', params={'cursor': 'garbage', 'limit': 2}, headers=paged['headers'])
+    assert response.status_code == 400
@@ -0,0 +1,40 @@
+import time
+
+from app.auth import auth
+from app.auth.token_cache import TokenCache
+from app.database import Sessionlocal
+from app.models_db import User
+
+
+def test_password_change_revokes_earlier_tokens(client, register):
+    headers = register('revoking@example.com')
+    assert client.get('/my/categories/', headers=headers).status_code == 200
+
+    response = client.put('/me', json={
+        'old_password': 'Password123', 'new_password': 'Password456', 'confirm_password': 'Password456'
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    assert client.get('/my/categories/', headers=headers).status_code == 401
+    assert client.get('/my/categories/', headers=register('revoking@example.com', 'Password456')).status_code == 200
+
+
+def test_revocation_is_known_to_a_fresh_process(client, register, monkeypatch):
+    headers = register('revoked-elsewhere@example.com')
+    # Revoked by another worker: the cutoff is in the database only
+    db = Sessionlocal()
+    db.query(User).filter(User.login == 'revoked-elsewhere@example.com').update({'tokens_valid_after': time.time()})
+    db.commit()
+    db.close()
+    monkeypatch.setattr(auth, 'token_cache', TokenCache())
+
+    assert client.get('/my/categories/', headers=headers).status_code == 401
+
+
+def test_put_after_revoke_is_refused():
+    cache = TokenCache()
+    issued_at = time.time()
+    # The decode of this token finished only after the revocation
+    cache.revoke_user(1)
+    assert cache.put('token', {'login': 'user@example.com', 'id': 1}, issued_at=issued_at) is False
+    assert cache.get('token') is None